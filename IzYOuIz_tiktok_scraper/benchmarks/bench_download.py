@@ -0,0 +1,148 @@
+"""
+Compare the old download path (bare requests, 1 KiB chunks) with VideoDownloader's
+pooled session and buffered writes against a local stub Cobalt server.
+
+With --concurrency, also compare many downloads in flight at once: VideoDownloader's
+thread pool against AsyncVideoDownloader on one event loop, with a stub Cobalt
+answering after --latency-ms like a remote one. The stub and each downloader run
+in their own process, so the thread counts and RSS are the downloader's alone.
+
+Run from the package directory:
+    python -m benchmarks.bench_download --videos 20 --size-mb 5
+    python -m benchmarks.bench_download --concurrency 200 --latency-ms 200
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_cobalt import StubCobaltServer  # noqa: E402
+from src.async_download import AsyncVideoDownloader  # noqa: E402
+from src.browser_pool import process_tree_rss  # noqa: E402
+from src.download import VideoDownloader  # noqa: E402
+
+
+def download_before(api_url, video_url, output_dir):
+    response = requests.post(api_url, json={"url": video_url},
+                             headers={"Content-Type": "application/json", "Accept": "application/json"})
+    result = response.json()
+    response = requests.get(result["url"], stream=True)
+    with open(os.path.join(output_dir, result["filename"]), "wb") as f:
+        for chunk in response.iter_content(chunk_size=1024):
+            f.write(chunk)
+
+
+def download_after(downloader, video_url, output_dir):
+    result = downloader.fetch_tunnel_url(video_url)
+    downloader.download_video_from_tunnel(result["url"], result["filename"], output_dir)
+
+
+def run(label, download, videos, payload_size):
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(videos):
+                download(f"https://www.tiktok.com/@bench/video/{i}", output_dir)
+        elapsed = time.perf_counter() - start
+    mb = videos * payload_size / (1024 * 1024)
+    print(f"{label:<8} {mb / elapsed:8.1f} MB/s {elapsed / videos * 1000:8.2f} ms/request")
+
+
+def run_concurrent(conn, mode, api_url, concurrency, videos):
+    """
+    Download `videos` videos in this process with the thread pool or the event loop, and send
+    the rate, the peak thread count and the peak RSS back, each mode starts from a fresh heap.
+    """
+    peaks = {"threads": 0, "rss": 0}
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.02):
+            peaks["threads"] = max(peaks["threads"], threading.active_count())
+            peaks["rss"] = max(peaks["rss"], process_tree_rss(os.getpid()) or 0)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    with tempfile.TemporaryDirectory() as output_dir:
+        video_infos = [{"video": f"https://www.tiktok.com/@bench/video/{i}"} for i in range(videos)]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            if mode == "threads":
+                VideoDownloader(api_url=api_url, max_workers=concurrency,
+                                requests_per_second=10000).process_videos(video_infos, output_dir)
+            else:
+                download_async(api_url, concurrency, video_infos, output_dir)
+        elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    conn.send((videos / elapsed, peaks["threads"] - 1, peaks["rss"]))
+
+
+def serve_stub(conn, payload_size, latency_ms):
+    server = StubCobaltServer(payload_size=payload_size, latency_ms=latency_ms)
+    conn.send(server.url)
+    server.serve_forever()
+
+
+def download_async(api_url, concurrency, video_infos, output_dir):
+    async def run():
+        downloader = AsyncVideoDownloader(api_url=api_url, max_concurrency=concurrency,
+                                          requests_per_second=10000)
+        try:
+            await downloader.process_videos(video_infos, output_dir)
+        finally:
+            await downloader.aclose()
+
+    asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=20)
+    parser.add_argument("--size-mb", type=float, default=5)
+    parser.add_argument("--overhead-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=0, help="downloads in flight, 0 to skip this comparison")
+    parser.add_argument("--latency-ms", type=int, default=200, help="delay of every stub Cobalt response")
+    args = parser.parse_args()
+
+    if args.concurrency:
+        videos = args.concurrency * 2
+        print(f"-- concurrency: {videos} videos of 64 KiB, {args.concurrency} in flight, {args.latency_ms} ms latency")
+        ctx = multiprocessing.get_context("spawn")
+        conn, child_conn = ctx.Pipe()
+        stub = ctx.Process(target=serve_stub, args=(child_conn, 64 * 1024, args.latency_ms), daemon=True)
+        stub.start()
+        try:
+            url = conn.recv()
+            for mode in ("threads", "async"):
+                bench = ctx.Process(target=run_concurrent, args=(child_conn, mode, url, args.concurrency, videos))
+                bench.start()
+                rate, threads, rss = conn.recv()
+                bench.join()
+                print(f"{mode:<8} {rate:8.1f} videos/s {threads:6d} threads {rss / (1024 * 1024):8.1f} MB peak RSS")
+        finally:
+            stub.terminate()
+            stub.join()
+        return
+
+    for label, payload_size, videos in (("throughput", int(args.size_mb * 1024 * 1024), args.videos),
+                                        ("overhead", 1024, args.overhead_requests)):
+        print(f"-- {label}: {videos} videos of {payload_size} bytes")
+        with StubCobaltServer(payload_size=payload_size) as server:
+            downloader = VideoDownloader(api_url=server.url)
+            run("before", lambda url, out: download_before(server.url, url, out), videos, payload_size)
+            run("after", lambda url, out: download_after(downloader, url, out), videos, payload_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Run whole scraping jobs through TikTokProcessor.process_scraping without network:
+the TikTok pages come from a local fake server, the videos from a stub Cobalt.
+Chrome still has to be installed, it loads the fake pages like the real ones.
+
+Reports jobs/min, the latency of every stage and the peak RSS of the process
+tree (Chrome included). Save a run with --save and compare later runs with
+--baseline, the exit status is 1 when throughput or memory regressed.
+
+Run from the package directory:
+    python -m benchmarks.bench_jobs --jobs 5 --videos 30 --rate-limit-every 10
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_tiktok import FakeTikTokServer  # noqa: E402
+from benchmarks.stub_cobalt import StubCobaltServer  # noqa: E402
+from src.browser_pool import process_tree_rss  # noqa: E402
+
+
+class PeakRssSampler:
+    """
+    Samples the RSS of this process and its descendants in a background thread.
+
+    Attributes:
+        peak (int): Highest RSS seen, in bytes.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, process_tree_rss(os.getpid()) or 0)
+            self.stopped.wait(self.interval)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+
+def configure(fake, cobalt, args):
+    # Read by TikTokProcessor's class attributes, so set before src.scrape_processor is imported
+    os.environ.update({
+        "SCRAPER_TIKTOK_URL": fake.url,
+        "SCRAPER_CREATIVE_CENTER_URL": f"{fake.url}business/creativecenter/inspiration/",
+        "SCRAPER_EMBED_URL": f"{fake.url}embed/v2/",
+        "SCRAPER_COBALT_URL": cobalt.url,
+        "SCRAPER_TASK_STORE": "memory",
+        "SCRAPER_METADATA_DB": "",
+        "SCRAPER_VIDEO_CACHE_MB": "0",  # every job downloads its videos
+        "SCRAPER_JITTER_MIN": str(args.jitter),
+        "SCRAPER_JITTER_MAX": str(args.jitter),
+    })
+
+
+def run_jobs(args):
+    from src.browser_pool import BrowserPool
+    from src.scrape_processor import TikTokProcessor
+
+    browser_pool = BrowserPool(size=1, user_data_root="chrome_profiles")
+    durations = []
+    stages = {}
+    videos = 0
+    try:
+        for i in range(args.jobs):
+            request = SimpleNamespace(search_type=args.search_type, search_query=f"bench{i}",
+                                      max_videos=args.videos, incremental=False)
+            if args.search_type == "topic":
+                request.search_query = "0"
+            processor = TikTokProcessor(browser_pool=browser_pool)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                processor.process_scraping(request)
+            durations.append(time.perf_counter() - start)
+
+            task = TikTokProcessor.task_store.get(processor.task_id)
+            if task["status"] != "completed":
+                raise RuntimeError(f"Job {i} {task['status']}: {task.get('error')}")
+            videos += len(task.get("videos", []))
+            for stage, totals in task["metrics"]["stages"].items():
+                count, seconds = stages.get(stage, (0, 0.0))
+                stages[stage] = (count + totals["count"], seconds + totals["seconds"])
+            print(f"job {i}: {durations[-1]:.2f}s, {len(task.get('videos', []))} videos")
+    finally:
+        browser_pool.close()
+
+    return {
+        "jobs_per_minute": round(len(durations) / sum(durations) * 60, 2),
+        "mean_job_seconds": round(sum(durations) / len(durations), 3),
+        "videos": videos,
+        "stage_ms": {stage: round(seconds / count * 1000, 1) for stage, (count, seconds) in sorted(stages.items())},
+    }
+
+
+def report(results, baseline=None, tolerance=0.2):
+    print(f"jobs/min     {results['jobs_per_minute']:10.2f}")
+    print(f"s/job        {results['mean_job_seconds']:10.3f}")
+    print(f"videos       {results['videos']:10d}")
+    print(f"peak RSS MB  {results['peak_rss_mb']:10.1f}")
+    print("stage latency (mean ms per run)")
+    for stage, ms in results["stage_ms"].items():
+        print(f"  {stage:<18} {ms:10.1f}")
+
+    if baseline is None:
+        return True
+    regressions = []
+    if results["jobs_per_minute"] < baseline["jobs_per_minute"] * (1 - tolerance):
+        regressions.append(f"jobs/min {baseline['jobs_per_minute']} -> {results['jobs_per_minute']}")
+    if results["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        regressions.append(f"peak RSS MB {baseline['peak_rss_mb']} -> {results['peak_rss_mb']}")
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return not regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=5)
+    parser.add_argument("--videos", type=int, default=30, help="max_videos of every job")
+    parser.add_argument("--search-type", default="hashtag", choices=["hashtag", "userid", "trending", "topic"])
+    parser.add_argument("--size-mb", type=float, default=1, help="size of every video")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth Cobalt request with a 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--embed-error-every", type=int, default=0,
+                        help="fail every Nth embed page once, sending it to the browser")
+    parser.add_argument("--load-delay-ms", type=int, default=200, help="delay before the fake feeds show new videos")
+    parser.add_argument("--jitter", type=float, default=0, help="anti-bot sleep of the scraper in seconds")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results saved in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    save_path = os.path.abspath(args.save) if args.save else None
+
+    fake = FakeTikTokServer(videos_per_feed=args.videos, load_delay_ms=args.load_delay_ms,
+                            embed_error_every=args.embed_error_every)
+    cobalt = StubCobaltServer(payload_size=int(args.size_mb * 1024 * 1024), rate_limit_every=args.rate_limit_every,
+                              retry_after=args.retry_after)
+    with fake, cobalt, tempfile.TemporaryDirectory() as workdir:
+        configure(fake, cobalt, args)
+        os.chdir(workdir)  # videos/, checkpoints/ and Chrome profiles stay out of the tree
+        with PeakRssSampler() as sampler:
+            results = run_jobs(args)
+        results["peak_rss_mb"] = round(sampler.peak / (1024 * 1024), 1)
+        results["cobalt_rate_limited"] = cobalt.rate_limited
+
+    if save_path:
+        with open(save_path, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(0 if report(results, baseline, args.tolerance) else 1)
+
+
+if __name__ == "__main__":
+    main()
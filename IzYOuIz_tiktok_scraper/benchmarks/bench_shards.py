@@ -0,0 +1,118 @@
+"""
+Measure how download throughput scales with egress identities, without network:
+every identity gets its own stub proxy and stub Cobalt, and a WorkerScheduler
+runs one worker process per identity. The same video list is split by the
+ShardCoordinator for every identity count, metadata comes from the fake
+TikTok embed pages through each identity's proxy. Chrome isn't needed.
+
+Each identity is limited to --rps Cobalt requests per second, like one IP
+would be, so the throughput should grow linearly with the identities.
+
+Run from the package directory:
+    python -m benchmarks.bench_shards --identities 1 2 4 --videos 48 --rps 4
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_tiktok import FakeTikTokServer, video_ids  # noqa: E402
+from benchmarks.stub_cobalt import StubCobaltServer  # noqa: E402
+from benchmarks.stub_proxy import StubProxyServer  # noqa: E402
+
+
+def run(count, args, fake):
+    with contextlib.ExitStack() as stack:
+        proxies = [stack.enter_context(StubProxyServer()) for _ in range(count)]
+        cobalts = [stack.enter_context(StubCobaltServer(payload_size=int(args.size_mb * 1024 * 1024)))
+                   for _ in range(count)]
+        workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        os.chdir(workdir)  # videos/ and the databases stay out of the tree
+        os.environ.update({
+            "SCRAPER_EMBED_URL": f"{fake.url}embed/v2/",
+            "SCRAPER_TASK_STORE": os.path.join(workdir, "tasks.db"),  # shared with the worker processes
+            "SCRAPER_METADATA_DB": "",
+            "SCRAPER_VIDEO_CACHE_MB": "0",
+            "SCRAPER_EXPORT_DIR": "",
+            "SCRAPER_IDENTITIES": json.dumps([
+                {"name": f"id{i}", "proxy": proxy.url, "cobalt_url": cobalt.url, "requests_per_second": args.rps}
+                for i, (proxy, cobalt) in enumerate(zip(proxies, cobalts))]),
+        })
+
+        from src.job_queue import JobQueue
+        from src.sharding import ShardCoordinator, load_identities
+        from src.task_store import create_task_store
+        from src.worker import WorkerScheduler
+
+        identities = load_identities(os.environ["SCRAPER_IDENTITIES"])
+        job_queue = JobQueue(os.path.join(workdir, "jobs.db"))
+        task_store = create_task_store()
+        coordinator = ShardCoordinator(job_queue, identities)
+        video_urls = [f"https://www.tiktok.com/@bench/video/{video_id}" for video_id in video_ids("shards", args.videos)]
+
+        task_ids = []
+        for i, (shard, urls) in enumerate(coordinator.split_videos(video_urls).items()):
+            task_ids.append(f"task-{i}")
+            task_store.set(task_ids[-1], {"status": "queued"})
+            job_queue.enqueue(task_ids[-1], {"kind": "videos", "group": "bench", "video_urls": urls}, shard=shard)
+
+        scheduler = WorkerScheduler(job_queue, max_workers=count, identities=identities)
+        start = time.perf_counter()
+        scheduler.start()
+        try:
+            while True:
+                tasks = [task_store.get(task_id) for task_id in task_ids]
+                if all(task["status"] in ("completed", "failed") for task in tasks):
+                    break
+                time.sleep(0.1)
+        finally:
+            scheduler.stop()
+        wall = time.perf_counter() - start
+
+        failed = [task.get("error") for task in tasks if task["status"] == "failed"]
+        if failed:
+            raise RuntimeError(f"Failed tasks: {failed}")
+        videos = sum(len(task["videos"]) for task in tasks)
+        job_seconds = max(task["metrics"]["elapsed_seconds"] for task in tasks)
+        return {
+            "identities": count,
+            "videos": videos,
+            "videos_per_second": round(videos / job_seconds, 2),
+            "wall_seconds": round(wall, 2),
+            "proxied_requests": [proxy.requests for proxy in proxies],
+            "cobalt_requests": [cobalt.requests for cobalt in cobalts],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--identities", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--videos", type=int, default=48)
+    parser.add_argument("--size-mb", type=float, default=0.25, help="size of every video")
+    parser.add_argument("--rps", type=float, default=4, help="Cobalt requests per second of every identity")
+    args = parser.parse_args()
+
+    results = []
+    cwd = os.getcwd()
+    with FakeTikTokServer(videos_per_feed=args.videos) as fake:
+        for count in args.identities:
+            try:
+                results.append(run(count, args, fake))
+            finally:
+                os.chdir(cwd)
+
+    base = results[0]["videos_per_second"] / results[0]["identities"]
+    print(f"{'identities':>10} {'videos/s':>9} {'scaling':>8} {'wall s':>7}  requests per proxy / Cobalt")
+    for result in results:
+        scaling = result["videos_per_second"] / (base * result["identities"])
+        print(f"{result['identities']:>10} {result['videos_per_second']:>9.2f} {scaling:>8.0%} "
+              f"{result['wall_seconds']:>7.2f}  {result['proxied_requests']} / {result['cobalt_requests']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Appends `items` to #feed `pageSize` at a time, after `delay` ms, whenever the page is scrolled near its bottom
+INFINITE_SCROLL_SCRIPT = """
+<script>
+const items = %(items)s;
+const pageSize = %(page_size)d;
+const delay = %(delay)d;
+let shown = 0;
+let loading = false;
+function showMore() {
+    loading = true;
+    setTimeout(() => {
+        const feed = document.getElementById("feed");
+        for (const item of items.slice(shown, shown + pageSize)) {
+            feed.insertAdjacentHTML("beforeend", item);
+        }
+        shown += pageSize;
+        loading = false;
+    }, delay);
+}
+%(trigger)s
+showMore();
+</script>
+"""
+
+SCROLL_TRIGGER = """window.addEventListener("scroll", () => {
+    if (!loading && shown < items.length && window.innerHeight + window.scrollY >= document.body.scrollHeight - 400) {
+        showMore();
+    }
+});"""
+
+VIEW_MORE_TRIGGER = """document.querySelector('[data-testid="cc_contentArea_viewmore_btn"]')
+    .addEventListener("click", () => { if (!loading && shown < items.length) showMore(); });"""
+
+
+def video_ids(feed, count):
+    """
+    Deterministic, feed specific video IDs, so two feeds never share videos.
+
+    Args:
+        feed (str): The feed's path, e.g. "tag/cats".
+        count (int): Number of IDs.
+
+    Returns:
+        list: Video IDs as strings.
+    """
+    base = 7000000000000000000 + int(hashlib.sha1(feed.encode()).hexdigest()[:12], 16) * 1000
+    return [str(base + i) for i in range(count)]
+
+
+class FakeTikTokHandler(BaseHTTPRequestHandler):
+    """
+    Serves pages with the DOM TikTokScraper queries:
+
+    - any feed path (/tag/<name>, /@<user>, /channel/trending-now): video links added as the page is scrolled,
+    - .../popular/pc/en: Creative Center embed iframes with a "view more" button,
+    - .../popular/hashtag/pc/en: Creative Center hashtag cards and the topic selector,
+    - /embed/v2/<id>: an embed page with both the hydration state and the rendered video card.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path.startswith("/embed/v2/"):
+            video_id = path.rstrip("/").split("/")[-1]
+            if self.server.fail_embed_once(video_id):
+                return self.send_page("<h1>Service unavailable</h1>", status=503)
+            return self.send_page(self.embed_page(video_id))
+        if path.endswith("/popular/pc/en"):
+            return self.send_page(self.creative_center_page())
+        if path.endswith("/popular/hashtag/pc/en"):
+            return self.send_page(self.hashtag_page())
+        if path in ("", "/", "/favicon.ico"):
+            return self.send_page("", status=404)
+        return self.send_page(self.feed_page(path.strip("/")))
+
+    def send_page(self, body, status=200):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def page(self, body, items, trigger):
+        script = INFINITE_SCROLL_SCRIPT % {"items": json.dumps(items), "page_size": self.server.page_size,
+                                           "delay": self.server.load_delay_ms, "trigger": trigger}
+        return ("<!DOCTYPE html><html><head><meta charset='utf-8'><title>TikTok</title></head>"
+                f"<body>{body}{script}</body></html>")
+
+    def feed_page(self, feed):
+        user = feed[1:] if feed.startswith("@") else "bench"
+        items = [f'<div style="height:300px"><a href="{self.server.url}@{user}/video/{video_id}">video</a></div>'
+                 for video_id in video_ids(feed, self.server.videos_per_feed)]
+        return self.page('<div id="feed"></div>', items, SCROLL_TRIGGER)
+
+    def creative_center_page(self):
+        items = [f'<iframe src="{self.server.url}embed/v2/{video_id}?source=cc" width="300" height="500"></iframe>'
+                 for video_id in video_ids("creativecenter", self.server.videos_per_feed)]
+        button = '<button data-testid="cc_contentArea_viewmore_btn">View more</button>'
+        return self.page(f'<div id="feed"></div>{button}', items, VIEW_MORE_TRIGGER)
+
+    def hashtag_page(self):
+        items = [f'<div class="CardPc_titleText__RYOWo"># benchtag{i}</div>'
+                 for i in range(self.server.videos_per_feed)]
+        selector = ('<div data-type="select-option" data-option-id="SelectOption0">'
+                    '<div class="byted-list-item-container">Topic</div></div>')
+        button = '<button data-testid="cc_contentArea_viewmore_btn">View more</button>'
+        return self.page(f'{selector}<div id="feed"></div>{button}', items, VIEW_MORE_TRIGGER)
+
+    def embed_page(self, video_id):
+        user = f"creator{int(video_id) % 97}"
+        state = {"source": {"data": {f"/embed/v2/{video_id}": {"videoData": {
+            "itemInfos": {"id": video_id, "diggCount": 32900, "commentCount": 1432, "shareCount": 58},
+            "authorInfos": {"uniqueId": user},
+            "musicInfos": {"musicName": "original sound", "authorName": user},
+        }}}}}
+        return f"""<!DOCTYPE html><html><head><meta charset="utf-8"><title>TikTok</title>
+<script id="__FRONTITY_CONNECT_STATE__" type="application/json">{json.dumps(state)}</script>
+</head><body><div id="main">
+<div data-e2e="video-v2-Player">
+  <div data-e2e="Player-Layer-LayerText"><span>32.9K</span></div>
+  <div data-e2e="Player-Layer-LayerText"><span>1432</span></div>
+  <div data-e2e="Player-Layer-LayerText"><span>58</span></div>
+</div>
+<div data-e2e="video-v2-Card">
+  <span data-e2e="video-v2-Card-CardUserSpan">@{user}</span>
+  <div data-e2e="video-v2-Card-CardMusic"><span>original sound - {user}</span></div>
+</div>
+</div></body></html>"""
+
+
+class FakeTikTokServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the TikTok and Creative Center pages, running in a background thread.
+
+    Attributes:
+        videos_per_feed (int): Number of videos (or hashtags) each feed ends up showing.
+        page_size (int): Number of items added per scroll or "view more" click.
+        load_delay_ms (int): Milliseconds before new items appear, mimicking the feed's API calls.
+        embed_error_every (int): Every Nth video's embed page fails once, sending it down the browser path, 0 never.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog, the default of 5 resets connections under load
+
+    def __init__(self, videos_per_feed=60, page_size=12, load_delay_ms=200, embed_error_every=0,
+                 host="127.0.0.1", port=0):
+        super().__init__((host, port), FakeTikTokHandler)
+        self.videos_per_feed = videos_per_feed
+        self.page_size = page_size
+        self.load_delay_ms = load_delay_ms
+        self.embed_error_every = embed_error_every
+        self.failed_embeds = set()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def fail_embed_once(self, video_id):
+        if not self.embed_error_every or int(video_id) % self.embed_error_every:
+            return False
+        with self.lock:
+            if video_id in self.failed_embeds:
+                return False
+            self.failed_embeds.add(video_id)
+            return True
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
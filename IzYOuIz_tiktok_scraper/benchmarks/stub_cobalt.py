@@ -0,0 +1,150 @@
+import json
+import os
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _box(kind, payload):
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def make_mp4(size, duration=15.0, width=720, height=1280):
+    """
+    Build an MP4 file of about `size` bytes: a real ftyp/moov header and random media data.
+
+    Args:
+        size (int): Target file size in bytes.
+        duration (float): Duration in seconds written in the movie header.
+        width (int): Video width written in the track header.
+        height (int): Video height written in the track header.
+
+    Returns:
+        bytes: The file.
+    """
+    matrix = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+    mvhd = _box(b"mvhd", struct.pack(">I4I", 0, 0, 0, 1000, int(duration * 1000))
+                + struct.pack(">IH10x", 0x10000, 0x100) + matrix + bytes(24) + struct.pack(">I", 2))
+    tkhd = _box(b"tkhd", struct.pack(">I5I", 3, 0, 0, 1, 0, int(duration * 1000)) + bytes(8)
+                + struct.pack(">4H", 0, 0, 0, 0) + matrix + struct.pack(">2I", width << 16, height << 16))
+    header = (_box(b"ftyp", b"isom" + struct.pack(">I", 0x200) + b"isomiso2avc1mp41")
+              + _box(b"moov", mvhd + _box(b"trak", tkhd)))
+    return header + _box(b"mdat", os.urandom(max(0, size - len(header) - 8)))
+
+
+class StubCobaltHandler(BaseHTTPRequestHandler):
+    """
+    Mimics the two Cobalt endpoints VideoDownloader talks to.
+
+    POST / answers with a tunnel URL, or with a 429 every `rate_limit_every`
+    requests. GET /tunnel/<filename> streams an MP4 with random media data, cut
+    off halfway every `truncate_every` downloads. Both wait `latency_ms` first,
+    like a remote server would.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        time.sleep(self.server.latency_ms / 1000)
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        video_id = payload.get("url", "").rstrip("/").split("/")[-1]
+
+        if self.server.next_request_is_rate_limited():
+            body = b'{"status":"error","error":{"code":"error.api.rate_exceeded"}}'
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Retry-After", str(self.server.retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        host, port = self.server.server_address[:2]
+        body = json.dumps({
+            "status": "tunnel",
+            "url": f"http://{host}:{port}/tunnel/{video_id}.mp4",
+            "filename": f"tiktok_{video_id}.mp4",
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        time.sleep(self.server.latency_ms / 1000)
+        payload = self.server.payload
+        truncated = self.server.next_download_is_truncated()
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if truncated:  # the connection drops before the announced length
+            self.wfile.write(payload[:len(payload) // 2])
+            self.close_connection = True
+            return
+        self.wfile.write(payload)
+
+
+class StubCobaltServer(ThreadingHTTPServer):
+    """
+    A local Cobalt stand-in running in a background thread.
+
+    Attributes:
+        payload (bytes): MP4 file served for every tunnel download.
+        rate_limit_every (int): Every Nth tunnel request is answered with a 429, 0 never.
+        retry_after (int): Seconds sent in the Retry-After header of the 429s.
+        truncate_every (int): Every Nth download is cut off halfway, 0 never.
+        latency_ms (int): Milliseconds every response is delayed by.
+        requests (int): Number of tunnel requests received.
+        rate_limited (int): Number of tunnel requests answered with a 429.
+        downloads (int): Number of video downloads.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog, the default of 5 resets connections under load
+
+    def __init__(self, payload_size=5 * 1024 * 1024, host="127.0.0.1", port=0, rate_limit_every=0, retry_after=1,
+                 latency_ms=0, truncate_every=0):
+        super().__init__((host, port), StubCobaltHandler)
+        self.latency_ms = latency_ms
+        self.payload = make_mp4(payload_size)
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.truncate_every = truncate_every
+        self.requests = 0
+        self.downloads = 0
+        self.rate_limited = 0
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def next_request_is_rate_limited(self):
+        with self.lock:
+            self.requests += 1
+            limited = self.rate_limit_every > 0 and self.requests % self.rate_limit_every == 0
+            self.rate_limited += limited
+            return limited
+
+    def next_download_is_truncated(self):
+        with self.lock:
+            self.downloads += 1
+            return self.truncate_every > 0 and self.downloads % self.truncate_every == 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
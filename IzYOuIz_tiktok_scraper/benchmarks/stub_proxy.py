@@ -0,0 +1,90 @@
+import http.client
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Hop-by-hop headers a proxy must not forward
+HOP_HEADERS = {"connection", "keep-alive", "proxy-connection", "proxy-authorization", "te", "trailer",
+               "transfer-encoding", "upgrade"}
+
+
+class StubProxyHandler(BaseHTTPRequestHandler):
+    """
+    Forwards plain HTTP requests sent to the proxy with an absolute URL, the way
+    browsers and requests talk to a forward proxy. HTTPS tunnels (CONNECT) are refused.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def forward(self):
+        url = urlsplit(self.path)
+        if url.scheme != "http" or not url.hostname:
+            return self.send_error(400, "Only absolute http:// URLs are proxied")
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        body = self.rfile.read(length) if length else None
+        headers = {name: value for name, value in self.headers.items() if name.lower() not in HOP_HEADERS}
+
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+        try:
+            conn.request(self.command, url.path + (f"?{url.query}" if url.query else ""), body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        finally:
+            conn.close()
+        self.server.record(url.hostname, url.port)
+
+        self.send_response(response.status)
+        for name, value in response.getheaders():
+            if name.lower() not in HOP_HEADERS and name.lower() != "content-length":
+                self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_HEAD = forward
+
+    def do_CONNECT(self):
+        self.send_error(405, "HTTPS tunnels aren't supported by the stub proxy")
+
+
+class StubProxyServer(ThreadingHTTPServer):
+    """
+    A local forward proxy running in a background thread, standing in for one egress IP.
+
+    Attributes:
+        requests (int): Number of requests forwarded.
+        hosts (dict): Number of requests forwarded to each "host:port".
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024  # listen backlog, the default of 5 resets connections under load
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), StubProxyHandler)
+        self.requests = 0
+        self.hosts = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def record(self, host, port):
+        with self.lock:
+            self.requests += 1
+            key = f"{host}:{port}"
+            self.hosts[key] = self.hosts.get(key, 0) + 1
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
@@ -1,13 +1,81 @@
-from fastapi import FastAPI, HTTPException, Query, Form, Request, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware  # Import CORSMiddleware
 from pydantic import BaseModel
+from src.async_download import AsyncVideoDownloader
+from src.download import get_video_id
+from src.file_server import StatCache, serve_file
+from src.job_queue import CANCELLED, DONE, FAILED, JobQueue
+from src.metrics import render_prometheus
 from src.scrape_processor import TikTokProcessor
-from fastapi.responses import FileResponse
+from src.sharding import ShardCoordinator, load_identities
+from src.worker import WorkerScheduler, count_killed_job
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import List, Optional
+from uuid import uuid4
+import asyncio
+import json
 import os
 
-app = FastAPI()
+# Scraping jobs run in worker processes, each keeping a warm Chrome between jobs.
+# With SCRAPER_WORKERS=0 no worker is started here, run `python -m src.worker` instead.
+job_queue = JobQueue(os.environ.get("SCRAPER_JOB_QUEUE", "jobs.db"))
+# Egress identities (proxy, Cobalt, rate limits), jobs are sharded over them
+identities = load_identities(os.environ.get("SCRAPER_IDENTITIES", ""))
+scheduler = WorkerScheduler(job_queue, max_workers=int(os.environ.get("SCRAPER_WORKERS", 2)), identities=identities)
+coordinator = ShardCoordinator(job_queue, scheduler.served_identities() if scheduler.max_workers > 0 else identities)
+default_job_timeout = float(os.environ.get("SCRAPER_JOB_TIMEOUT", 3600))
+stat_cache = StatCache()
+# Downloads of inline /download-videos/ requests run on the server's event loop
+async_downloader = AsyncVideoDownloader(api_url=os.environ.get("SCRAPER_COBALT_URL", "http://cobalt-api:9000/"),
+                                        rate_limit_delay=10,
+                                        max_concurrency=int(os.environ.get("SCRAPER_ASYNC_DOWNLOADS", 64)))
+inline_jobs = {}  # task ID -> asyncio.Task of this process's running inline downloads
+export_stat_cache = StatCache(ttl=0)  # exports grow and get rebuilt, never trust an old size
+
+
+def inline_job_done(task_id, job):
+    # Records the end of an inline job in the job queue, like a worker would
+    inline_jobs.pop(task_id, None)
+    if job.cancelled():
+        state = CANCELLED
+        TikTokProcessor.task_store.set(task_id, {"status": "cancelled"})
+        count_killed_job("cancelled")
+    else:
+        task = TikTokProcessor.task_store.get(task_id)
+        state = FAILED if job.exception() is not None or (task and task["status"] == "failed") else DONE
+    job_queue.finish(task_id, state)
+
+
+async def watch_inline_jobs(poll_interval=1.0):
+    # /cancel-task/ may reach another server process, which only flags the job in the queue
+    while True:
+        await asyncio.sleep(poll_interval)
+        if inline_jobs:
+            for task_id in await run_in_threadpool(job_queue.cancel_requested, list(inline_jobs)):
+                if task_id in inline_jobs:
+                    inline_jobs[task_id].cancel()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    async_downloader.cache = TikTokProcessor.video_cache
+    if scheduler.max_workers > 0:
+        scheduler.start()
+    watcher = asyncio.create_task(watch_inline_jobs())
+    yield
+    watcher.cancel()
+    for job in list(inline_jobs.values()):
+        job.cancel()
+    scheduler.stop()
+    await async_downloader.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -26,26 +94,196 @@ class SearchRequest(BaseModel):
     search_query: str # in the case search_type is userid search_query must be in this format: user with the @
     # in the case search_type is topic search_query be the index of the topic (0-indexed)
     max_videos: int
+    priority: int = 0 # jobs with a higher priority are started first
+    timeout: Optional[float] = None # seconds before the job is killed, defaults to SCRAPER_JOB_TIMEOUT
+    incremental: bool = False # only scrape videos not seen in previous runs of the same feed
 
 
 @app.post("/scrape-and-download/")
-async def scrape_and_download(request: SearchRequest, background_tasks: BackgroundTasks):
-    pros = TikTokProcessor()
+async def scrape_and_download(request: SearchRequest):
+    task_id = str(uuid4())
+    TikTokProcessor.task_store.set(task_id, {"status": "queued"})
+
+    # Queue the job for the worker processes, a feed is always scraped by the same identity
+    coordinator.submit(task_id, request.model_dump(exclude={"priority", "timeout"}),
+                       key=f"{request.search_type}:{request.search_query}",
+                       priority=request.priority, timeout=request.timeout or default_job_timeout)
+
+    return {"id": task_id}
+
+class BatchQuery(BaseModel):
+    search_type: str # hashtag, userid, trending, or topic with search_query "0" for the popular videos
+    search_query: str
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery] = []
+    topic: Optional[int] = None # index of a topic (1-indexed), its popular hashtags are added to the queries
+    max_hashtags: int = 10 # number of hashtags scraped from the topic
+    max_videos: int # per query
+    priority: int = 0
+    timeout: Optional[float] = None
+    incremental: bool = False
+
+
+# One task for many searches, run over a single browser session with one download batch
+@app.post("/scrape-batch/")
+async def scrape_batch(request: BatchRequest):
+    if not request.queries and not request.topic:
+        raise HTTPException(status_code=400, detail="Give at least one query or a topic.")
+    for query in request.queries:
+        if query.search_type not in ("hashtag", "userid", "trending", "topic") or \
+                (query.search_type == "topic" and query.search_query != "0"):
+            raise HTTPException(status_code=400, detail=f"Invalid query: {query.search_type} '{query.search_query}'.")
+
+    task_id = str(uuid4())
+    TikTokProcessor.task_store.set(task_id, {"status": "queued"})
+    # Not sharded: deduping videos across the queries needs them in one job
+    coordinator.submit(task_id, {"kind": "batch", **request.model_dump(exclude={"priority", "timeout"})},
+                       priority=request.priority, timeout=request.timeout or default_job_timeout)
+
+    return {"id": task_id}
 
-    # Start the background task
-    background_tasks.add_task(pros.process_scraping, request)
+class VideoListRequest(BaseModel):
+    video_urls: List[str]
+    priority: int = 0
+    timeout: Optional[float] = None
+    inline: bool = False # download on the API server's event loop instead of the workers, without browser fallback
 
-    return {"id": pros.get_Process_id()}
+# Download known videos: the list is split evenly into one task per identity,
+# all saving to videos/{id}_videos/
+@app.post("/download-videos/")
+async def download_videos(request: VideoListRequest):
+    if not request.video_urls:
+        raise HTTPException(status_code=400, detail="Give at least one video URL.")
+
+    group = str(uuid4())
+    if request.inline:
+        task_id = str(uuid4())
+        video_urls = list({get_video_id(url): url for url in request.video_urls}.values())
+        payload = {"kind": "videos", "group": group, "video_urls": video_urls}
+        # Tracked in the queue so any server process can cancel it, and the workers retry it if this one dies
+        await run_in_threadpool(job_queue.track, task_id, payload, os.getpid())
+        processor = await run_in_threadpool(TikTokProcessor, task_id=task_id)
+        job = asyncio.create_task(processor.process_video_list_async(SimpleNamespace(**payload), async_downloader))
+        inline_jobs[task_id] = job
+        job.add_done_callback(lambda job: inline_job_done(task_id, job))
+        return {"id": group, "tasks": [{"id": task_id, "shard": None, "videos": len(video_urls)}]}
+
+    tasks = []
+    for shard, video_urls in coordinator.split_videos(request.video_urls).items():
+        task_id = str(uuid4())
+        TikTokProcessor.task_store.set(task_id, {"status": "queued"})
+        coordinator.job_queue.enqueue(task_id, {"kind": "videos", "group": group, "video_urls": video_urls},
+                                      priority=request.priority, timeout=request.timeout or default_job_timeout,
+                                      shard=shard)
+        tasks.append({"id": task_id, "shard": shard, "videos": len(video_urls)})
+
+    return {"id": group, "tasks": tasks}
+
+@app.post("/cancel-task/")
+async def cancel_task(id: str):
+    if id in inline_jobs:  # running here, no need to wait for the watcher
+        inline_jobs[id].cancel()
+        return {"id": id, "state": "cancelled"}
+    state = job_queue.cancel(id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Task ID not found.")
+    if state == "cancelled":
+        TikTokProcessor.task_store.set(id, {"status": "cancelled"})
+    return {"id": id, "state": state}
 
 @app.get("/get-status/")
 async def get_status(id: str):
     if id == "test":
-        return {"status":"completed","videos":[{"video":"/videos/0_topic_videos/tiktok_tmobile_7469113403739573550.mp4","videotiktok":"https://www.tiktok.com/@tmobile/video/7469113403739573550","song":"original sound - T-Mobile","userid":"@tmobile","like_count":"32.9K","comment_count":"1432","share_count":"58"},{"video":"/videos/0_topic_videos/tiktok_edelydesigns_7460270623361600814.mp4","videotiktok":"https://www.tiktok.com/@edelydesigns/video/7460270623361600814","song":"original sound - Edely","userid":"@edelydesigns","like_count":"169.3K","comment_count":"1034","share_count":"4909"},{"video":"/videos/0_topic_videos/tiktok_tacobell_7456907207926402347.mp4","videotiktok":"https://www.tiktok.com/@tacobell/video/7456907207926402347","song":"original sound - tacobell","userid":"@tacobell","like_count":"171.3K","comment_count":"3332","share_count":"27.7K"},{"video":"/videos/0_topic_videos/tiktok_nfl_7469607703065791790.mp4","videotiktok":"https://www.tiktok.com/@nfl/video/7469607703065791790","song":"original sound - NFL","userid":"@nfl","like_count":"10.3M","comment_count":"67.4K","share_count":"441.8K"},{"video":"/videos/0_topic_videos/tiktok_tacobell_7457691917476957486.mp4","videotiktok":"https://www.tiktok.com/@tacobell/video/7457691917476957486","song":"original sound - tacobell","userid":"@tacobell","like_count":"215.4K","comment_count":"3830","share_count":"59.6K"},{"video":"/videos/0_topic_videos/tiktok_adamw_7468815452748238111.mp4","videotiktok":"https://www.tiktok.com/@adamw/video/7468815452748238111","song":"original sound - Adam W","userid":"@adamw","like_count":"174.3K","comment_count":"790","share_count":"2330"},{"video":"/videos/0_topic_videos/tiktok_bookingcom_7466113074504682774.mp4","videotiktok":"https://www.tiktok.com/@bookingcom/video/7466113074504682774","song":"original sound - Booking.com","userid":"@bookingcom","like_count":"96.6K","comment_count":"461","share_count":"2748"},{"video":"/videos/0_topic_videos/tiktok_tacobell_7456927506784947498.mp4","videotiktok":"https://www.tiktok.com/@tacobell/video/7456927506784947498","song":"original sound - tacobell","userid":"@tacobell","like_count":"36.2K","comment_count":"382","share_count":"2871"},{"video":"/videos/0_topic_videos/tiktok_blaytonbooper_7441348151031647518.mp4","videotiktok":"https://www.tiktok.com/@blaytonbooper/video/7441348151031647518","song":"Come Inside Of My Heart - IV Of Spades","userid":"@blaytonbooper","like_count":"85.1K","comment_count":"725","share_count":"3201"},{"video":"/videos/0_topic_videos/tiktok_tiktokcreators_7449483512954113323.mp4","videotiktok":"https://www.tiktok.com/@tiktokcreators/video/7449483512954113323","song":"original sound - tiktok creators","userid":"@tiktokcreators","like_count":"154.3K","comment_count":"250","share_count":"7644"}]}
+        return {"status":"completed","videos":[{"video":"/videos/0_topic_videos/tiktok_tmobile_7469113403739573550.mp4","videotiktok":"https://www.tiktok.com/@tmobile/video/7469113403739573550","song":"original sound - T-Mobile","userid":"@tmobile","like_count":32900,"comment_count":1432,"share_count":58},{"video":"/videos/0_topic_videos/tiktok_edelydesigns_7460270623361600814.mp4","videotiktok":"https://www.tiktok.com/@edelydesigns/video/7460270623361600814","song":"original sound - Edely","userid":"@edelydesigns","like_count":169300,"comment_count":1034,"share_count":4909},{"video":"/videos/0_topic_videos/tiktok_tacobell_7456907207926402347.mp4","videotiktok":"https://www.tiktok.com/@tacobell/video/7456907207926402347","song":"original sound - tacobell","userid":"@tacobell","like_count":171300,"comment_count":3332,"share_count":27700},{"video":"/videos/0_topic_videos/tiktok_nfl_7469607703065791790.mp4","videotiktok":"https://www.tiktok.com/@nfl/video/7469607703065791790","song":"original sound - NFL","userid":"@nfl","like_count":10300000,"comment_count":67400,"share_count":441800},{"video":"/videos/0_topic_videos/tiktok_tacobell_7457691917476957486.mp4","videotiktok":"https://www.tiktok.com/@tacobell/video/7457691917476957486","song":"original sound - tacobell","userid":"@tacobell","like_count":215400,"comment_count":3830,"share_count":59600},{"video":"/videos/0_topic_videos/tiktok_adamw_7468815452748238111.mp4","videotiktok":"https://www.tiktok.com/@adamw/video/7468815452748238111","song":"original sound - Adam W","userid":"@adamw","like_count":174300,"comment_count":790,"share_count":2330},{"video":"/videos/0_topic_videos/tiktok_bookingcom_7466113074504682774.mp4","videotiktok":"https://www.tiktok.com/@bookingcom/video/7466113074504682774","song":"original sound - Booking.com","userid":"@bookingcom","like_count":96600,"comment_count":461,"share_count":2748},{"video":"/videos/0_topic_videos/tiktok_tacobell_7456927506784947498.mp4","videotiktok":"https://www.tiktok.com/@tacobell/video/7456927506784947498","song":"original sound - tacobell","userid":"@tacobell","like_count":36200,"comment_count":382,"share_count":2871},{"video":"/videos/0_topic_videos/tiktok_blaytonbooper_7441348151031647518.mp4","videotiktok":"https://www.tiktok.com/@blaytonbooper/video/7441348151031647518","song":"Come Inside Of My Heart - IV Of Spades","userid":"@blaytonbooper","like_count":85100,"comment_count":725,"share_count":3201},{"video":"/videos/0_topic_videos/tiktok_tiktokcreators_7449483512954113323.mp4","videotiktok":"https://www.tiktok.com/@tiktokcreators/video/7449483512954113323","song":"original sound - tiktok creators","userid":"@tiktokcreators","like_count":154300,"comment_count":250,"share_count":7644}]}
     
-    if id not in TikTokProcessor.task_status:
+    task = TikTokProcessor.task_store.get(id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task ID not found.")
     
-    return TikTokProcessor.task_status[id]
+    return task
+
+# Server-Sent Events stream of a task: one event per video found, scraped and downloaded,
+# and one per status change. The stream ends with the task.
+@app.get("/events/")
+async def task_events(id: str, request: Request):
+    if TikTokProcessor.task_store.get(id) is None:
+        raise HTTPException(status_code=404, detail="Task ID not found.")
+
+    async def stream():
+        try:
+            last_seq = int(request.headers.get("Last-Event-ID", 0) or 0)  # resume after a reconnection
+        except ValueError:
+            last_seq = 0  # a malformed ID replays the whole stream
+        idle = 0
+        while not await request.is_disconnected():
+            events = await run_in_threadpool(TikTokProcessor.task_store.events_since, id, last_seq)
+            for seq, event in events:
+                last_seq = seq
+                yield f"id: {seq}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                if event["type"] == "status" and event["status"] in ("completed", "failed", "cancelled"):
+                    return
+            idle = 0 if events else idle + 1
+            if idle and idle % 30 == 0:
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# Prometheus metrics summed over every job of every worker process, running jobs included
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    samples = await run_in_threadpool(TikTokProcessor.task_store.metrics)
+    return PlainTextResponse(render_prometheus(samples), media_type="text/plain; version=0.0.4")
+
+# Rows of a task, or of every task without an id: NDJSON as they were appended,
+# or converted to Parquet/Arrow (needs pyarrow) for analytics jobs
+@app.get("/export/")
+async def export_results(request: Request, id: Optional[str] = None, format: str = "ndjson"):
+    exporter = TikTokProcessor.exporter
+    if exporter is None:
+        raise HTTPException(status_code=404, detail="Exports are disabled.")
+    if format not in ("ndjson", "parquet", "arrow"):
+        raise HTTPException(status_code=400, detail="format must be ndjson, parquet or arrow.")
+    if id is not None and not exporter.paths(id):
+        raise HTTPException(status_code=404, detail="No exported rows for this task.")
+    name = id or "all"
+
+    if format == "ndjson":
+        if id is not None:
+            return serve_file(request, exporter.root, os.path.basename(exporter.path(id)), export_stat_cache,
+                              download_name=f"{name}.ndjson", media_type="application/x-ndjson", max_age=0)
+
+        def concatenate():
+            for path in exporter.paths():
+                with open(path, "rb") as f:
+                    yield from iter(lambda: f.read(1024 * 1024), b"")
+
+        return StreamingResponse(concatenate(), media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": f'attachment; filename="{name}.ndjson"'})
+
+    try:
+        path = await run_in_threadpool(exporter.export_columnar, id, format)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    if path is None:
+        raise HTTPException(status_code=404, detail="No exported rows.")
+    media_type = "application/vnd.apache.parquet" if format == "parquet" else "application/vnd.apache.arrow.file"
+    return serve_file(request, exporter.root, os.path.relpath(path, exporter.root), export_stat_cache,
+                      download_name=os.path.basename(path), media_type=media_type, max_age=0)
+
+# Downloaded videos from the media index, most recent first: size, checksum, duration, resolution,
+# poster and integrity status ("ok", "truncated" or "unreadable") of each file, without reading them
+@app.get("/media/")
+async def list_media(folder: Optional[str] = None, status: Optional[str] = None, limit: int = 100, offset: int = 0):
+    media_index = TikTokProcessor.media_index
+    if media_index is None:
+        raise HTTPException(status_code=404, detail="The media index is disabled.")
+    if not 1 <= limit <= 1000 or offset < 0:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000 and offset positive.")
+    videos, total = await run_in_threadpool(media_index.list_videos, folder, limit, offset, status)
+    return {"videos": videos, "total": total}
 
 # Root endpoint to serve the HTML form
 @app.get("/", response_class=HTMLResponse)
@@ -53,20 +291,22 @@ async def get_form(request: Request):
     return templates.TemplateResponse("preview.html", {"request": request})
 
 
-@app.get("/stream/videos/{subfolder}/{filename}")
-async def stream_video(subfolder: str, filename: str):
-    file_path = os.path.join("videos", subfolder, filename)
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="video/mp4")
-    return {"error": "File not found"}
+# Video files support byte ranges (seeking in the gallery players) and ETag revalidation
+@app.api_route("/stream/videos/{subfolder}/{filename}", methods=["GET", "HEAD"])
+async def stream_video(subfolder: str, filename: str, request: Request):
+    return serve_file(request, "videos", os.path.join(subfolder, filename), stat_cache)
 
-@app.get("/videos/{subfolder}/{filename}")
-async def download_file(subfolder: str, filename: str):
-    file_path = os.path.join("videos", subfolder, filename)
-    if os.path.exists(file_path):
-        return FileResponse(file_path, filename=filename)
-    return {"error": "File not found"}
+@app.api_route("/videos/{subfolder}/{filename}", methods=["GET", "HEAD"])
+async def download_file(subfolder: str, filename: str, request: Request):
+    return serve_file(request, "videos", os.path.join(subfolder, filename), stat_cache, download_name=filename)
 
+# Posters of the media index, a few KB each
+@app.api_route("/posters/{subfolder}/{filename}", methods=["GET", "HEAD"])
+async def poster(subfolder: str, filename: str, request: Request):
+    if TikTokProcessor.media_index is None:
+        raise HTTPException(status_code=404, detail="The media index is disabled.")
+    return serve_file(request, TikTokProcessor.media_index.posters_root, os.path.join(subfolder, filename),
+                      stat_cache, media_type="image/jpeg")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,260 @@
+import asyncio
+import itertools
+import os
+
+import httpx
+
+from .download import discard_truncated, expected_size, get_video_id, partial_path
+from .metrics import Metrics
+from .rate_limiter import AsyncRateLimiter, parse_retry_after
+
+
+class AsyncVideoDownloader:
+    """
+    An asyncio counterpart of VideoDownloader for the API server's event loop:
+    pooled httpx clients, a semaphore bounding the downloads in flight,
+    rate-limit backoff with asyncio.sleep and file writes in worker threads.
+
+    A download waiting on Cobalt or on the network costs a coroutine, not a
+    thread, so hundreds can be in flight next to the FastAPI app.
+
+    The connection pool is split over several clients of `connections_per_client`
+    connections: httpcore scans its whole pool on every request, which made a
+    single 200 connection pool CPU bound (25 videos/s against 160 with pools of 8).
+
+    Attributes:
+        api_url (str): The URL of the self-hosted Cobalt API.
+        max_concurrency (int): Number of videos fetched and downloaded concurrently.
+        max_rate_retries (int): Number of rate-limited attempts before giving up on a video.
+        rate_limiter (AsyncRateLimiter): Per-host token buckets shared by every download.
+        clients (list): Keep-alive httpx clients, every download uses one of them in turn.
+        chunk_size (int): Size of the chunks written to disk.
+        cache (VideoCache): Cache of already downloaded videos, or None.
+        metrics (Metrics): Timings and counters of the downloads.
+    """
+
+    def __init__(self, api_url="http://localhost:9000/", rate_limit_delay=5, max_concurrency=64,
+                 requests_per_second=2.0, max_rate_retries=20, timeout=(5, 60), chunk_size=1024 * 1024,
+                 cache=None, connections_per_client=8):
+        """
+        Initialize the downloader, its clients open connections on first use.
+
+        Args:
+            api_url (str): The URL of the self-hosted Cobalt API.
+            rate_limit_delay (int): Number of seconds to wait after hitting a rate limit.
+            max_concurrency (int): Number of videos fetched and downloaded concurrently.
+            requests_per_second (float): Initial request rate allowed per host.
+            max_rate_retries (int): Number of rate-limited attempts before giving up on a video.
+            timeout (tuple): (connect, read) timeout in seconds for every request.
+            chunk_size (int): Size of the chunks written to disk.
+            cache (VideoCache): Cache of already downloaded videos, videos found in it are linked instead of downloaded.
+            connections_per_client (int): Size of the connection pool of each client.
+        """
+        self.api_url = api_url
+        self.max_concurrency = max_concurrency
+        self.max_rate_retries = max_rate_retries
+        self.rate_limiter = AsyncRateLimiter(rate=requests_per_second, capacity=max(1, min(max_concurrency, 8)),
+                                             base_backoff=rate_limit_delay)
+        pool_size = max(1, min(connections_per_client, max_concurrency))
+        ssl_context = httpx.create_ssl_context()  # loading the CA bundle once per client is slow
+        self.clients = [httpx.AsyncClient(verify=ssl_context, timeout=httpx.Timeout(timeout[1], connect=timeout[0]),
+                                          limits=httpx.Limits(max_connections=pool_size,
+                                                              max_keepalive_connections=pool_size))
+                        for _ in range(-(-max_concurrency // pool_size))]
+        self.next_client = itertools.cycle(self.clients)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.event_callback = None
+        self.metrics = Metrics()
+
+    def for_job(self):
+        """
+        Get a downloader for one job: it shares the clients, the rate limiter,
+        the concurrency limit and the cache, but has its own metrics and events.
+
+        Returns:
+            AsyncVideoDownloader: The job's downloader.
+        """
+        job = object.__new__(AsyncVideoDownloader)
+        job.__dict__.update(self.__dict__)
+        job.event_callback = None
+        job.metrics = Metrics()
+        return job
+
+    async def aclose(self):
+        for client in self.clients:
+            await client.aclose()
+
+    async def emit(self, event, **data):
+        """
+        Report a download event to `event_callback` in a worker thread, it may write to the task store.
+
+        Args:
+            event (str): Event name, "video_downloaded".
+            **data: Event payload.
+
+        Returns:
+            None
+        """
+        if self.event_callback is not None:
+            await asyncio.to_thread(self.event_callback, event, **data)
+
+    async def fetch_tunnel_url(self, video_url, client=None):
+        """
+        Fetch the tunnel URL for a video using the self-hosted Cobalt API.
+
+        Args:
+            video_url (str): The TikTok video URL.
+            client (httpx.AsyncClient): Client to send the request with, defaults to the first one.
+
+        Returns:
+            dict: A dictionary containing the tunnel URL and filename, {"rate_exceeded": True, ...}, or None if failed.
+        """
+        with self.metrics.span("cobalt_tunnel"):
+            response = await (client or self.clients[0]).post(self.api_url, json={"url": video_url},
+                                                               headers={"Accept": "application/json"})
+
+        if response.status_code == 200:
+            return response.json()
+        if response.status_code == 429 or '"code":"error.api.rate_exceeded"' in response.text:
+            self.metrics.inc("rate_limit_hits_total")
+            retry_after = parse_retry_after(response.headers.get("Retry-After")
+                                            or response.headers.get("RateLimit-Reset"))
+            return {"rate_exceeded": True, "retry_after": retry_after}
+        print(f"Failed to fetch tunnel URL for {video_url}. Response: {response.text}")
+        return None
+
+    async def download_video_from_tunnel(self, tunnel_url, filename, output_dir, client=None):
+        """
+        Stream the video from the tunnel URL to disk, the writes run in worker threads.
+
+        Args:
+            tunnel_url (str): The tunnel URL to fetch the video.
+            filename (str): The name to save the video as.
+            output_dir (str): The directory to save the downloaded video.
+            client (httpx.AsyncClient): Client to send the request with, defaults to the first one.
+
+        Returns:
+            int: 0 on success, 1 if the download failed or stopped before its Content-Length.
+        """
+        with self.metrics.span("download"):
+            async with (client or self.clients[0]).stream("GET", tunnel_url) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    print(f"Failed to download from tunnel URL: {tunnel_url}. Response: {response.text}")
+                    return 1
+                output_path = os.path.join(output_dir, filename)
+                tmp_path = partial_path(output_path)
+                written = 0
+                # Opened inline: awaiting a thread here, a cancellation could land after the file is created
+                f = open(tmp_path, "wb")
+                try:
+                    try:
+                        async for chunk in response.aiter_bytes(self.chunk_size):
+                            await asyncio.to_thread(f.write, chunk)
+                            written += len(chunk)
+                    except httpx.TransportError as e:  # connection lost midway
+                        print(f"Download of {filename} interrupted: {e}")
+                        written = None
+                    finally:
+                        await asyncio.to_thread(f.close)
+                    if await asyncio.to_thread(discard_truncated, tmp_path, written, expected_size(response.headers),
+                                               self.metrics):
+                        return 1
+                    await asyncio.to_thread(os.replace, tmp_path, output_path)
+                except BaseException:
+                    # Cancelled or failed writing: leave no partial file behind, without awaiting again
+                    f.close()
+                    try:
+                        os.remove(tmp_path)
+                    except FileNotFoundError:
+                        pass
+                    raise
+                self.metrics.inc("download_bytes_total", written)
+        return 0
+
+    async def process_video(self, video_url, output_dir):
+        """
+        Fetch the tunnel URL of a single video and download it, waiting on the rate limiter.
+
+        Args:
+            video_url (str): The TikTok video URL.
+            output_dir (str): Directory to save the downloaded video.
+
+        Returns:
+            str: Path of the downloaded video, "__invalide__" if the download failed,
+                or None if no tunnel URL could be fetched.
+        """
+        video_id = get_video_id(video_url)
+        if self.cache is not None:
+            filename = await asyncio.to_thread(self.cache.link_into, video_id, output_dir)
+            if filename is not None:
+                self.metrics.inc("video_cache_hits_total")
+                return "/" + os.path.join(output_dir, filename)
+
+        client = next(self.next_client)
+        result = None
+        for attempt in range(self.max_rate_retries):
+            if attempt:
+                self.metrics.inc("download_retries_total")
+            self.metrics.observe("rate_limit_wait", await self.rate_limiter.acquire(self.api_url))
+            result = await self.fetch_tunnel_url(video_url, client)
+            if result is None:
+                break
+            if result.get("rate_exceeded"):
+                self.rate_limiter.penalize(self.api_url, result.get("retry_after"))
+                result = None
+                continue
+            self.rate_limiter.reward(self.api_url)
+            break
+
+        if result and "url" in result and "filename" in result:
+            if await self.download_video_from_tunnel(result["url"], result["filename"], output_dir, client):
+                self.metrics.inc("downloads_failed_total")
+                return "__invalide__"
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.add, video_id, os.path.join(output_dir, result["filename"]))
+            return "/" + os.path.join(output_dir, result["filename"])
+        self.metrics.inc("downloads_failed_total")
+        return None
+
+    async def process_video_info(self, video_info, output_dir, index=None):
+        """
+        Download the video described by `video_info` and replace its "video" URL by the local path.
+
+        Args:
+            video_info (dict): Video information dictionary with a "video" URL.
+            output_dir (str): Directory to save the downloaded video.
+            index (int): Position of the video in its job, reported in the "video_downloaded" event.
+
+        Returns:
+            str: The local path of the download, "__invalide__", or None if it failed.
+        """
+        async with self.semaphore:
+            try:
+                path = await self.process_video(video_info["video"], output_dir)
+            except (httpx.HTTPError, OSError) as e:  # e.g. a dead tunnel or a full disk, only this video fails
+                print(f"Error downloading {video_info['video']}: {e}")
+                self.metrics.inc("downloads_failed_total")
+                path = None
+        if path is not None:
+            video_info["video"] = path
+        await self.emit("video_downloaded", index=index, path=path, video_info=video_info)
+        return path
+
+    async def process_videos(self, video_infos, output_dir):
+        """
+        Download the videos described by `video_infos` concurrently, at most `max_concurrency` at a time.
+
+        Args:
+            video_infos (list): List of video information dictionaries, each with a "video" URL.
+            output_dir (str): Directory to save the downloaded videos.
+
+        Returns:
+            list: `video_infos` with each "video" replaced by the local path of the download.
+        """
+        await asyncio.to_thread(os.makedirs, output_dir, exist_ok=True)
+        await asyncio.gather(*(self.process_video_info(video_info, output_dir, index=i)
+                               for i, video_info in enumerate(video_infos)))
+        return video_infos
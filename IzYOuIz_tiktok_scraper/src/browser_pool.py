@@ -0,0 +1,227 @@
+import os
+import queue
+import threading
+import undetected_chromedriver as uc
+
+
+def create_chrome_driver(user_data_dir=None, proxy=None):
+    """
+    Sets up a full browser mode undetected Chrome WebDriver.
+
+    Args:
+        user_data_dir (str): Chrome user data directory to load, if any.
+        proxy (str): Proxy every page is loaded through, e.g. "http://10.0.0.2:3128", if any.
+
+    Returns:
+        WebDriver: Configured Selenium WebDriver instance.
+    """
+    options = uc.ChromeOptions()
+    options.add_argument("--disable-notifications")  # Disable unnecessary notifications
+
+    if user_data_dir:
+        options.add_argument(f"--user-data-dir={user_data_dir}")  # Load user session
+        print(f"Using Chrome user data directory: {user_data_dir}")
+
+    if proxy:
+        options.add_argument(f"--proxy-server={proxy}")
+        print(f"Using proxy: {proxy}")
+
+    # Use undetected ChromeDriver
+    print("Running Selenium in undetected full browser mode.")
+    return uc.Chrome(options=options)
+
+
+def process_tree_rss(pid):
+    """
+    Sum the resident memory of a process and all of its descendants (Linux only).
+
+    Args:
+        pid (int): Root process ID, e.g. the Chrome browser process.
+
+    Returns:
+        int: Resident set size in bytes, or None if it can't be read.
+    """
+    if not pid or not os.path.isdir("/proc"):
+        return None
+
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces, the parent PID follows its closing parenthesis.
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    rss = 0
+    found = False
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss += int(line.split()[1]) * 1024
+                        found = True
+                        break
+        except OSError:
+            pass
+        pending.extend(children.get(current, []))
+    return rss if found else None
+
+
+class _Slot:
+    def __init__(self, index, user_data_dir):
+        self.index = index
+        self.user_data_dir = user_data_dir
+        self.driver = None
+        self.pages = 0
+        self.base_rss = None
+
+
+class BrowserPool:
+    """
+    A bounded pool of warm undetected Chrome instances shared by scraping jobs.
+
+    Each slot owns its own user data directory, so concurrent browsers never
+    fight over one Chrome profile. Drivers are started lazily on first checkout,
+    health-checked on every checkout and recycled after `max_pages` page loads
+    or once their memory has grown by more than `max_rss_growth_mb`.
+
+    Attributes:
+        size (int): Maximum number of concurrently running browsers.
+        max_pages (int): Page loads after which a browser is restarted.
+        max_rss_growth_mb (int): Memory growth in MB after which a browser is restarted.
+    """
+
+    def __init__(self, size=2, max_pages=200, max_rss_growth_mb=1024, user_data_root="chrome_profiles",
+                 driver_factory=create_chrome_driver):
+        """
+        Initialize the pool, no browser is started until the first checkout.
+
+        Args:
+            size (int): Maximum number of concurrently running browsers.
+            max_pages (int): Page loads after which a browser is restarted.
+            max_rss_growth_mb (int): Memory growth in MB after which a browser is restarted.
+            user_data_root (str): Directory holding one Chrome profile per slot, None to use throwaway profiles.
+            driver_factory (callable): Function creating a driver from a user data directory.
+        """
+        self.size = size
+        self.max_pages = max_pages
+        self.max_rss_growth_mb = max_rss_growth_mb
+        self.driver_factory = driver_factory
+        self.slots = queue.LifoQueue()  # LIFO so the warmest browser is reused first
+        self.in_use = {}
+        self.lock = threading.Lock()
+        self.closed = False
+
+        for i in range(size):
+            user_data_dir = os.path.abspath(os.path.join(user_data_root, f"slot-{i}")) if user_data_root else None
+            self.slots.put(_Slot(i, user_data_dir))
+
+    def checkout(self, timeout=None):
+        """
+        Take a healthy browser out of the pool, waiting for a free slot if needed.
+
+        Args:
+            timeout (float): Seconds to wait for a free slot, None to wait forever.
+
+        Returns:
+            WebDriver: A ready to use driver.
+        """
+        if self.closed:
+            raise RuntimeError("Browser pool is closed.")
+        slot = self.slots.get(timeout=timeout)
+        try:
+            if slot.driver is not None and not self._is_healthy(slot.driver):
+                print(f"Browser in slot {slot.index} is unresponsive. Restarting it...")
+                self._quit(slot)
+            if slot.driver is None:
+                if slot.user_data_dir:
+                    os.makedirs(slot.user_data_dir, exist_ok=True)
+                slot.driver = self.driver_factory(slot.user_data_dir)
+                slot.pages = 0
+                slot.base_rss = process_tree_rss(getattr(slot.driver, "browser_pid", None))
+        except Exception:
+            self._quit(slot)
+            self.slots.put(slot)
+            raise
+
+        with self.lock:
+            self.in_use[id(slot.driver)] = slot
+        return slot.driver
+
+    def checkin(self, driver, pages=0, recycle=False):
+        """
+        Return a browser to the pool, recycling it if it is worn out.
+
+        Args:
+            driver (WebDriver): A driver obtained from `checkout`.
+            pages (int): Number of pages loaded while it was checked out.
+            recycle (bool): Restart the browser regardless, e.g. when it was left in an unknown state.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            slot = self.in_use.pop(id(driver))
+        slot.pages += pages
+
+        if self.closed or recycle or self._should_recycle(slot):
+            self._quit(slot)
+        else:
+            try:
+                # Leave a single blank tab behind for the next job
+                for handle in slot.driver.window_handles[1:]:
+                    slot.driver.switch_to.window(handle)
+                    slot.driver.close()
+                slot.driver.switch_to.window(slot.driver.window_handles[0])
+                slot.driver.get("about:blank")
+            except Exception:
+                self._quit(slot)
+        self.slots.put(slot)
+
+    def close(self):
+        """
+        Quit every idle browser and refuse further checkouts, busy browsers are quit on checkin.
+
+        Returns:
+            None
+        """
+        self.closed = True
+        while True:
+            try:
+                slot = self.slots.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(slot)
+
+    def _should_recycle(self, slot):
+        if slot.pages >= self.max_pages:
+            print(f"Browser in slot {slot.index} loaded {slot.pages} pages. Recycling it...")
+            return True
+        rss = process_tree_rss(getattr(slot.driver, "browser_pid", None))
+        if rss is not None and slot.base_rss is not None and rss - slot.base_rss > self.max_rss_growth_mb * 1024 * 1024:
+            print(f"Browser in slot {slot.index} grew to {rss // (1024 * 1024)}MB. Recycling it...")
+            return True
+        return False
+
+    def _is_healthy(self, driver):
+        try:
+            return driver.execute_script("return 1") == 1 and len(driver.window_handles) > 0
+        except Exception:
+            return False
+
+    def _quit(self, slot):
+        if slot.driver is not None:
+            try:
+                slot.driver.quit()
+            except Exception as e:
+                print(f"Error quitting browser in slot {slot.index}: {e}")
+        slot.driver = None
+        slot.pages = 0
+        slot.base_rss = None
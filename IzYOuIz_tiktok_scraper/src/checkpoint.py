@@ -0,0 +1,98 @@
+import json
+import os
+import re
+
+
+class FeedCheckpoint:
+    """
+    Persistent scraping state of one TikTok feed (a hashtag, a user, trending).
+
+    The IDs of every video already processed from the feed are kept in an
+    in-memory set backed by an append-only file, one ID per line. Next to it,
+    each running job saves the URLs it has collected so far, so a job that
+    crashed can resume where it stopped.
+
+    Attributes:
+        feed (str): The feed's URL parameter, e.g. "tag/cats".
+        seen (set): IDs of the videos already processed from the feed.
+    """
+
+    def __init__(self, feed, root="checkpoints"):
+        """
+        Initialize the checkpoint and load the feed's seen IDs.
+
+        Args:
+            feed (str): The feed's URL parameter, e.g. "tag/cats".
+            root (str): Directory holding the checkpoint files.
+        """
+        self.feed = feed
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.@-]+", "_", feed) or "_"
+        self.seen_path = os.path.join(root, f"{name}.seen")
+
+        self.seen = set()
+        if os.path.exists(self.seen_path):
+            with open(self.seen_path) as f:
+                self.seen.update(line.strip() for line in f if line.strip())
+
+    def is_known(self, video_id):
+        return video_id in self.seen
+
+    def mark_seen(self, video_ids):
+        """
+        Record videos as processed.
+
+        Args:
+            video_ids (iterable): IDs of the processed videos.
+
+        Returns:
+            None
+        """
+        new_ids = [video_id for video_id in dict.fromkeys(video_ids) if video_id not in self.seen]
+        if not new_ids:
+            return
+        with open(self.seen_path, "a") as f:
+            f.write("".join(f"{video_id}\n" for video_id in new_ids))
+        self.seen.update(new_ids)
+
+    def _job_path(self, task_id):
+        return os.path.join(self.root, f"job-{task_id}.json")
+
+    def load_job(self, task_id):
+        """
+        Load the URLs a previous run of the job collected.
+
+        Args:
+            task_id (str): The job's task ID.
+
+        Returns:
+            list: The collected video URLs, empty if the job has no checkpoint.
+        """
+        try:
+            with open(self._job_path(task_id)) as f:
+                return json.load(f)["video_urls"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return []
+
+    def save_job(self, task_id, video_urls):
+        """
+        Save the URLs the job collected so far.
+
+        Args:
+            task_id (str): The job's task ID.
+            video_urls (list): The collected video URLs.
+
+        Returns:
+            None
+        """
+        path = self._job_path(task_id)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump({"feed": self.feed, "video_urls": video_urls}, f)
+        os.replace(f"{path}.tmp", path)
+
+    def clear_job(self, task_id):
+        try:
+            os.remove(self._job_path(task_id))
+        except FileNotFoundError:
+            pass
@@ -1,7 +1,82 @@
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import time
+import urllib3
+from .http_session import PooledSession, stream_to_file
+from .metrics import Metrics
+from .rate_limiter import RateLimiter, parse_retry_after
+
+
+def get_video_id(video_url):
+    """
+    Extract the video ID from a TikTok video or embed URL.
+
+    Args:
+        video_url (str): URL ending with the video ID.
+
+    Returns:
+        str: The video ID.
+    """
+    return video_url.split("?")[0].rstrip("/").split("/")[-1]
+
+
+def expected_size(headers):
+    """
+    Get the body size announced by a response, the size a complete download must have.
+
+    Args:
+        headers (Mapping): Case-insensitive response headers.
+
+    Returns:
+        int: The announced size, or None when it is unknown or counts compressed bytes.
+    """
+    if headers.get("Content-Encoding", "identity") != "identity":
+        return None
+    try:
+        return int(headers["Content-Length"])
+    except (KeyError, ValueError):
+        return None
+
+
+def partial_path(output_path):
+    """
+    Get the path a download is written to before it is renamed to `output_path`. Renaming
+    replaces the inode, so a video hard-linked from the cache into other folders, or being
+    served from a memory map, is never truncated by a new download of the same name.
+
+    Args:
+        output_path (str): Final path of the download.
+
+    Returns:
+        str: A path in the same directory, unique to the process and thread.
+    """
+    return f"{output_path}.{os.getpid()}.{threading.get_ident()}.part"
+
+
+def discard_truncated(output_path, written, expected, metrics):
+    """
+    Remove a download that stopped before its announced size, so it is never served or cached.
+
+    Args:
+        output_path (str): Path of the download.
+        written (int): Number of bytes written, None if the transfer failed midway.
+        expected (int): Size announced by the response, None if unknown.
+        metrics (Metrics): Metrics counting the truncated downloads.
+
+    Returns:
+        bool: True if the download was truncated and removed.
+    """
+    if written is not None and (expected is None or written == expected):
+        return False
+    print(f"Removing the truncated download {output_path}, {expected} bytes were announced.")
+    metrics.inc("downloads_truncated_total")
+    try:
+        os.remove(output_path)
+    except FileNotFoundError:
+        pass
+    return True
 
 
 class VideoDownloader:
@@ -11,18 +86,56 @@ class VideoDownloader:
     Attributes:
         api_url (str): The URL of the self-hosted Cobalt API.
         rate_limit_delay (int): Number of seconds to wait after hitting a rate limit.
+        max_workers (int): Number of videos fetched and downloaded concurrently.
+        max_rate_retries (int): Number of rate-limited attempts before giving up on a video.
+        rate_limiter (RateLimiter): Per-host token buckets shared by all workers.
+        session (PooledSession): Keep-alive session shared by all workers.
+        chunk_size (int): Size of the buffer used to write downloads to disk.
+        cache (VideoCache): Cache of already downloaded videos, or None.
+        metrics (Metrics): Timings and counters of the downloads.
     """
 
-    def __init__(self, api_url="http://localhost:9000/", rate_limit_delay=5):
+    def __init__(self, api_url="http://localhost:9000/", rate_limit_delay=5, max_workers=1,
+                 requests_per_second=2.0, max_rate_retries=20, timeout=(5, 60), chunk_size=1024 * 1024,
+                 cache=None):
         """
         Initialize the VideoDownloader with the API URL and rate limit delay.
 
         Args:
             api_url (str): The URL of the self-hosted Cobalt API.
             rate_limit_delay (int): Number of seconds to wait after hitting a rate limit.
+            max_workers (int): Number of videos fetched and downloaded concurrently, 1 keeps the serial behaviour.
+            requests_per_second (float): Initial request rate allowed per host.
+            max_rate_retries (int): Number of rate-limited attempts before giving up on a video.
+            timeout (tuple): (connect, read) timeout in seconds for every request.
+            chunk_size (int): Size of the buffer used to write downloads to disk.
+            cache (VideoCache): Cache of already downloaded videos, videos found in it are linked instead of downloaded.
         """
         self.api_url = api_url
         self.rate_limit_delay = rate_limit_delay
+        self.max_workers = max_workers
+        self.max_rate_retries = max_rate_retries
+        self.rate_limiter = RateLimiter(rate=requests_per_second, capacity=max(1, max_workers),
+                                        base_backoff=rate_limit_delay)
+        self.session = PooledSession(pool_size=max(4, max_workers), timeout=timeout)
+        self.chunk_size = chunk_size
+        self.cache = cache
+        self.event_callback = None
+        self.metrics = Metrics()
+
+    def emit(self, event, **data):
+        """
+        Report a download event to `event_callback`, if one is set.
+
+        Args:
+            event (str): Event name, "video_downloaded".
+            **data: Event payload.
+
+        Returns:
+            None
+        """
+        if self.event_callback is not None:
+            self.event_callback(event, **data)
 
     def fetch_tunnel_url(self, video_url):
         """
@@ -39,14 +152,18 @@ class VideoDownloader:
             "Accept": "application/json"
         }
         payload = {"url": video_url}
-        response = requests.post(self.api_url, json=payload, headers=headers)
+        with self.metrics.span("cobalt_tunnel"):
+            response = self.session.post(self.api_url, json=payload, headers=headers)
 
         if response.status_code == 200:
             return response.json()
         else:
             if response.status_code == 429 or '"code":"error.api.rate_exceeded"' in response.text:
                 print("Rate limit exceeded. Retrying after delay...")
-                return {"rate_exceeded": True}
+                self.metrics.inc("rate_limit_hits_total")
+                retry_after = parse_retry_after(response.headers.get("Retry-After")
+                                                or response.headers.get("RateLimit-Reset"))
+                return {"rate_exceeded": True, "retry_after": retry_after}
             print(f"Failed to fetch tunnel URL for {video_url}. Response: {response.text}")
             return None
 
@@ -60,61 +177,124 @@ class VideoDownloader:
             output_dir (str): The directory to save the downloaded video.
 
         Returns:
-            None
+            int: 0 on success, 1 if the download failed or stopped before its Content-Length.
         """
-        response = requests.get(tunnel_url, stream=True)
+        with self.metrics.span("download"), self.session.get(tunnel_url, stream=True) as response:
+            if response.status_code == 200:
+                output_path = os.path.join(output_dir, filename)
+                tmp_path = partial_path(output_path)
+                try:
+                    written = stream_to_file(response, tmp_path, self.chunk_size)
+                except (requests.RequestException, urllib3.exceptions.HTTPError) as e:  # connection lost midway
+                    print(f"Download of {filename} interrupted: {e}")
+                    written = None
+                if discard_truncated(tmp_path, written, expected_size(response.headers), self.metrics):
+                    return 1
+                os.replace(tmp_path, output_path)
+                self.metrics.inc("download_bytes_total", written)
+                print(f"Downloaded: {filename} -> {output_path}")
+                return 0
+            else:
+                print(f"Failed to download from tunnel URL: {tunnel_url}. Response: {response.text}")
+                return 1
 
-        if response.status_code == 200:
-            output_path = os.path.join(output_dir, filename)
-            with open(output_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=1024):
-                    f.write(chunk)
-            print(f"Downloaded: {filename} -> {output_path}")
-            return 0
-        else:
-            print(f"Failed to download from tunnel URL: {tunnel_url}. Response: {response.text}")
-            return 1
+    def process_video(self, video_url, output_dir):
+        """
+        Fetch the tunnel URL of a single video and download it, waiting on the rate limiter.
+
+        Args:
+            video_url (str): The TikTok video URL.
+            output_dir (str): Directory to save the downloaded video.
+
+        Returns:
+            str: Path of the downloaded video, "__invalide__" if the download failed,
+                or None if no tunnel URL could be fetched.
+        """
+        print(f"Processing: {video_url}")
+
+        video_id = get_video_id(video_url)
+        if self.cache is not None:
+            filename = self.cache.link_into(video_id, output_dir)
+            if filename is not None:
+                print(f"Cache hit: {video_id} -> {filename}")
+                self.metrics.inc("video_cache_hits_total")
+                return "/" + os.path.join(output_dir, filename)
+
+        # Retry logic for rate limits
+        result = None
+        for attempt in range(self.max_rate_retries):
+            if attempt:
+                self.metrics.inc("download_retries_total")
+            self.metrics.observe("rate_limit_wait", self.rate_limiter.acquire(self.api_url))
+            result = self.fetch_tunnel_url(video_url)
+            if result is None:
+                break  # Failed to fetch and no rate limit
+            if result.get("rate_exceeded"):
+                delay = self.rate_limiter.penalize(self.api_url, result.get("retry_after"))
+                print(f"Rate limit hit. Waiting for {round(delay, 2)} seconds...")
+                result = None
+                continue  # Retry after delay
+            self.rate_limiter.reward(self.api_url)
+            break  # Success, proceed to download
+
+        if result and "url" in result and "filename" in result:
+            err = self.download_video_from_tunnel(result["url"], result["filename"], output_dir)
+            if err:
+                self.metrics.inc("downloads_failed_total")
+                return "__invalide__"
+            if self.cache is not None:
+                self.cache.add(video_id, os.path.join(output_dir, result["filename"]))
+            return "/" + os.path.join(output_dir, result["filename"])
+        self.metrics.inc("downloads_failed_total")
+        return None
 
     def process_videos(self, video_infos, output_dir):
         """
-        Process video URLs from a JSON file and download them using the Cobalt API.
+        Download the videos described by `video_infos` using the Cobalt API.
+
+        With `max_workers` above 1 the videos are processed by a thread pool, the
+        results are still written back into `video_infos` in their original order.
 
         Args:
-            json_file (str): Path to the JSON file containing video URLs.
+            video_infos (list): List of video information dictionaries, each with a "video" URL.
             output_dir (str): Directory to save the downloaded videos.
 
         Returns:
-            None
+            list: `video_infos` with each "video" replaced by the local path of the download.
         """
         os.makedirs(output_dir, exist_ok=True)
 
-        video_urls = []
-        for i in range(len(video_infos)):
-            video_url = video_infos[i]["video"]
-
-            video_urls.append(video_url)
-
-        for i in range(len(video_urls)):
-            video_url = video_urls[i]
-            print(f"Processing: {video_url}")
-
-            # Retry logic for rate limits
-            while True:
-                result = self.fetch_tunnel_url(video_url)
-                if result is None:
-                    break  # Failed to fetch and no rate limit
-                if result.get("rate_exceeded"):
-                    print(f"Rate limit hit. Waiting for {self.rate_limit_delay} seconds...")
-                    time.sleep(self.rate_limit_delay)
-                    continue  # Retry after delay
-                break  # Success, proceed to download
-
-            if result and "url" in result and "filename" in result:
-                err = self.download_video_from_tunnel(result["url"], result["filename"], output_dir)
-                if err:
-                    video_infos[i]["video"] = "__invalide__"
-                else:
-                    video_infos[i]["video"] = "/" + os.path.join(output_dir, result["filename"])
+        def process_at(i):
+            self.process_video_info(video_infos[i], output_dir, index=i)
+
+        if self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(process_at, range(len(video_infos))))
+        else:
+            for i in range(len(video_infos)):
+                process_at(i)
 
         return video_infos
-                    
+
+    def process_video_info(self, video_info, output_dir, index=None):
+        """
+        Download the video described by `video_info` and replace its "video" URL by the local path.
+
+        Args:
+            video_info (dict): Video information dictionary with a "video" URL.
+            output_dir (str): Directory to save the downloaded video.
+            index (int): Position of the video in its job, reported in the "video_downloaded" event.
+
+        Returns:
+            str: The local path of the download, "__invalide__", or None if it failed.
+        """
+        try:
+            path = self.process_video(video_info["video"], output_dir)
+        except requests.RequestException as e:  # Cobalt unreachable or timed out, only this video fails
+            print(f"Error downloading {video_info['video']}: {e}")
+            self.metrics.inc("downloads_failed_total")
+            path = None
+        if path is not None:
+            video_info["video"] = path
+        self.emit("video_downloaded", index=index, path=path, video_info=video_info)
+        return path
@@ -0,0 +1,285 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from .http_session import PooledSession
+
+EMBED_URL = "https://www.tiktok.com/embed/v2/"
+
+# Hydration state scripts the embed page has shipped its video data in
+STATE_SCRIPT_IDS = ("__FRONTITY_CONNECT_STATE__", "__UNIVERSAL_DATA_FOR_REHYDRATION__", "SIGI_STATE")
+
+SONG_SELECTOR = "video-v2-Card-CardMusic"
+USER_SELECTOR = "video-v2-Card-CardUserSpan"
+STATS_SELECTOR = "Player-Layer-LayerText"
+
+# Counters of a video's information, stored as integers
+COUNT_FIELDS = ("like_count", "comment_count", "share_count")
+COUNT_SUFFIXES = {"K": 1000, "M": 1000000, "B": 1000000000}
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+def parse_count(text):
+    """
+    Parse a counter as the embed player displays it.
+
+    Args:
+        text (str | int): "1432", "1,432", "32.9K", "10.3M", or an already parsed counter.
+
+    Returns:
+        int: The counter, 0 if it is empty or unreadable.
+    """
+    if isinstance(text, int):
+        return text
+    text = str(text or "").strip().upper().replace(",", "")
+    multiplier = COUNT_SUFFIXES.get(text[-1:], 1)
+    if multiplier > 1:
+        text = text[:-1]
+    try:
+        return int(round(float(text) * multiplier))
+    except ValueError:
+        return 0
+
+
+def normalize_counts(video_info):
+    """
+    Make sure the counters of a video's information are integers, e.g. for
+    entries cached before the counters were parsed at extraction time.
+
+    Args:
+        video_info (dict): Video information.
+
+    Returns:
+        dict: The same information with integer counters.
+    """
+    if all(isinstance(video_info.get(field), int) for field in COUNT_FIELDS):
+        return video_info
+    return {**video_info, **{field: parse_count(video_info.get(field)) for field in COUNT_FIELDS}}
+
+
+class EmbedPageParser(HTMLParser):
+    """
+    A streaming parser collecting the video card fields of a TikTok embed page.
+
+    Feed it the page chunk by chunk, `complete` turns True as soon as either the
+    hydration JSON or the rendered video card has been fully read.
+
+    Attributes:
+        texts (dict): Inner texts collected for each data-e2e selector.
+        state (str): Raw content of the hydration state script, if one was found.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.texts = {SONG_SELECTOR: [], USER_SELECTOR: [], STATS_SELECTOR: []}
+        self.state = None
+        self._capturing = []  # [selector, depth, text parts] of every open data-e2e element
+        self._in_state = False
+        self._state_parts = []
+
+    @property
+    def complete(self):
+        if self.state is not None:
+            return True
+        return (bool(self.texts[SONG_SELECTOR]) and bool(self.texts[USER_SELECTOR])
+                and len(self.texts[STATS_SELECTOR]) >= 3)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "script" and attrs.get("id") in STATE_SCRIPT_IDS:
+            self._in_state = True
+            return
+        if tag in VOID_TAGS:
+            return
+        for capture in self._capturing:
+            capture[1] += 1
+        selector = attrs.get("data-e2e")
+        if selector in self.texts:
+            self._capturing.append([selector, 1, []])
+
+    def handle_endtag(self, tag):
+        if self._in_state and tag == "script":
+            self._in_state = False
+            self.state = "".join(self._state_parts)
+            return
+        if tag in VOID_TAGS:
+            return
+        for capture in self._capturing:
+            capture[1] -= 1
+        while self._capturing and self._capturing[-1][1] <= 0:
+            selector, _, parts = self._capturing.pop()
+            self.texts[selector].append(" ".join("".join(parts).split()))
+
+    def handle_data(self, data):
+        if self._in_state:
+            self._state_parts.append(data)
+            return
+        for capture in self._capturing:
+            capture[2].append(data)
+
+
+def find_video_data(state):
+    """
+    Find the video data object (itemInfos, authorInfos, musicInfos) in a hydration state.
+
+    Args:
+        state (dict | list): Decoded hydration JSON.
+
+    Returns:
+        dict: The video data object, or None if there is none.
+    """
+    pending = [state]
+    while pending:
+        node = pending.pop()
+        if isinstance(node, dict):
+            if "itemInfos" in node and "authorInfos" in node:
+                return node
+            pending.extend(node.values())
+        elif isinstance(node, list):
+            pending.extend(node)
+    return None
+
+
+def video_info_from_state(state, video_id):
+    """
+    Build the video information from a hydration state.
+
+    Args:
+        state (str): Raw content of the hydration state script.
+        video_id (str): ID of the video the page belongs to.
+
+    Returns:
+        dict: Video information, or None if the state is malformed or has no video data.
+    """
+    try:
+        video_data = find_video_data(json.loads(state))
+        if video_data is None:
+            return None
+        item = video_data["itemInfos"]
+        author = video_data["authorInfos"]
+        music = video_data.get("musicInfos") or {}
+
+        userid = "@" + author["uniqueId"]
+        song = music.get("musicName", "")
+        if music.get("authorName"):
+            song = f"{song} - {music['authorName']}"
+        return {
+            "video": f"https://www.tiktok.com/{userid}/video/{video_id}",
+            "videotiktok": f"https://www.tiktok.com/{userid}/video/{video_id}",
+            "song": song,
+            "userid": userid,
+            "like_count": int(item.get("diggCount", 0)),
+            "comment_count": int(item.get("commentCount", 0)),
+            "share_count": int(item.get("shareCount", 0)),
+        }
+    except (ValueError, KeyError, TypeError, AttributeError) as e:  # json.JSONDecodeError is a ValueError
+        print(f"Unusable hydration state for {video_id}: {e!r}. Reading the video card instead.")
+        return None
+
+
+def parse_embed_page(chunks, video_id):
+    """
+    Parse the video information out of an embed page, stopping as soon as it is found.
+    The hydration state is preferred. When it is malformed the rest of the page is
+    read for the rendered video card.
+
+    Args:
+        chunks (iterable): The page as an iterable of text chunks.
+        video_id (str): ID of the video the page belongs to.
+
+    Returns:
+        dict: Video information in the same format as `TikTokScraper.read_embed_page`.
+
+    Raises:
+        ValueError: If the page has neither a usable hydration state nor a video card.
+    """
+    parser = EmbedPageParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.state is not None:
+            video_info = video_info_from_state(parser.state, video_id)
+            if video_info is not None:
+                return video_info
+            parser.state = None  # keep reading for the video card
+        if parser.complete:
+            break
+
+    texts = parser.texts
+    if not texts[SONG_SELECTOR] or not texts[USER_SELECTOR]:
+        raise ValueError("embed page has no video card")
+    userid = texts[USER_SELECTOR][0]
+    vid_stats = (texts[STATS_SELECTOR] + ["0", "0", "0"])[:3]
+    return {
+        "video": f"https://www.tiktok.com/{userid}/video/{video_id}",
+        "videotiktok": f"https://www.tiktok.com/{userid}/video/{video_id}",
+        "song": texts[SONG_SELECTOR][0],
+        "userid": userid,
+        "like_count": parse_count(vid_stats[0]),
+        "comment_count": parse_count(vid_stats[1]),
+        "share_count": parse_count(vid_stats[2]),
+    }
+
+
+class HttpEmbedExtractor:
+    """
+    Extracts embed page metadata over plain pooled HTTP instead of rendering it in Chrome.
+
+    Attributes:
+        session (PooledSession): Keep-alive session used for every embed page.
+        max_workers (int): Number of embed pages fetched concurrently.
+        embed_url (str): Base URL of the embed pages.
+    """
+
+    def __init__(self, max_workers=8, timeout=(5, 15), embed_url=EMBED_URL, proxy=None):
+        """
+        Initialize the extractor.
+
+        Args:
+            max_workers (int): Number of embed pages fetched concurrently.
+            timeout (tuple): (connect, read) timeout in seconds.
+            embed_url (str): Base URL of the embed pages.
+            proxy (str): Proxy URL the embed pages are fetched through, None for direct connections.
+        """
+        self.max_workers = max_workers
+        self.embed_url = embed_url
+        self.session = PooledSession(pool_size=max_workers, timeout=timeout, proxy=proxy)
+        self.session.headers.update({
+            "User-Agent": ("Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+                           "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"),
+            "Accept": "text/html,application/xhtml+xml",
+            "Accept-Language": "en-US,en;q=0.9",
+        })
+
+    def extract(self, video_id):
+        """
+        Fetch and parse the embed page of a single video.
+
+        Args:
+            video_id (str): The TikTok video ID.
+
+        Returns:
+            dict: Video information.
+        """
+        with self.session.get(self.embed_url + video_id, stream=True) as response:
+            response.raise_for_status()
+            response.encoding = response.encoding or "utf-8"
+            return parse_embed_page(response.iter_content(chunk_size=16 * 1024, decode_unicode=True), video_id)
+
+    def extract_many(self, video_ids):
+        """
+        Fetch several embed pages concurrently.
+
+        Args:
+            video_ids (list): TikTok video IDs.
+
+        Returns:
+            list: Video information for each ID, or the exception raised for it, in order.
+        """
+        def extract_or_error(video_id):
+            try:
+                return self.extract(video_id)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(extract_or_error, video_ids))
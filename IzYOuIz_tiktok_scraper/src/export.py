@@ -0,0 +1,186 @@
+import glob
+import json
+import os
+import time
+
+from .download import get_video_id
+from .embed_extractor import COUNT_FIELDS, parse_count
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # the NDJSON export works without it, only the columnar formats need it
+    pa = pq = None
+
+# Columns of an exported row and their Arrow types
+EXPORT_FIELDS = (
+    ("video_id", "string"),
+    ("task_id", "string"),
+    ("userid", "string"),
+    ("song", "string"),
+    ("videotiktok", "string"),
+    ("video", "string"),
+    ("like_count", "int64"),
+    ("comment_count", "int64"),
+    ("share_count", "int64"),
+    ("exported_at", "float64"),
+)
+
+COLUMNAR_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def export_row(task_id, video_info, exported_at=None):
+    """
+    Flatten a video's information into a row of the export.
+
+    Args:
+        task_id (str): ID of the job the video was found by.
+        video_info (dict): Video information, with the local path of the download in "video".
+        exported_at (float): Unix time of the row, defaults to now.
+
+    Returns:
+        dict: The row, with a key for every field of EXPORT_FIELDS.
+    """
+    row = {field: video_info.get(field) for field, _ in EXPORT_FIELDS}
+    row.update({field: parse_count(video_info.get(field)) for field in COUNT_FIELDS})
+    row["video_id"] = get_video_id(video_info["videotiktok"]) if video_info.get("videotiktok") else None
+    row["task_id"] = task_id
+    row["exported_at"] = time.time() if exported_at is None else exported_at
+    return row
+
+
+def iter_ndjson(paths):
+    """
+    Read the rows of NDJSON files one at a time, skipping a line left unfinished by a crash.
+
+    Args:
+        paths (list): Paths of the files.
+
+    Yields:
+        dict: Every row, in file order.
+    """
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                yield json.loads(line)
+
+
+class ResultExporter:
+    """
+    Streams the videos of every job to append-only NDJSON files as they are
+    downloaded, one file per job, and converts them to Parquet or Arrow for
+    analytics jobs reading many rows at once.
+
+    Each row is appended with a single write on a file opened with O_APPEND,
+    so the worker processes never interleave partial lines.
+
+    Attributes:
+        root (str): Directory of the exported files.
+        batch_rows (int): Rows per record batch of the columnar files.
+    """
+
+    def __init__(self, root="exports", batch_rows=65536):
+        """
+        Initialize the exporter.
+
+        Args:
+            root (str): Directory of the exported files.
+            batch_rows (int): Rows per record batch of the columnar files.
+        """
+        self.root = root
+        self.batch_rows = batch_rows
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, task_id):
+        return os.path.join(self.root, f"{task_id}.ndjson")
+
+    def paths(self, task_id=None):
+        """
+        Get the NDJSON files of a job, or of every job.
+
+        Args:
+            task_id (str): ID of the job, None for every job.
+
+        Returns:
+            list: Paths of the existing files.
+        """
+        if task_id is not None:
+            return [self.path(task_id)] if os.path.isfile(self.path(task_id)) else []
+        return sorted(glob.glob(os.path.join(self.root, "*.ndjson")))
+
+    def append(self, task_id, video_info):
+        """
+        Append a video to the NDJSON file of its job.
+
+        Args:
+            task_id (str): ID of the job.
+            video_info (dict): Video information.
+
+        Returns:
+            None
+        """
+        line = json.dumps(export_row(task_id, video_info), ensure_ascii=False) + "\n"
+        try:
+            fd = os.open(self.path(task_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        except FileNotFoundError:  # the directory was removed while the server was running
+            os.makedirs(self.root, exist_ok=True)
+            fd = os.open(self.path(task_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+    def export_columnar(self, task_id=None, format="parquet"):
+        """
+        Convert the NDJSON rows of a job, or of every job, to a Parquet or Arrow IPC file.
+
+        The rows are read and written one record batch at a time, so the
+        dataset never has to fit in memory. The file is only rebuilt when an
+        NDJSON file changed since it was written.
+
+        Args:
+            task_id (str): ID of the job, None for every job.
+            format (str): "parquet" or "arrow".
+
+        Returns:
+            str: Path of the file, None if there is nothing to export.
+
+        Raises:
+            RuntimeError: If pyarrow isn't installed.
+        """
+        if pa is None:
+            raise RuntimeError("pyarrow is required for the Parquet and Arrow exports")
+        if format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unknown export format: {format}")
+        sources = self.paths(task_id)
+        if not sources:
+            return None
+
+        name = task_id if task_id is not None else "all"
+        path = os.path.join(self.root, "columnar", name + COLUMNAR_FORMATS[format])
+        if os.path.isfile(path) and os.path.getmtime(path) >= max(os.path.getmtime(p) for p in sources):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        schema = pa.schema([(field, pa.type_for_alias(type_)) for field, type_ in EXPORT_FIELDS])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if format == "parquet":
+            writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_file(tmp_path, schema)
+        try:
+            rows = []
+            for row in iter_ndjson(sources):
+                rows.append(row)
+                if len(rows) >= self.batch_rows:
+                    writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+                    rows = []
+            if rows:
+                writer.write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+        finally:
+            writer.close()
+        os.replace(tmp_path, path)
+        return path
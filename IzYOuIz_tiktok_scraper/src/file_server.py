@@ -0,0 +1,182 @@
+import mmap
+import os
+import re
+import stat
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class StatCache:
+    """
+    A short-lived cache of file metadata, so a gallery with many viewers
+    doesn't stat the same videos on every request.
+
+    Attributes:
+        ttl (float): Seconds an entry, found or missing file, is trusted.
+        max_entries (int): Maximum number of cached paths.
+    """
+
+    def __init__(self, ttl=2.0, max_entries=4096):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl (float): Seconds an entry, found or missing file, is trusted.
+            max_entries (int): Maximum number of cached paths.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        """
+        Get the metadata of a regular file.
+
+        Args:
+            path (str): Path of the file.
+
+        Returns:
+            tuple: (os.stat_result, ETag), or None if there is no such regular file.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and now - entry[0] < self.ttl:
+                self.entries.move_to_end(path)
+                return entry[1]
+
+        try:
+            stat_result = os.stat(path)
+            info = (stat_result, f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"') \
+                if stat.S_ISREG(stat_result.st_mode) else None
+        except OSError:
+            info = None
+
+        with self.lock:
+            self.entries[path] = (now, info)
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return info
+
+
+def parse_range(header, size):
+    """
+    Parse a single byte range of a Range header.
+
+    Args:
+        header (str): The Range header, e.g. "bytes=0-1023", "bytes=1024-" or "bytes=-500".
+        size (int): Size of the file.
+
+    Returns:
+        tuple: (start, end) with `end` exclusive, None to serve the whole file
+            (malformed header or several ranges), or () if the range can't be satisfied.
+    """
+    match = RANGE_PATTERN.match(header.replace(" ", ""))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # suffix range: the last N bytes
+        length = int(last)
+        return (max(size - length, 0), size) if length and size else ()
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        return ()
+    return start, end
+
+
+def mmap_chunks(path, start, end, chunk_size):
+    """
+    Yield a byte range of a file from a read-only memory map, without read() calls.
+
+    Args:
+        path (str): Path of the file.
+        start (int): First byte.
+        end (int): Byte after the last one.
+        chunk_size (int): Size of the yielded chunks.
+
+    Yields:
+        bytes: The range, chunk by chunk.
+    """
+    if start >= end:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if hasattr(mapped, "madvise"):
+            # Let the kernel read ahead the requested range instead of faulting page by page
+            page_start = start - start % mmap.PAGESIZE
+            mapped.madvise(mmap.MADV_WILLNEED, page_start, end - page_start)
+        for offset in range(start, end, chunk_size):
+            yield mapped[offset:min(offset + chunk_size, end)]
+
+
+def serve_file(request, root, relative_path, stat_cache, download_name=None, media_type="video/mp4",
+               chunk_size=1024 * 1024, max_age=3600):
+    """
+    Serve a file from `root` with byte ranges, conditional GETs and zero-copy transfer when possible.
+
+    - `Range: bytes=a-b` gets a 206 with that slice, or a 416 if it is out of the file.
+    - `If-None-Match` with the current ETag gets a 304 without a body.
+    - A whole file goes out through the ASGI pathsend extension (sendfile) when the
+      server offers it, otherwise every body is sliced from a memory map of the file.
+
+    Args:
+        request (Request): The incoming request.
+        root (str): Directory the files are served from, nothing outside of it is served.
+        relative_path (str): Path of the file inside `root`.
+        stat_cache (StatCache): Cache of the files' metadata.
+        download_name (str): Filename offered for download, None to display the file inline.
+        media_type (str): Content type of the file.
+        chunk_size (int): Size of the body chunks.
+        max_age (int): Seconds browsers may reuse the file without revalidating it.
+
+    Returns:
+        Response: The response.
+    """
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, relative_path))
+    info = stat_cache.get(path) if path.startswith(root + os.sep) else None
+    if info is None:
+        return JSONResponse({"error": "File not found"}, status_code=404)
+    stat_result, etag = info
+
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}",
+        "Accept-Ranges": "bytes",
+    }
+    if download_name is not None:
+        headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    size = stat_result.st_size
+    byte_range = None
+    if "range" in request.headers and request.headers.get("if-range", etag) == etag:
+        byte_range = parse_range(request.headers["range"], size)
+        if byte_range == ():
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None and "http.response.pathsend" in request.scope.get("extensions", {}):
+        return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result)
+
+    start, end = byte_range or (0, size)
+    headers["Content-Length"] = str(end - start)
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    if request.method == "HEAD":
+        return Response(status_code=206 if byte_range else 200, headers=headers, media_type=media_type)
+    return StreamingResponse(mmap_chunks(path, start, end, chunk_size), status_code=206 if byte_range else 200,
+                             headers=headers, media_type=media_type)
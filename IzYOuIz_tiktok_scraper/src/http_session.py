@@ -0,0 +1,59 @@
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledSession(requests.Session):
+    """
+    A requests session with keep-alive connection pooling and default timeouts.
+
+    Attributes:
+        timeout (tuple): Default (connect, read) timeout in seconds used when a request doesn't set one.
+    """
+
+    def __init__(self, pool_size=10, timeout=(5, 60), proxy=None):
+        """
+        Initialize the session and mount pooled adapters.
+
+        Args:
+            pool_size (int): Maximum number of kept-alive connections per host.
+            timeout (tuple): Default (connect, read) timeout in seconds.
+            proxy (str): URL of the HTTP proxy every request goes through, None for direct connections.
+        """
+        super().__init__()
+        self.timeout = timeout
+        if proxy:
+            self.proxies = {"http": proxy, "https": proxy}
+            self.trust_env = False  # NO_PROXY and the *_PROXY variables must not bypass the identity's proxy
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def stream_to_file(response, output_path, chunk_size=1024 * 1024):
+    """
+    Write a streamed response body to disk through one preallocated buffer.
+
+    Args:
+        response (requests.Response): A response opened with `stream=True`.
+        output_path (str): Path of the file to write.
+        chunk_size (int): Size of the read buffer in bytes.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    response.raw.decode_content = True
+    written = 0
+    with open(output_path, "wb") as f:
+        while True:
+            n = response.raw.readinto(buffer)
+            if not n:
+                break
+            f.write(view[:n])
+            written += n
+    return written
@@ -0,0 +1,215 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+
+
+class JobQueue:
+    """
+    A persistent priority queue of scraping jobs stored in SQLite.
+
+    Jobs are claimed atomically, so any number of worker processes can feed
+    from the same queue. Jobs with the same priority run in FIFO order.
+
+    Attributes:
+        path (str): Path of the database file.
+        max_attempts (int): Number of times a job is started before a crash fails it for good.
+    """
+
+    def __init__(self, path="jobs.db", max_attempts=2):
+        """
+        Initialize the queue and create its schema.
+
+        Args:
+            path (str): Path of the database file.
+            max_attempts (int): Number of times a job is started before a crash fails it for good.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self.local = threading.local()
+
+        conn = self.connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                            task_id TEXT PRIMARY KEY,
+                            payload TEXT NOT NULL,
+                            priority INTEGER NOT NULL DEFAULT 0,
+                            state TEXT NOT NULL,
+                            attempts INTEGER NOT NULL DEFAULT 0,
+                            timeout REAL,
+                            cancel_requested INTEGER NOT NULL DEFAULT 0,
+                            worker_pid INTEGER,
+                            enqueued_at REAL NOT NULL,
+                            started_at REAL,
+                            finished_at REAL,
+                            shard TEXT
+                        )""")
+        if "shard" not in [column["name"] for column in conn.execute("PRAGMA table_info(jobs)")]:
+            conn.execute("ALTER TABLE jobs ADD COLUMN shard TEXT")  # queues created before sharding
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_state_priority ON jobs (state, priority DESC, enqueued_at)")
+
+    def connection(self):
+        """
+        Get this thread's connection, in autocommit mode so transactions are explicit.
+
+        Returns:
+            sqlite3.Connection: The connection.
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def enqueue(self, task_id, payload, priority=0, timeout=None, shard=None):
+        """
+        Add a job to the queue.
+
+        Args:
+            task_id (str): ID of the task the job reports to.
+            payload (dict): JSON serializable job parameters.
+            priority (int): Jobs with a higher priority are started first.
+            timeout (float): Seconds the job may run before it is killed, None for no limit.
+            shard (str): Only workers of this shard may claim the job, None for any worker.
+
+        Returns:
+            None
+        """
+        self.connection().execute(
+            "INSERT INTO jobs (task_id, payload, priority, state, timeout, enqueued_at, shard) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (task_id, json.dumps(payload), priority, QUEUED, timeout, time.time(), shard))
+
+    def track(self, task_id, payload, worker_pid):
+        """
+        Record a job that runs outside the workers, e.g. an inline download on the API
+        server, so any process can cancel it. Should its process die, the job is
+        requeued for the workers like the job of a crashed worker.
+
+        Args:
+            task_id (str): ID of the task the job reports to.
+            payload (dict): JSON serializable job parameters, as a worker would run them.
+            worker_pid (int): PID of the process running the job.
+
+        Returns:
+            None
+        """
+        now = time.time()
+        self.connection().execute(
+            "INSERT INTO jobs (task_id, payload, state, attempts, worker_pid, enqueued_at, started_at) "
+            "VALUES (?, ?, ?, 1, ?, ?, ?)",
+            (task_id, json.dumps(payload), RUNNING, worker_pid, now, now))
+
+    def claim(self, worker_pid, shard=None):
+        """
+        Atomically take the next queued job.
+
+        Args:
+            worker_pid (int): PID of the worker process running the job.
+            shard (str): Shard of the worker: it claims the jobs of that shard and the unsharded ones.
+                None only claims unsharded jobs.
+
+        Returns:
+            dict: The job, with its payload decoded, or None if the queue is empty.
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("""SELECT * FROM jobs WHERE state = ? AND (shard IS NULL OR shard = ?)
+                                  ORDER BY priority DESC, enqueued_at LIMIT 1""", (QUEUED, shard)).fetchone()
+            if row is not None:
+                conn.execute("""UPDATE jobs SET state = ?, worker_pid = ?, started_at = ?, attempts = attempts + 1
+                                WHERE task_id = ?""", (RUNNING, worker_pid, time.time(), row["task_id"]))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["attempts"] += 1
+        return job
+
+    def finish(self, task_id, state=DONE):
+        """
+        Mark a job as finished.
+
+        Args:
+            task_id (str): The job's task ID.
+            state (str): DONE, FAILED, CANCELLED or TIMED_OUT.
+
+        Returns:
+            None
+        """
+        self.connection().execute("UPDATE jobs SET state = ?, finished_at = ? WHERE task_id = ?",
+                                  (state, time.time(), task_id))
+
+    def cancel(self, task_id):
+        """
+        Cancel a job. A queued job is dropped right away, a running one is killed by its scheduler.
+
+        Args:
+            task_id (str): The job's task ID.
+
+        Returns:
+            str: The job's state after the request, or None if there is no such job.
+        """
+        conn = self.connection()
+        conn.execute("UPDATE jobs SET state = ?, finished_at = ? WHERE task_id = ? AND state = ?",
+                     (CANCELLED, time.time(), task_id, QUEUED))
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE task_id = ? AND state = ?", (task_id, RUNNING))
+        row = conn.execute("SELECT state FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+        return row["state"] if row else None
+
+    def cancel_requested(self, task_ids):
+        """
+        Find which of the given running jobs were asked to stop.
+
+        Args:
+            task_ids (list): Task IDs of the jobs.
+
+        Returns:
+            set: Task IDs of the jobs with a pending cancel request.
+        """
+        if not task_ids:
+            return set()
+        rows = self.connection().execute(
+            f"SELECT task_id FROM jobs WHERE cancel_requested = 1 AND state = ? "
+            f"AND task_id IN ({','.join('?' * len(task_ids))})", (RUNNING, *task_ids))
+        return {row["task_id"] for row in rows}
+
+    def running_jobs(self):
+        """
+        List the jobs currently marked as running.
+
+        Returns:
+            list: Running jobs, payloads left encoded.
+        """
+        return [dict(row) for row in self.connection().execute("SELECT * FROM jobs WHERE state = ?", (RUNNING,))]
+
+    def requeue(self, task_id):
+        """
+        Put a job whose worker died back in the queue, or fail it once it used all its attempts.
+
+        Args:
+            task_id (str): The job's task ID.
+
+        Returns:
+            str: The job's new state.
+        """
+        conn = self.connection()
+        conn.execute("""UPDATE jobs SET state = CASE WHEN attempts < ? THEN ? ELSE ? END, worker_pid = NULL
+                        WHERE task_id = ? AND state = ?""", (self.max_attempts, QUEUED, FAILED, task_id, RUNNING))
+        row = conn.execute("SELECT state FROM jobs WHERE task_id = ?", (task_id,)).fetchone()
+        return row["state"] if row else None
@@ -0,0 +1,385 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+
+from .video_cache import file_sha256
+
+# Columns of an index entry, in table order
+MEDIA_FIELDS = ("path", "folder", "video_id", "size", "mtime", "sha256", "duration", "width", "height", "poster",
+                "status", "indexed_at")
+
+
+def iter_boxes(f, start, end):
+    """
+    Walk the MP4 boxes between two offsets of a file, reading their headers only.
+
+    Args:
+        f (file): The file, opened in binary mode.
+        start (int): Offset of the first box.
+        end (int): Offset the boxes stop at, the end of the parent box or of the file.
+
+    Yields:
+        tuple: (type, payload offset, end offset) of each box. The end offset is past `end` when the box is cut off.
+
+    Raises:
+        ValueError: If a box header is invalid.
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:  # 64-bit size after the type
+            size, = struct.unpack(">Q", f.read(8))
+            header_size = 16
+        elif size == 0:  # the box runs to the end of its parent
+            size = end - offset
+        if size < header_size:
+            raise ValueError(f"Invalid size of the {kind!r} box at offset {offset}")
+        yield kind, offset + header_size, offset + size
+        offset += size
+
+
+def _read_payload(f, start, end, length):
+    f.seek(start)
+    return f.read(min(length, end - start))
+
+
+def probe_mp4(path):
+    """
+    Read the duration and the resolution of an MP4 from its movie and track headers.
+    Only box headers are read, the media data is skipped, so a probe costs a few
+    small reads whatever the size of the file.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        dict: "duration" in seconds, "width" and "height" of the first video track (None when
+            unknown), and "complete", False when a box runs past the end of the file.
+
+    Raises:
+        ValueError: If the file isn't an MP4.
+    """
+    file_size = os.path.getsize(path)
+    info = {"duration": None, "width": None, "height": None, "complete": True}
+    with open(path, "rb") as f:
+        for i, (kind, start, end) in enumerate(iter_boxes(f, 0, file_size)):
+            if i == 0 and kind != b"ftyp":
+                raise ValueError(f"{path} isn't an MP4 file")
+            if end > file_size:
+                info["complete"] = False
+            if kind == b"moov":
+                _read_moov(f, start, min(end, file_size), info)
+    if info["duration"] is None and info["complete"]:
+        raise ValueError(f"{path} has no movie header")
+    return info
+
+
+def _read_moov(f, start, end, info):
+    for kind, payload, box_end in iter_boxes(f, start, end):
+        box_end = min(box_end, end)
+        if kind == b"mvhd":
+            data = _read_payload(f, payload, box_end, 32)
+            if data[0] == 1:
+                timescale, duration = struct.unpack_from(">IQ", data, 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", data, 12)
+            if timescale:
+                info["duration"] = round(duration / timescale, 3)
+        elif kind == b"trak" and info["width"] is None:
+            for track_kind, track_payload, track_end in iter_boxes(f, payload, box_end):
+                if track_kind != b"tkhd":
+                    continue
+                data = _read_payload(f, track_payload, min(track_end, box_end), 96)
+                offset = 52 if data[0] == 1 else 40  # transformation matrix
+                a, b = struct.unpack_from(">ii", data, offset)
+                width, height = struct.unpack_from(">II", data, offset + 36)
+                width, height = width >> 16, height >> 16  # 16.16 fixed point
+                if a == 0 and b != 0:  # rotated by 90 degrees, as players show it
+                    width, height = height, width
+                if width and height:  # audio tracks have no size
+                    info["width"], info["height"] = width, height
+
+
+def make_poster(video_path, poster_path, at=1.0, width=240):
+    """
+    Save one frame of a video as a small JPEG with ffmpeg, seeking on the input so
+    only the frames around `at` are decoded.
+
+    Args:
+        video_path (str): Path of the video.
+        poster_path (str): Path of the JPEG to write.
+        at (float): Position of the frame in seconds.
+        width (int): Width of the poster in pixels, the height keeps the aspect ratio.
+
+    Returns:
+        bool: True if the poster was written, False if ffmpeg isn't installed or failed.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return False
+    os.makedirs(os.path.dirname(poster_path), exist_ok=True)
+    tmp_path = f"{os.path.splitext(poster_path)[0]}.{os.getpid()}.tmp.jpg"
+    command = [ffmpeg, "-nostdin", "-v", "error", "-y", "-ss", f"{at:.3f}", "-i", video_path,
+               "-frames:v", "1", "-vf", f"scale={width}:-2", "-q:v", "5", tmp_path]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        result = None
+        print(f"Failed to make the poster of {video_path}: {e}")
+    if result is None or result.returncode != 0 or not os.path.isfile(tmp_path):
+        if result is not None:
+            print(f"Failed to make the poster of {video_path}: {result.stderr.decode(errors='replace').strip()}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, poster_path)
+    return True
+
+
+def inspect_video(path, poster_path=None, poster_width=240):
+    """
+    Everything the index stores about a video file. Runs in the indexer's process pool.
+
+    Args:
+        path (str): Path of the video.
+        poster_path (str): Path of the poster to write, None for no poster.
+        poster_width (int): Width of the poster in pixels.
+
+    Returns:
+        dict: "size", "mtime", "sha256", "duration", "width", "height", "status" ("ok", "truncated"
+            or "unreadable") and "poster", True if the poster was written.
+    """
+    stat_result = os.stat(path)
+    entry = {"size": stat_result.st_size, "mtime": stat_result.st_mtime, "sha256": file_sha256(path),
+             "duration": None, "width": None, "height": None, "status": "unreadable", "poster": False}
+    try:
+        probe = probe_mp4(path)
+    except (ValueError, struct.error) as e:
+        print(f"Failed to read {path}: {e}")
+        return entry
+    entry.update(duration=probe["duration"], width=probe["width"], height=probe["height"],
+                 status="ok" if probe["complete"] else "truncated")
+    if poster_path is not None and entry["status"] == "ok":
+        at = min(1.0, (entry["duration"] or 0) / 2)
+        entry["poster"] = make_poster(path, poster_path, at=at, width=poster_width)
+    return entry
+
+
+class MediaIndex:
+    """
+    An on-disk index of the downloaded videos: size, SHA-256, duration, resolution,
+    poster and integrity status of every file, so a gallery lists a folder with
+    one query and loads small JPEGs instead of the videos.
+
+    Files are inspected in a process pool once downloaded: the MP4 headers are
+    parsed in pure Python, and the poster is grabbed by ffmpeg when it is
+    installed. A file whose boxes run past its end is marked "truncated". Entries
+    live in a SQLite file shared by every process.
+
+    Attributes:
+        db_path (str): Path of the SQLite file.
+        videos_root (str): Directory of the downloaded videos, paths are indexed relative to it.
+        posters_root (str): Directory of the posters, one subfolder per video folder.
+        workers (int): Size of the process pool, 0 to inspect the files in the calling thread.
+        poster_width (int): Width of the posters in pixels.
+    """
+
+    def __init__(self, db_path="media.db", videos_root="videos", posters_root="posters", workers=2, poster_width=240):
+        """
+        Initialize the index, the process pool is started on the first file.
+
+        Args:
+            db_path (str): Path of the SQLite file.
+            videos_root (str): Directory of the downloaded videos.
+            posters_root (str): Directory of the posters.
+            workers (int): Size of the process pool, 0 to inspect the files in the calling thread.
+            poster_width (int): Width of the posters in pixels.
+        """
+        self.db_path = os.path.abspath(db_path)  # connections are opened per thread, maybe after a chdir
+        self.videos_root = videos_root
+        self.posters_root = posters_root
+        self.workers = workers
+        self.poster_width = poster_width
+        self.executor = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""CREATE TABLE IF NOT EXISTS media (
+                                path TEXT PRIMARY KEY,
+                                folder TEXT NOT NULL,
+                                video_id TEXT,
+                                size INTEGER NOT NULL,
+                                mtime REAL NOT NULL,
+                                sha256 TEXT,
+                                duration REAL,
+                                width INTEGER,
+                                height INTEGER,
+                                poster TEXT,
+                                status TEXT NOT NULL,
+                                indexed_at REAL NOT NULL
+                            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS media_folder ON media (folder, indexed_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS media_video_id ON media (video_id)")
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                # spawn like the job workers: forking a process with running threads isn't safe
+                self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            return self.executor
+
+    def add(self, path, video_id=None):
+        """
+        Index a downloaded video, in the process pool unless `workers` is 0.
+
+        A file already indexed with the same size and modification time is skipped, and
+        a video linked from the video cache reuses the entry of its other copy.
+
+        Args:
+            path (str): Path of the file, inside `videos_root`.
+            video_id (str): The TikTok video ID, read from the filename when None.
+
+        Returns:
+            Future: Completes once the entry is stored, None if there was nothing to inspect.
+        """
+        relative_path = os.path.relpath(path, self.videos_root)
+        if relative_path.startswith(os.pardir) or os.path.dirname(relative_path) == "":
+            return None
+        video_id = video_id or os.path.splitext(os.path.basename(relative_path))[0].split("_")[-1]  # tiktok_<user>_<id>
+        stat_result = os.stat(path)
+
+        conn = self._connection()
+        row = conn.execute("SELECT size, mtime FROM media WHERE path = ?", (relative_path,)).fetchone()
+        if row is not None and (row["size"], row["mtime"]) == (stat_result.st_size, stat_result.st_mtime):
+            return None
+        copy = conn.execute("SELECT * FROM media WHERE video_id = ? AND size = ? AND status = 'ok' LIMIT 1",
+                            (video_id, stat_result.st_size)).fetchone()
+        if copy is not None:
+            self._store(relative_path, video_id, {**dict(copy), "mtime": stat_result.st_mtime}, copy["poster"])
+            return None
+
+        folder, filename = os.path.split(relative_path)
+        poster = os.path.join(folder, os.path.splitext(filename)[0] + ".jpg")
+        args = (path, os.path.join(self.posters_root, poster), self.poster_width)
+        if self.workers <= 0:
+            entry = inspect_video(*args)
+            self._store(relative_path, video_id, entry, poster if entry["poster"] else None)
+            return None
+
+        # Waiters of the pool's future wake up before its callbacks run, hand out one set once the entry is stored
+        stored = Future()
+        self._executor().submit(inspect_video, *args).add_done_callback(
+            lambda future: self._stored(future, stored, relative_path, video_id, poster))
+        return stored
+
+    def _stored(self, future, stored, relative_path, video_id, poster):
+        try:
+            entry = future.result()
+            self._store(relative_path, video_id, entry, poster if entry["poster"] else None)
+        except Exception as e:  # the file was removed, or the pool was shut down
+            print(f"Failed to index {relative_path}: {e}")
+        finally:
+            stored.set_result(None)
+
+    def _store(self, relative_path, video_id, entry, poster):
+        with self._connection() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO media ({', '.join(MEDIA_FIELDS)}) "
+                         f"VALUES ({', '.join('?' * len(MEDIA_FIELDS))})",
+                         (relative_path, os.path.dirname(relative_path), video_id, entry["size"], entry["mtime"],
+                          entry["sha256"], entry["duration"], entry["width"], entry["height"], poster,
+                          entry["status"], time.time()))
+
+    def scan(self):
+        """
+        Index the videos downloaded before the index existed, or while it was turned off.
+
+        Returns:
+            list: Futures of the files being inspected.
+        """
+        futures = []
+        for folder in sorted(os.listdir(self.videos_root)) if os.path.isdir(self.videos_root) else []:
+            directory = os.path.join(self.videos_root, folder)
+            if folder.startswith(".") or not os.path.isdir(directory):  # .cache holds the same files
+                continue
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith(".mp4"):
+                    future = self.add(os.path.join(directory, filename))
+                    if future is not None:
+                        futures.append(future)
+        return futures
+
+    def list_videos(self, folder=None, limit=100, offset=0, status=None):
+        """
+        List indexed videos, most recently indexed first.
+
+        Args:
+            folder (str): Only list this folder of `videos_root`, e.g. "0_topic_videos".
+            limit (int): Maximum number of videos returned.
+            offset (int): Number of videos skipped.
+            status (str): Only list videos with this status: "ok", "truncated" or "unreadable".
+
+        Returns:
+            tuple: (list of entries, total number of matching videos). Each entry has the
+                "video" path served by the API, the poster's path or None, and the indexed fields.
+        """
+        conditions, params = [], []
+        if folder is not None:
+            conditions.append("folder = ?")
+            params.append(folder)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = self._connection()
+        total = conn.execute(f"SELECT COUNT(*) FROM media{where}", params).fetchone()[0]
+        rows = conn.execute(f"SELECT * FROM media{where} ORDER BY indexed_at DESC, path LIMIT ? OFFSET ?",
+                            params + [limit, offset]).fetchall()
+        entries = []
+        for row in rows:
+            entry = dict(row)
+            entry["video"] = "/" + os.path.join("videos", entry.pop("path"))
+            entry["poster"] = "/" + os.path.join("posters", entry["poster"]) if entry["poster"] else None
+            entries.append(entry)
+        return entries, total
+
+    def close(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+
+if __name__ == "__main__":
+    # Index the videos already on disk: python -m src.media_index
+    parser = argparse.ArgumentParser(description="Index the downloaded videos and make their posters.")
+    parser.add_argument("--db", default=os.environ.get("SCRAPER_MEDIA_INDEX", "media.db") or "media.db")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SCRAPER_MEDIA_WORKERS", 2)))
+    args = parser.parse_args()
+
+    media_index = MediaIndex(args.db, workers=args.workers)
+    futures = media_index.scan()
+    wait(futures)
+    media_index.close()
+    print(f"Indexed {len(futures)} videos.")
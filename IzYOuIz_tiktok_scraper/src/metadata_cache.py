@@ -0,0 +1,144 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds each field of a video's information stays fresh, None for never stale
+DEFAULT_TTLS = {
+    "video": None,
+    "videotiktok": None,
+    "song": None,
+    "userid": None,
+    "like_count": 600,
+    "comment_count": 600,
+    "share_count": 600,
+}
+
+
+class MetadataCache:
+    """
+    A memoization layer for embed page metadata, keyed by TikTok video ID.
+
+    Entries live in a bounded in-memory LRU and, optionally, in a SQLite file
+    shared by every process. Each field is fresh according to its own entry in
+    `ttls`: the song and the author never go stale, while the counters do after
+    a few minutes. An entry whose counters have expired is still handed out on
+    request, so callers can fall back to it when refreshing them fails.
+
+    Attributes:
+        max_entries (int): Maximum number of entries kept in memory.
+        ttls (dict): Freshness in seconds of each field, None for never stale.
+        disk_path (str): Path of the on-disk tier, None to keep entries in memory only.
+    """
+
+    def __init__(self, max_entries=10000, ttls=None, disk_path=None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries (int): Maximum number of entries kept in memory.
+            ttls (dict): Freshness in seconds of each field, merged into DEFAULT_TTLS.
+            disk_path (str): Path of the on-disk tier, None to keep entries in memory only.
+        """
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.disk_path = disk_path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        if disk_path:
+            with self._connection() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""CREATE TABLE IF NOT EXISTS metadata (
+                                    video_id TEXT PRIMARY KEY,
+                                    data TEXT NOT NULL,
+                                    fetched_at REAL NOT NULL
+                                )""")
+
+    def _connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.disk_path, timeout=30)
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def stale_fields(self, video_info, fetched_at):
+        """
+        List the fields of an entry that are missing or past their TTL.
+
+        Args:
+            video_info (dict): The cached video information.
+            fetched_at (float): When the information was extracted.
+
+        Returns:
+            list: The names of the fields that need to be extracted again.
+        """
+        age = time.time() - fetched_at
+        return [field for field, ttl in self.ttls.items()
+                if field not in video_info or (ttl is not None and age >= ttl)]
+
+    def _is_usable(self, entry, allow_stale):
+        if entry is None:
+            return False
+        stale = self.stale_fields(*entry)
+        # Expired counters are only outdated, a missing static field makes the entry useless
+        return not stale or (allow_stale and all(self.ttls[field] is not None and field in entry[0]
+                                                  for field in stale))
+
+    def get(self, video_id, allow_stale=False):
+        """
+        Get the information of a video.
+
+        Args:
+            video_id (str): The TikTok video ID.
+            allow_stale (bool): Whether to also return an entry whose counters have expired,
+                as long as its static fields are all present.
+
+        Returns:
+            dict: A copy of the video information, or None if it is missing or stale.
+        """
+        with self.lock:
+            entry = self.entries.get(video_id)
+            if entry is not None:
+                self.entries.move_to_end(video_id)
+
+        # Another process may have refreshed the entry on disk
+        if not self._is_usable(entry, allow_stale=False) and self.disk_path:
+            row = self._connection().execute("SELECT data, fetched_at FROM metadata WHERE video_id = ?",
+                                             (video_id,)).fetchone()
+            if row is not None:
+                entry = (json.loads(row[0]), row[1])
+                self._remember(video_id, entry)
+
+        if not self._is_usable(entry, allow_stale):
+            return None
+        return dict(entry[0])
+
+    def put(self, video_id, video_info):
+        """
+        Store freshly extracted video information.
+
+        Args:
+            video_id (str): The TikTok video ID.
+            video_info (dict): The video information.
+
+        Returns:
+            None
+        """
+        entry = (dict(video_info), time.time())
+        self._remember(video_id, entry)
+        if self.disk_path:
+            with self._connection() as conn:
+                conn.execute("INSERT OR REPLACE INTO metadata (video_id, data, fetched_at) VALUES (?, ?, ?)",
+                             (video_id, json.dumps(entry[0]), entry[1]))
+
+    def _remember(self, video_id, entry):
+        with self.lock:
+            self.entries[video_id] = entry
+            self.entries.move_to_end(video_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
@@ -0,0 +1,174 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, float("inf"))
+
+METRIC_PREFIX = "tiktok_scraper_"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}" if labels else ""
+
+
+class Metrics:
+    """
+    Counters and latency histograms of one job, thread safe.
+
+    Samples are kept flat under their Prometheus names, e.g.
+    `stage_seconds_bucket{stage="scroll",le="0.5"}`, so the snapshots of
+    several jobs and processes can be summed and rendered without a schema.
+
+    Attributes:
+        started_at (float): time.monotonic() when the metrics were created.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Initialize empty metrics.
+
+        Args:
+            buckets (tuple): Upper bounds in seconds of the latency histogram buckets, ending with infinity.
+        """
+        self.buckets = buckets
+        self.samples = {}
+        self.flushed = {}  # samples as of the last `delta`
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def inc(self, name, amount=1, **labels):
+        """
+        Increment a counter.
+
+        Args:
+            name (str): Counter name, ending with "_total".
+            amount (float): Value added to the counter.
+            **labels: Prometheus labels of the series.
+
+        Returns:
+            None
+        """
+        key = name + _labels(**labels)
+        with self.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def observe(self, stage, seconds):
+        """
+        Record the duration of one run of a stage in the stage latency histogram.
+
+        Args:
+            stage (str): Stage name, e.g. "scroll" or "download".
+            seconds (float): Duration of the run.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            for bound in self.buckets:  # cumulative buckets, every one of them is exposed
+                key = "stage_seconds_bucket" + _labels(stage=stage, le=_format_value(bound))
+                self.samples[key] = self.samples.get(key, 0) + (seconds <= bound)
+            for suffix, amount in (("sum", seconds), ("count", 1)):
+                key = f"stage_seconds_{suffix}" + _labels(stage=stage)
+                self.samples[key] = self.samples.get(key, 0) + amount
+            count, total = self.stages.get(stage, (0, 0.0))
+            self.stages[stage] = (count + 1, total + seconds)
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Time the body of a `with` block as one run of `stage`, failed runs included.
+
+        Args:
+            stage (str): Stage name.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Copy the samples.
+
+        Returns:
+            dict: Prometheus sample name -> value.
+        """
+        with self.lock:
+            return dict(self.samples)
+
+    def delta(self):
+        """
+        Copy how much the samples grew since the previous call, so a running job
+        can add its metrics to the shared totals bit by bit.
+
+        Returns:
+            dict: Prometheus sample name -> increase, unchanged samples left out.
+        """
+        with self.lock:
+            delta = {key: value - self.flushed.get(key, 0) for key, value in self.samples.items()
+                     if value != self.flushed.get(key, 0)}
+            self.flushed = dict(self.samples)
+        return delta
+
+    def summary(self):
+        """
+        Summarize the job for its task status.
+
+        Returns:
+            dict: Elapsed seconds, counters, per-stage run counts and seconds, videos/s and bytes/s.
+        """
+        elapsed = time.monotonic() - self.started_at
+        with self.lock:
+            counters = {name: value for name, value in self.samples.items() if name.endswith("_total")}
+            stages = {stage: {"count": count, "seconds": round(total, 3)}
+                      for stage, (count, total) in self.stages.items()}
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "counters": counters,
+            "stages": stages,
+            "videos_per_second": round(counters.get("videos_downloaded_total", 0) / elapsed, 3) if elapsed else 0,
+            "bytes_per_second": round(counters.get("download_bytes_total", 0) / elapsed, 1) if elapsed else 0,
+        }
+
+
+def render_prometheus(samples, prefix=METRIC_PREFIX):
+    """
+    Render samples in the Prometheus text exposition format.
+
+    Args:
+        samples (dict): Prometheus sample name -> value, as returned by `Metrics.snapshot`.
+        prefix (str): Prefix added to every metric name.
+
+    Returns:
+        str: The exposition text.
+    """
+    families = {}
+    for key, value in samples.items():
+        name = re.match(r"[a-zA-Z_:][a-zA-Z0-9_:]*", key).group(0)
+        family = re.sub(r"_(bucket|sum|count)$", "", name)
+        kind = "histogram" if family != name else "counter"
+        families.setdefault((family, kind), []).append((key, value))
+
+    lines = []
+    for (family, kind), family_samples in sorted(families.items()):
+        lines.append(f"# TYPE {prefix}{family} {kind}")
+        lines.extend(f"{prefix}{key} {_format_value(value)}" for key, value in sorted(family_samples, key=_sort_key))
+    return "\n".join(lines) + "\n"
+
+
+def _sort_key(sample):
+    # Keep histogram buckets in increasing order of their bound, +Inf last
+    key = sample[0]
+    bound = re.search(r'le="([^"]+)"', key)
+    series = re.sub(r',?le="[^"]+"', "", key)
+    return series, float(bound.group(1).replace("+Inf", "inf")) if bound else 0.0
@@ -0,0 +1,146 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_DONE = object()
+
+
+class StreamingPipeline:
+    """
+    Overlaps the three stages of a job instead of running them one after the other.
+
+    1. The calling thread iterates the scraper's URL generator, which drives Chrome.
+    2. A metadata thread takes the URLs from a bounded queue in small batches and
+       resolves them through the metadata cache and the HTTP embed extractor.
+    3. A thread pool downloads every video as soon as its information is known.
+
+    The queue and a semaphore on in-flight downloads bound memory, so a slow
+    stage makes the ones before it wait instead of piling up work. Videos the
+    HTTP extractor couldn't handle need the browser, they are rendered in tabs
+    once URL collection is over and downloaded last.
+
+    Attributes:
+        scraper (TikTokScraper): Scraper providing the URL generator and the metadata stages.
+        downloader (VideoDownloader): Downloader of the videos, its `max_workers` sizes the download pool.
+        batch_size (int): Maximum number of URLs resolved by one metadata call.
+        queue_size (int): Maximum number of URLs waiting for their metadata.
+        max_pending_downloads (int): Maximum number of videos queued or being downloaded.
+    """
+
+    def __init__(self, scraper, downloader, batch_size=8, queue_size=64, max_pending_downloads=16):
+        """
+        Initialize the pipeline.
+
+        Args:
+            scraper (TikTokScraper): Scraper providing the URL generator and the metadata stages.
+            downloader (VideoDownloader): Downloader of the videos.
+            batch_size (int): Maximum number of URLs resolved by one metadata call.
+            queue_size (int): Maximum number of URLs waiting for their metadata.
+            max_pending_downloads (int): Maximum number of videos queued or being downloaded.
+        """
+        self.scraper = scraper
+        self.downloader = downloader
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_pending_downloads = max_pending_downloads
+
+    def run(self, video_urls, output_dir, on_collected=None):
+        """
+        Run a job through the pipeline.
+
+        Args:
+            video_urls (iterable): URLs of the videos, typically one of the scraper's generators.
+            output_dir (str): Directory to save the downloaded videos.
+            on_collected (callable): Called without arguments once every URL has been collected.
+
+        Returns:
+            list: Information of the scraped videos in discovery order, each "video"
+                replaced by the local path of the download.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        self.scraper.failed_videos = []
+
+        urls = []  # every discovered URL, by discovery index
+        results = {}  # discovery index -> video information
+        deferred = []  # discovery indexes left for the browser
+        url_queue = queue.Queue(maxsize=self.queue_size)
+        slots = threading.BoundedSemaphore(self.max_pending_downloads)
+        errors = []
+
+        with ThreadPoolExecutor(max_workers=max(1, self.downloader.max_workers)) as executor:
+            def download(index):
+                try:
+                    self.downloader.process_video_info(results[index], output_dir, index=index)
+                except Exception as e:  # nobody reads the future, report the video as failed here
+                    print(f"Error downloading {results[index].get('videotiktok')}: {e}")
+                    self.scraper.failed_videos.append({"videotiktok": results[index].get("videotiktok"),
+                                                       "error": str(e)})
+                    self.downloader.emit("video_downloaded", index=index, path=None, video_info=results[index])
+                finally:
+                    slots.release()
+
+            def submit(index):
+                slots.acquire()  # backpressure: wait for a download slot
+                executor.submit(download, index)
+
+            def resolve_metadata():
+                finished = False
+                try:
+                    while not finished:
+                        batch = [url_queue.get()]
+                        while len(batch) < self.batch_size and batch[-1] is not _DONE:
+                            try:
+                                batch.append(url_queue.get_nowait())
+                            except queue.Empty:
+                                break
+                        if batch[-1] is _DONE:
+                            batch.pop()
+                            finished = True
+                        if not batch:
+                            continue
+
+                        indexes = [index for index, _ in batch]
+                        infos, pending = self.scraper.fetch_video_information([url for _, url in batch])
+                        pending = set(pending)
+                        for position, index in enumerate(indexes):
+                            if position in pending:
+                                deferred.append(index)
+                            else:
+                                results[index] = infos[position]
+                                submit(index)
+                except Exception as e:
+                    errors.append(e)
+                    while not finished and url_queue.get() is not _DONE:  # unblock the producer
+                        pass
+
+            metadata_thread = threading.Thread(target=resolve_metadata, name="metadata-stage", daemon=True)
+            metadata_thread.start()
+
+            try:
+                for url in video_urls:
+                    url_queue.put((len(urls), url))
+                    urls.append(url)
+            except Exception as e:
+                print(f"Error scraping video URLs: {e}")
+            finally:
+                url_queue.put(_DONE)
+                metadata_thread.join()
+
+            if on_collected is not None:
+                on_collected()
+            if errors:
+                raise errors[0]
+
+            if deferred:
+                deferred.sort()
+                rendered = [None] * len(urls)
+                self.scraper.scrape_embed_pages_in_tabs(urls, deferred, rendered)
+                for index in deferred:
+                    if rendered[index] is not None:
+                        results[index] = rendered[index]
+                        submit(index)
+
+        video_infos = [results[index] for index in sorted(results)]
+        print(f"Scraped information for {len(video_infos)}/{len(urls)} videos.")
+        return video_infos
@@ -0,0 +1,210 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value (str): Either a number of seconds or an HTTP date.
+
+    Returns:
+        float: Number of seconds to wait, or None if the value can't be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket with adaptive (AIMD) rate control.
+
+    Every 429 halves the refill rate and blocks the bucket until the server's
+    Retry-After has passed, every success slowly raises the rate back up.
+
+    Attributes:
+        rate (float): Current number of tokens added per second.
+        min_rate (float): Lower bound for the adaptive rate.
+        max_rate (float): Upper bound for the adaptive rate.
+        capacity (int): Maximum number of tokens the bucket can hold.
+        backoff (float): Delay applied to the next 429 without a Retry-After.
+    """
+
+    def __init__(self, rate=2.0, capacity=4, min_rate=0.1, max_rate=None, base_backoff=5, max_backoff=120):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate (float): Initial number of tokens added per second.
+            capacity (int): Maximum burst size.
+            min_rate (float): Lower bound for the adaptive rate.
+            max_rate (float): Upper bound for the adaptive rate, defaults to `rate`.
+            base_backoff (float): First delay applied on a 429 without a Retry-After.
+            max_backoff (float): Maximum delay applied on a 429 without a Retry-After.
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.capacity = capacity
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.backoff = base_backoff
+        self.tokens = float(capacity)
+        self.blocked_until = 0.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        Block until a token is available and take it.
+
+        Returns:
+            float: Number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def penalize(self, retry_after=None):
+        """
+        Record a rate-limit response.
+
+        Args:
+            retry_after (float): Seconds requested by the server, if it sent any.
+
+        Returns:
+            float: Number of seconds the bucket is blocked for.
+        """
+        with self.lock:
+            if retry_after is None:
+                delay = self.backoff
+                self.backoff = min(self.max_backoff, self.backoff * 2)
+            else:
+                delay = retry_after
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            return delay
+
+    def reward(self):
+        """
+        Record a successful request, slowly restoring the rate and backoff.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.min_rate)
+            self.backoff = max(self.base_backoff, self.backoff / 2)
+
+
+class AsyncTokenBucket(TokenBucket):
+    """
+    A TokenBucket whose `acquire` waits with asyncio.sleep, so a rate-limited
+    download never blocks the event loop. `penalize` and `reward` don't wait
+    and are shared with TokenBucket.
+    """
+
+    async def acquire(self):
+        """
+        Wait until a token is available and take it.
+
+        Returns:
+            float: Number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """
+    A collection of token buckets, one per host.
+
+    Attributes:
+        bucket_options (dict): Keyword arguments used to create each bucket.
+        buckets (dict): Token buckets indexed by host.
+    """
+
+    bucket_class = TokenBucket
+
+    def __init__(self, **bucket_options):
+        """
+        Initialize the limiter.
+
+        Args:
+            **bucket_options: Keyword arguments forwarded to `TokenBucket`.
+        """
+        self.bucket_options = bucket_options
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, url):
+        """
+        Get the bucket shared by every request to the host of `url`.
+
+        Args:
+            url (str): Any URL on the host.
+
+        Returns:
+            TokenBucket: The host's bucket.
+        """
+        host = urlparse(url).netloc or url
+        with self.lock:
+            if host not in self.buckets:
+                self.buckets[host] = self.bucket_class(**self.bucket_options)
+            return self.buckets[host]
+
+    def acquire(self, url):
+        return self.bucket(url).acquire()
+
+    def penalize(self, url, retry_after=None):
+        return self.bucket(url).penalize(retry_after)
+
+    def reward(self, url):
+        self.bucket(url).reward()
+
+
+class AsyncRateLimiter(RateLimiter):
+    """
+    A RateLimiter of AsyncTokenBuckets, `acquire` has to be awaited.
+    """
+
+    bucket_class = AsyncTokenBucket
+
+    async def acquire(self, url):
+        return await self.bucket(url).acquire()
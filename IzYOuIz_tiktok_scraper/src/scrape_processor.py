@@ -1,39 +1,96 @@
+import asyncio
 import os
 import random
+import threading
 import time
+from concurrent.futures import wait
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-import undetected_chromedriver as uc
-from .download import VideoDownloader
+from .browser_pool import create_chrome_driver
+from .checkpoint import FeedCheckpoint
+from .download import VideoDownloader, get_video_id
+from .embed_extractor import EMBED_URL, HttpEmbedExtractor, normalize_counts, parse_count
+from .export import ResultExporter
+from .media_index import MediaIndex
+from .metadata_cache import MetadataCache
+from .metrics import Metrics
+from .pipeline import StreamingPipeline
+from .task_store import create_task_store
+from .wait_engine import AdaptiveWaiter
+from .video_cache import VideoCache
 from uuid import uuid4
 
 
+# Reads the song, the like/comment/share counters and the author of an embed page
+EMBED_INFO_SCRIPT = '''
+const text = (selector) => {
+    const element = document.querySelector(selector);
+    return element ? element.innerText : null;
+};
+const stats = Array.from(document.querySelectorAll('[data-e2e="Player-Layer-LayerText"]')).map(e => e.innerText);
+while (stats.length < 3) {
+    stats.push('0');
+}
+return {
+    song: text('[data-e2e="video-v2-Card-CardMusic"]'),
+    stats: stats,
+    userid: text('[data-e2e="video-v2-Card-CardUserSpan"]'),
+};
+'''
 
-def random_delay(min_delay=3, max_delay=6):
-    """
-    Introduce a random delay to mimic human behavior.
 
-    Args:
-        min_delay (int): Minimum delay in seconds.
-        max_delay (int): Maximum delay in seconds.
+TIKTOK_URL = "https://www.tiktok.com/"
+CREATIVE_CENTER_URL = "https://ads.tiktok.com/business/creativecenter/inspiration/"
+
+# CSS selectors of the content each page grows as it is scrolled
+VIDEO_LINK_SELECTOR = 'a[href*="/video/"]'
+EMBED_FRAME_SELECTOR = 'iframe[src*="/embed/"]'
+HASHTAG_SELECTOR = '.CardPc_titleText__RYOWo'
 
-    Returns:
-        None
-    """
-    delay = random.uniform(min_delay, max_delay)
-    print(f"Sleeping for {round(delay, 2)} seconds...")
-    time.sleep(delay)
 
 class TikTokScraper:
-    def __init__(self, user_data_dir=None, retry_delay=2, max_retries=10):
+    def __init__(self, user_data_dir=None, retry_delay=2, max_retries=10, browser_pool=None, embed_tabs=4,
+                 embed_extractor=None, metadata_cache=None, waiter=None, tiktok_url=TIKTOK_URL,
+                 creative_center_url=CREATIVE_CENTER_URL, embed_url=EMBED_URL, proxy=None):
         self.user_data_dir = user_data_dir
+        self.proxy = proxy  # Chrome's proxy when it isn't checked out of a browser pool
+        self.tiktok_url = tiktok_url  # base URLs, pointed at local fixture pages by the benchmarks
+        self.creative_center_url = creative_center_url
+        self.embed_url = embed_url
+        self.browser_pool = browser_pool
+        self.driver = None
+        self.pages_loaded = 0
+        self.driver_broken = False  # the driver is in an unknown state, don't hand it to the next job
         self.retry_delay = retry_delay
         self.max_retries = max_retries
         self.last_count = 0
         self.retry_count = 0
         self.max_videos = 4
         self.max_scroll_count = 4
+        self.embed_tabs = embed_tabs
+        self.embed_extractor = embed_extractor
+        self.metadata_cache = metadata_cache
+        self.event_callback = None
+        self.failed_videos = []
+        self.waiter = waiter or AdaptiveWaiter()
+        self.metrics = Metrics()
+        self.watched_selector = None  # content the current page grows, set by each scrape method
+        self.watched_count = 0
         
+    def emit(self, event, **data):
+        """
+        Reports a scraping event to `event_callback`, if one is set.
+
+        Args:
+            event (str): Event name, "video_found" or "video_scraped".
+            **data: Event payload.
+
+        Returns:
+            None
+        """
+        if self.event_callback is not None:
+            self.event_callback(event, **data)
+
     def set_max_videos(self, max):
         self.max_videos = max
         
@@ -42,93 +99,289 @@ class TikTokScraper:
 
     def get_chrome_driver(self):
         """
-        Sets up a full browser mode undetected Chrome WebDriver.
+        Sets up a full browser mode undetected Chrome WebDriver, or checks out a
+        warm one when the scraper was given a browser pool.
 
         Returns:
             WebDriver: Configured Selenium WebDriver instance.
         """
-        options = uc.ChromeOptions()
-        options.add_argument("--disable-notifications")  # Disable unnecessary notifications
+        with self.metrics.span("chrome_start"):
+            if self.browser_pool is not None:
+                self.driver = self.browser_pool.checkout()
+            else:
+                self.driver = create_chrome_driver(self.user_data_dir, proxy=self.proxy)
+        self.pages_loaded = 0
+        self.driver_broken = False
+        return self.driver
 
-        if self.user_data_dir:
-            options.add_argument(f"--user-data-dir={self.user_data_dir}")  # Load user session
-            print(f"Using Chrome user data directory: {self.user_data_dir}")
+    def release_driver(self):
+        """
+        Returns the driver to the browser pool, or quits it when there is no pool.
+        A driver left in an unknown state is recycled by the pool.
 
-        # Use undetected ChromeDriver
-        print("Running Selenium in undetected full browser mode.")
-        self.driver = uc.Chrome(options=options)
-        return self.driver
+        Returns:
+            None
+        """
+        if self.driver is None:
+            return
+        if self.browser_pool is not None:
+            self.browser_pool.checkin(self.driver, pages=self.pages_loaded, recycle=self.driver_broken)
+        else:
+            self.driver.quit()
+        self.driver = None
+
+    def load_page(self, url):
+        """
+        Navigates the current driver to `url`, counting page loads for browser recycling.
+
+        Args:
+            url (str): URL to open.
+
+        Returns:
+            None
+        """
+        self.pages_loaded += 1
+        self.waiter.end_pass()  # a new page gets its full timeouts
+        self.driver.get(url)
+
+    def watch(self, selector):
+        """
+        Sets the content the following waits watch on the current page.
+
+        Args:
+            selector (str): CSS selector of the elements the page adds as it is scrolled.
+
+        Returns:
+            None
+        """
+        self.watched_selector = selector
+        self.watched_count = 0
+
+    def wait_for_content(self, timeout=None):
+        """
+        Waits until the page is loaded and shows more of the watched elements than last time.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait for new elements, the waiter's timeout by default.
+
+        Returns:
+            bool: True if new elements appeared.
+        """
+        self.waiter.wait_for_ready(self.driver)
+        count = self.waiter.wait_for_more(self.driver, self.watched_selector, self.watched_count, timeout)
+        grew = count > self.watched_count
+        self.watched_count = count
+        return grew
 
     def scroll(self,min_s=300, max_s=800):
-        scroll_count = 0
-        scroll_height = self.driver.execute_script("return document.body.scrollHeight")
-        current_scroll_position = 0
-
-        # Scroll and detect the bottom
-        while current_scroll_position < scroll_height and self.max_scroll_count > scroll_count:
-            current_scroll_position += random.randint(min_s, max_s)  # Mimic a human scroll
-            self.driver.execute_script(f"window.scrollTo(0, {current_scroll_position});")
-            print(f"Scrolled to {current_scroll_position}px.")
-            random_delay(1, 3)
+        with self.metrics.span("scroll"):
+            scroll_count = 0
             scroll_height = self.driver.execute_script("return document.body.scrollHeight")
-            scroll_count += 1
+            current_scroll_position = 0
+
+            # Scroll and detect the bottom
+            while current_scroll_position < scroll_height and self.max_scroll_count > scroll_count:
+                current_scroll_position += random.randint(min_s, max_s)  # Mimic a human scroll
+                self.driver.execute_script(f"window.scrollTo(0, {current_scroll_position});")
+                print(f"Scrolled to {current_scroll_position}px.")
+                self.wait_for_content(timeout=2)
+                scroll_height = self.driver.execute_script("return document.body.scrollHeight")
+                scroll_count += 1
         
     def is_progress_stalled(self, len_):
         if len_ == self.last_count:
             self.retry_count += 1
-            print(f"No new videos found. Attempt {self.retry_count}/{self.max_retries}. Waiting for {self.retry_delay} seconds...")
-            random_delay(self.retry_delay, self.retry_delay + 3)
+            print(f"No new videos found. Attempt {self.retry_count}/{self.max_retries}. Waiting up to {self.retry_delay + 3} seconds, within the pass budget...")
             if self.retry_count >= self.max_retries:
                 print("Maximum retries reached. Stopping scraping.")
                 return True
+            if self.wait_for_content(timeout=self.retry_delay + 3):
+                print("New content appeared. Continuing scraping...")
+                return False
             self.driver.refresh()
+            self.watched_count = 0
             print("Page refreshed. Continuing scraping...")
         else:
             self.last_count = len_
         return False
 
-    def scrape_tiktok_video_information(self, video_urls):
+    def scrape_tiktok_video_information(self, video_urls, tabs=None):
         """
         Scrape video information (comments, description, and music name) from TikTok video URLs.
 
+        Videos with fresh information in `metadata_cache` are not fetched again.
+        When the scraper has an `embed_extractor` the other embed pages are first
+        parsed over plain HTTP, only the videos it couldn't handle are rendered in Chrome.
+        A video that fails in both is recorded in `failed_videos` and doesn't stop the others.
+
         Args:
             video_urls (list): List of TikTok video URLs.
+            tabs (int): Number of browser tabs loading embed pages in parallel, defaults to `embed_tabs`.
 
         Returns:
-            list: List of dictionaries containing video information.
+            list: List of dictionaries containing video information, in the order of `video_urls`.
         """
-        video_infos = []
-        try:
-            for video_url in video_urls:
-                video_id = video_url.split("/")[-1]
-                self.driver.get("https://www.tiktok.com/embed/v2/"+video_id)
-                WebDriverWait(self.driver, 10).until(lambda d: d.execute_script("return document.readyState") == "complete")
-
-                # Scraping the video informations
-                song = self.driver.execute_script('''return document.querySelector('[data-e2e="video-v2-Card-CardMusic"]').innerText''')
-                vid_stats = self.driver.execute_script('''try {
-                                                    return texts = Array.from(document.querySelectorAll('[data-e2e="Player-Layer-LayerText"]'))
-                                                                    .map(e => e.innerText);
-                                                } catch (error) {
-                                                    return ['0', '0', '0']
-                                                }''')
-                userid = self.driver.execute_script('''return document.querySelector('[data-e2e="video-v2-Card-CardUserSpan"]').innerText''')
-                video_infos.append({
-                    "video": f"https://www.tiktok.com/{userid}/video/{video_id}",  # change it
-                    "videotiktok": f"https://www.tiktok.com/{userid}/video/{video_id}",
-                    "song": song,
-                    "userid": userid,
-                    "like_count": vid_stats[0],
-                    "comment_count": vid_stats[1],
-                    "share_count": vid_stats[2],
-                })
+        self.failed_videos = []
+        with self.metrics.span("video_information"):
+            results, pending = self.fetch_video_information(video_urls)
 
-        except Exception as e:
-            print(f"Error scraping video information: {e}")
+            if pending:
+                self.scrape_embed_pages_in_tabs(video_urls, pending, results, tabs)
 
+        video_infos = [video_info for video_info in results if video_info is not None]
+        print(f"Scraped information for {len(video_infos)}/{len(video_urls)} videos.")
         return video_infos
 
-    def scrape_tiktok_videos(self, url_param, batch_size=50, rest_seconds=5):
+    def fetch_video_information(self, video_urls):
+        """
+        The browserless part of `scrape_tiktok_video_information`: the metadata cache, then plain HTTP,
+        then the cached entries whose counters have expired.
+
+        Args:
+            video_urls (list): List of TikTok video URLs.
+
+        Returns:
+            tuple: The video information at each index (None where missing) and the
+                indexes of the videos that still need to be rendered in Chrome.
+        """
+        results = [None] * len(video_urls)
+        pending = list(range(len(video_urls)))
+
+        if self.metadata_cache is not None:
+            missing = []
+            for i in pending:
+                results[i] = self.metadata_cache.get(get_video_id(video_urls[i]))
+                if results[i] is None:
+                    missing.append(i)
+                else:
+                    results[i] = normalize_counts(results[i])
+                    self.emit("video_scraped", video_info=results[i])
+            print(f"Metadata cache hits: {len(pending) - len(missing)}/{len(pending)}")
+            self.metrics.inc("metadata_cache_hits_total", len(pending) - len(missing))
+            pending = missing
+
+        if self.embed_extractor is not None and pending:
+            with self.metrics.span("embed_http"):
+                extracted = self.embed_extractor.extract_many([get_video_id(video_urls[i]) for i in pending])
+            missing = []
+            for i, video_info in zip(pending, extracted):
+                if isinstance(video_info, Exception):
+                    self.metrics.inc("embed_http_failures_total")
+                    # Outdated counters beat rendering the page in Chrome
+                    stale = None
+                    if self.metadata_cache is not None:
+                        stale = self.metadata_cache.get(get_video_id(video_urls[i]), allow_stale=True)
+                    if stale is not None:
+                        print(f"HTTP extraction failed for {video_urls[i]}: {video_info}. Using the stale cached counters.")
+                        self.metrics.inc("metadata_cache_stale_total")
+                        results[i] = normalize_counts(stale)
+                        self.emit("video_scraped", video_info=results[i])
+                    else:
+                        print(f"HTTP extraction failed for {video_urls[i]}: {video_info}. Falling back to the browser...")
+                        missing.append(i)
+                else:
+                    results[i] = video_info
+                    self.remember_video_information(video_urls[i], video_info)
+            pending = missing
+
+        return results, pending
+
+    def remember_video_information(self, video_url, video_info):
+        if self.metadata_cache is not None:
+            self.metadata_cache.put(get_video_id(video_url), video_info)
+        self.emit("video_scraped", video_info=video_info)
+
+    def scrape_embed_pages_in_tabs(self, video_urls, indexes, results, tabs=None):
+        """
+        Render embed pages in Chrome, `tabs` at a time: every tab starts navigating
+        before the first one is read, so the page loads overlap.
+
+        Args:
+            video_urls (list): List of TikTok video URLs.
+            indexes (list): Indexes in `video_urls` of the videos to scrape.
+            results (list): List receiving the video information at each index.
+            tabs (int): Number of browser tabs loading embed pages in parallel, defaults to `embed_tabs`.
+
+        Returns:
+            None
+        """
+        with self.metrics.span("embed_browser"):
+            tabs = max(1, tabs or self.embed_tabs)
+
+            main_handle = self.driver.current_window_handle
+            handles = [main_handle]
+            try:
+                for _ in range(min(tabs, len(indexes)) - 1):
+                    self.driver.switch_to.new_window("tab")
+                    handles.append(self.driver.current_window_handle)
+
+                for start in range(0, len(indexes), len(handles)):
+                    batch = list(zip(handles, indexes[start:start + len(handles)]))
+
+                    # Start every navigation first, then collect the pages in order
+                    for handle, i in batch:
+                        self.driver.switch_to.window(handle)
+                        self.pages_loaded += 1
+                        self.driver.execute_script("window.location.href = arguments[0];",
+                                                   self.embed_url + get_video_id(video_urls[i]))
+
+                    for handle, i in batch:
+                        video_id = get_video_id(video_urls[i])
+                        try:
+                            self.driver.switch_to.window(handle)
+                            results[i] = self.read_embed_page(video_id)
+                            self.remember_video_information(video_urls[i], results[i])
+                        except Exception as e:
+                            print(f"Error scraping video information for {video_id}: {e}")
+                            self.failed_videos.append({"videotiktok": video_urls[i], "error": str(e)})
+            except Exception as e:
+                print(f"Error scraping video information: {e}")
+            finally:
+                for handle in handles[1:]:
+                    try:
+                        self.driver.switch_to.window(handle)
+                        self.driver.close()
+                    except Exception:
+                        pass
+                try:
+                    self.driver.switch_to.window(main_handle)
+                except Exception as e:
+                    # Don't mask the original error or lose the pages already read
+                    print(f"Could not switch back to the main tab: {e}. The browser will be recycled.")
+                    self.driver_broken = True
+
+    def read_embed_page(self, video_id):
+        """
+        Read the video information from the embed page open in the current tab.
+
+        Args:
+            video_id (str): ID of the video the tab is navigating to.
+
+        Returns:
+            dict: Video information.
+        """
+        WebDriverWait(self.driver, 10).until(lambda d: d.execute_script(
+            "return document.readyState === 'complete' && location.pathname.endsWith(arguments[0]);", video_id))
+
+        # Scraping the video informations in a single round-trip
+        info = self.driver.execute_script(EMBED_INFO_SCRIPT)
+        if not info["song"] or not info["userid"]:
+            raise ValueError("embed page has no video card")
+
+        userid = info["userid"]
+        vid_stats = info["stats"]
+        return {
+            "video": f"https://www.tiktok.com/{userid}/video/{video_id}",  # change it
+            "videotiktok": f"https://www.tiktok.com/{userid}/video/{video_id}",
+            "song": info["song"],
+            "userid": userid,
+            "like_count": parse_count(vid_stats[0]),
+            "comment_count": parse_count(vid_stats[1]),
+            "share_count": parse_count(vid_stats[2]),
+        }
+
+    def scrape_tiktok_videos(self, url_param, batch_size=50, rest_seconds=5, checkpoint=None, task_id=None,
+                             incremental=False, stop_after_known=5):
         """
         Scrapes TikTok video URLs from a page in batches with rest intervals.
 
@@ -136,141 +389,438 @@ class TikTokScraper:
             url_param (str): URL parameter for the TikTok page.
             batch_size (int): Number of videos to scrape before resting.
             rest_seconds (int): Seconds to rest between batches.
+            checkpoint (FeedCheckpoint): The feed's checkpoint, or None.
+            task_id (str): ID of the job, used to save and resume its progress.
+            incremental (bool): Only collect videos the checkpoint hasn't seen yet.
+            stop_after_known (int): Number of consecutive known videos that ends an incremental scrape.
 
         Returns: list of video information.
         """
-        driver = self.get_chrome_driver()
-        driver.get(f"https://www.tiktok.com/{url_param}")
-
-        video_urls = []
+        self.get_chrome_driver()
 
         try:
-            while len(video_urls) < self.max_videos:
-                WebDriverWait(driver, 10).until(lambda d: d.execute_script("return document.readyState") == "complete")
-                random_delay() # wait for video to load
-                self.scroll(self.max_scroll_count)
-
-                # Check for new videos
-                videos = driver.find_elements(By.XPATH, '//a[contains(@href, "/video/")]')
-                for video in videos:
-                    url = video.get_attribute("href")
-                    if url and url not in video_urls:
-                        video_urls.append(url)
-                        print(f"Scraped: {url} ({len(video_urls)}/{self.max_videos})")
-                        if len(video_urls) >= self.max_videos:
-                            break
-                        
-                if self.is_progress_stalled(len(video_urls)):
-                    break
-
-                if len(video_urls) % batch_size == 0:
-                    print(f"Resting for {rest_seconds} seconds...")
-                    random_delay(rest_seconds, rest_seconds + 5)
-
+            video_urls = list(self.iter_tiktok_video_urls(url_param, batch_size, rest_seconds, checkpoint, task_id,
+                                                          incremental, stop_after_known))
             return self.scrape_tiktok_video_information(video_urls)
         except Exception as e:
             print(f"Error scraping video URLs: {e}")
             return []
         finally:
-            driver.quit()
+            self.release_driver()
 
-        
-    def scrape_business_tiktok_videos(self):
+    def iter_tiktok_video_urls(self, url_param, batch_size=50, rest_seconds=5, checkpoint=None, task_id=None,
+                               incremental=False, stop_after_known=5):
         """
-        Scrapes TikTok video URLs from a page in batches with rest intervals.
+        Yields TikTok video URLs from a page as they are found, using the current driver.
 
-        Returns: list of video information.
+        With a `checkpoint` the URLs collected so far are saved after every pass,
+        and a job started again with the same `task_id` resumes from them. In
+        `incremental` mode videos already processed from the feed are skipped, and
+        scraping stops after `stop_after_known` known videos in a row.
+
+        Args:
+            url_param (str): URL parameter for the TikTok page.
+            batch_size (int): Number of videos to scrape before resting.
+            rest_seconds (int): Seconds to rest between batches.
+            checkpoint (FeedCheckpoint): The feed's checkpoint, or None.
+            task_id (str): ID of the job, used to save and resume its progress.
+            incremental (bool): Only collect videos the checkpoint hasn't seen yet.
+            stop_after_known (int): Number of consecutive known videos that ends an incremental scrape.
+
+        Yields: video URLs.
         """
-        driver = self.get_chrome_driver()
-        driver.get(f"https://ads.tiktok.com/business/creativecenter/inspiration/popular/pc/en")
+        driver = self.driver
+        self.last_count = self.retry_count = 0
+        video_urls = checkpoint.load_job(task_id) if checkpoint is not None and task_id else []
+        found = set(video_urls)
+        if video_urls:
+            print(f"Resuming with {len(video_urls)} videos from the checkpoint.")
+            yield from video_urls
+        known_in_a_row = 0
 
-        video_urls = []
+        self.load_page(f"{self.tiktok_url}{url_param}")
+        self.watch(VIDEO_LINK_SELECTOR)
+        while len(video_urls) < self.max_videos and known_in_a_row < stop_after_known:
+            self.waiter.start_pass()
+            self.wait_for_content() # wait for videos to load
+            self.scroll(self.max_scroll_count)
 
-        try:
-            while len(video_urls) < self.max_videos:
-                WebDriverWait(driver, 10).until(lambda d: d.execute_script("return document.readyState") == "complete")
-                random_delay()
-                self.scroll()
-
-                # Check for new videos
-                videos = driver.find_elements(By.XPATH, '//iframe[contains(@src, "/embed/")]')
-                for video in videos:
-                    url = video.get_attribute("src")
-                    if url and url not in video_urls:
-                        video_urls.append(url.split("?")[0])
-                        print(f"Scraped: {url} ({len(video_urls)}/{self.max_videos})")
-                        if len(video_urls) >= self.max_videos:
-                            break
-
-                if self.is_progress_stalled(len(video_urls)):
+            # Check for new videos
+            videos = driver.find_elements(By.XPATH, '//a[contains(@href, "/video/")]')
+            for video in videos:
+                url = video.get_attribute("href")
+                if not url or url in found:
+                    continue
+                found.add(url)
+                if incremental and checkpoint.is_known(get_video_id(url)):
+                    known_in_a_row += 1
+                    if known_in_a_row >= stop_after_known:
+                        print(f"Reached {known_in_a_row} already known videos. Stopping scraping.")
+                        break
+                    continue
+                known_in_a_row = 0
+                video_urls.append(url)
+                print(f"Scraped: {url} ({len(video_urls)}/{self.max_videos})")
+                self.emit("video_found", url=url)
+                yield url
+                if len(video_urls) >= self.max_videos:
                     break
 
-                driver.execute_script('''document.querySelector('[data-testid="cc_contentArea_viewmore_btn"]').click()''')
+            if checkpoint is not None and task_id:
+                checkpoint.save_job(task_id, video_urls)
 
+            if known_in_a_row >= stop_after_known or self.is_progress_stalled(len(video_urls)):
+                break
+
+            if len(video_urls) % batch_size == 0:
+                print(f"Resting for {rest_seconds} seconds...")
+                self.waiter.pause(rest_seconds, rest_seconds + 5)
+
+    def scrape_business_tiktok_videos(self):
+        """
+        Scrapes TikTok video URLs from a page in batches with rest intervals.
+
+        Returns: list of video information.
+        """
+        self.get_chrome_driver()
+
+        try:
+            video_urls = list(self.iter_business_video_urls())
             return self.scrape_tiktok_video_information(video_urls)
         except Exception as e:
             print(f"Error scraping video URLs: {e}")
             return []
         finally:
-            driver.quit()
-            
-            
-    
+            self.release_driver()
+
+    def iter_business_video_urls(self):
+        """
+        Yields the embed URLs of the Creative Center's popular videos as they are found, using the current driver.
+
+        Yields: video embed URLs.
+        """
+        driver = self.driver
+        self.last_count = self.retry_count = 0
+        video_urls = []
+        found = set()
+
+        self.load_page(f"{self.creative_center_url}popular/pc/en")
+        self.watch(EMBED_FRAME_SELECTOR)
+        while len(video_urls) < self.max_videos:
+            self.waiter.start_pass()
+            self.wait_for_content()
+            self.scroll()
+
+            # Check for new videos
+            videos = driver.find_elements(By.XPATH, '//iframe[contains(@src, "/embed/")]')
+            for video in videos:
+                url = video.get_attribute("src")
+                if url and url.split("?")[0] not in found:
+                    url = url.split("?")[0]
+                    found.add(url)
+                    video_urls.append(url)
+                    print(f"Scraped: {url} ({len(video_urls)}/{self.max_videos})")
+                    self.emit("video_found", url=url)
+                    yield url
+                    if len(video_urls) >= self.max_videos:
+                        break
+
+            if self.is_progress_stalled(len(video_urls)):
+                break
+
+            driver.execute_script('''document.querySelector('[data-testid="cc_contentArea_viewmore_btn"]').click()''')
+
     def scrape_business_tiktok_hashtags(self, topic_index):
         """
         Scrapes TikTok video URLs from a page in batches with rest intervals.
 
         Returns: list of video information.
         """
-        driver = self.get_chrome_driver()
-        driver.get(f"https://ads.tiktok.com/business/creativecenter/inspiration/popular/hashtag/pc/en")
-        WebDriverWait(driver, 10).until(lambda d: d.execute_script("return document.readyState") == "complete")
-        driver.execute_script('''document.querySelector('[data-type="select-option"][data-option-id="SelectOption'''+str(topic_index)+'''"] .byted-list-item-container').click()''')
-
-        hashtags = []
-        max_hashtags = self.max_videos
+        self.get_chrome_driver()
 
         try:
-            while len(hashtags) < max_hashtags:
-                WebDriverWait(driver, 10).until(lambda d: d.execute_script("return document.readyState") == "complete")
-                random_delay() # wait for hashtags to load
-                self.scroll(min_s=200, max_s=400)
-
-                # Check for new videos
-                tags = driver.execute_script('''return Array.from(document.querySelectorAll('.CardPc_titleText__RYOWo')).map(element => element.innerText);''')
-                for tag in tags:
-                    if tag and tag not in hashtags:
-                        hashtags.append(tag.replace("#", "").strip())
-                        print(f"Scraped: {tag} ({len(hashtags)}/{max_hashtags})")
-                        if len(hashtags) >= max_hashtags:
-                            break
-                        
-                if self.is_progress_stalled(len(hashtags)):
-                    break
-
-                driver.execute_script('''document.querySelector('[data-testid="cc_contentArea_viewmore_btn"]').click()''')
-            
-            print("done scraping hashtags")
-            return hashtags
+            return self.collect_business_hashtags(topic_index)
         except Exception as e:
             print(f"Error scraping video URLs: {e}")
             return []
         finally:
-            driver.quit()
+            self.release_driver()
+
+    def collect_business_hashtags(self, topic_index):
+        """
+        Collects the popular hashtags of a Creative Center topic, using the current driver.
+
+        Args:
+            topic_index (int): 0-indexed position of the topic in the Creative Center's topic list.
+
+        Returns: list of hashtags, without the "#".
+        """
+        driver = self.driver
+        hashtags = []
+        found = set()
+        max_hashtags = self.max_videos
+        self.last_count = self.retry_count = 0
+
+        self.load_page(f"{self.creative_center_url}popular/hashtag/pc/en")
+        WebDriverWait(driver, 10).until(lambda d: d.execute_script("return document.readyState") == "complete")
+        driver.execute_script('''document.querySelector('[data-type="select-option"][data-option-id="SelectOption'''+str(topic_index)+'''"] .byted-list-item-container').click()''')
+
+        self.watch(HASHTAG_SELECTOR)
+        while len(hashtags) < max_hashtags:
+            self.waiter.start_pass()
+            self.wait_for_content() # wait for hashtags to load
+            self.scroll(min_s=200, max_s=400)
 
+            # Check for new videos
+            tags = driver.execute_script('''return Array.from(document.querySelectorAll('.CardPc_titleText__RYOWo')).map(element => element.innerText);''')
+            for tag in tags:
+                tag = tag.replace("#", "").strip() if tag else tag
+                if tag and tag not in found:
+                    found.add(tag)
+                    hashtags.append(tag)
+                    print(f"Scraped: {tag} ({len(hashtags)}/{max_hashtags})")
+                    if len(hashtags) >= max_hashtags:
+                        break
+                    
+            if self.is_progress_stalled(len(hashtags)):
+                break
 
+            driver.execute_script('''document.querySelector('[data-testid="cc_contentArea_viewmore_btn"]').click()''')
+        
+        print("done scraping hashtags")
+        return hashtags
 
 
+def is_downloaded(video_info):
+    """
+    Tells whether a video was downloaded: its "video" is then the local path of the file, a failed
+    download keeps the TikTok URL or gets "__invalide__".
+
+    Args:
+        video_info (dict): Video information after the downloads.
+
+    Returns:
+        bool: True if the video is on disk.
+    """
+    return (video_info.get("video") or "").startswith("/")
+
+
+def feed_url_param(search_type, search_query):
+    """
+    Map a search to the path of its TikTok feed.
+
+    Args:
+        search_type (str): "hashtag", "userid", "trending" or "topic".
+        search_query (str): The hashtag, the user, or the topic index.
+
+    Returns:
+        str: The feed's URL parameter, "" for topics which are scraped from the Creative Center.
+    """
+    if search_type == "hashtag":
+        return f'tag/{search_query.replace("#", "").strip()}'
+    if search_type == "trending":
+        return "channel/trending-now"
+    if search_type == "userid":
+        return "@"+search_query.replace("@", "")
+    return ""
+
+
+# Progress counter incremented by each scraper/downloader event
+PROGRESS_EVENTS = {
+    "video_found": "videos_found",
+    "video_scraped": "videos_scraped",
+    "video_downloaded": "videos_downloaded",
+}
+
+
+class SharedResource:
+    """
+    A class attribute built on first access instead of at import, so importing the
+    module creates no database or directory in the working directory. The built
+    value then replaces the descriptor, and assigning the attribute overrides it.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.lock = threading.Lock()
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, instance, owner):
+        with self.lock:
+            value = self.owner.__dict__[self.name]
+            if value is self:
+                value = self.factory()
+                setattr(self.owner, self.name, value)
+        return value
+
 
 class TikTokProcessor:
-    task_status = {} # [processing, downloading, completed]
+    # [processing, downloading, completed, failed] + progress counters
+    task_store = SharedResource(create_task_store)
+    # shared so every job reuses its pooled connections
+    embed_extractor = SharedResource(lambda: HttpEmbedExtractor(
+        embed_url=os.environ.get("SCRAPER_EMBED_URL", EMBED_URL)))
+    metadata_cache = SharedResource(lambda: MetadataCache(
+        ttls=dict.fromkeys(("like_count", "comment_count", "share_count"),
+                           int(os.environ.get("SCRAPER_METADATA_COUNTER_TTL", 600))),
+        disk_path=os.environ.get("SCRAPER_METADATA_DB", "metadata.db") or None,
+    ))
+    video_cache = SharedResource(lambda: VideoCache(
+        max_bytes=int(os.environ.get("SCRAPER_VIDEO_CACHE_MB", 10240)) * 1024 * 1024,
+        hash_content=os.environ.get("SCRAPER_VIDEO_CACHE_HASH", "0") == "1"))
+    # every downloaded video is appended to exports/<task_id>.ndjson, SCRAPER_EXPORT_DIR="" turns it off
+    exporter = SharedResource(lambda: ResultExporter(os.environ.get("SCRAPER_EXPORT_DIR", "exports"))
+                              if os.environ.get("SCRAPER_EXPORT_DIR", "exports") else None)
+    # size, checksum, duration, resolution and poster of every downloaded video, SCRAPER_MEDIA_INDEX="" turns it off
+    media_index = SharedResource(lambda: MediaIndex(os.environ.get("SCRAPER_MEDIA_INDEX", "media.db"),
+                                                    workers=int(os.environ.get("SCRAPER_MEDIA_WORKERS", 2)))
+                                 if os.environ.get("SCRAPER_MEDIA_INDEX", "media.db") else None)
     
-    def __init__(self, user_data_dir=None):
-        self.scraper = TikTokScraper(user_data_dir, retry_delay=2, max_retries=10)
-        self.downloader = VideoDownloader(api_url="http://cobalt-api:9000/", rate_limit_delay=10)
-        self.task_id = str(uuid4())  # Generate unique task ID
-        TikTokProcessor.task_status[self.task_id] = {"status": "processing"}  # Store initial status
-        
+    def __init__(self, user_data_dir=None, browser_pool=None, task_id=None, identity=None):
+        embed_url = os.environ.get("SCRAPER_EMBED_URL", EMBED_URL)
+        self.identity = identity  # proxy, Cobalt and rate limits of the worker, None for the defaults
+        self.scraper = TikTokScraper(user_data_dir, retry_delay=2, max_retries=10, browser_pool=browser_pool,
+                                     embed_extractor=identity.embed_extractor(embed_url) if identity is not None
+                                     else TikTokProcessor.embed_extractor,
+                                     metadata_cache=TikTokProcessor.metadata_cache,
+                                     waiter=AdaptiveWaiter(
+                                         jitter=(float(os.environ.get("SCRAPER_JITTER_MIN", 0.5)),
+                                                 float(os.environ.get("SCRAPER_JITTER_MAX", 1.5))),
+                                         timeout=float(os.environ.get("SCRAPER_DOM_TIMEOUT", 10)),
+                                         pass_budget=float(os.environ.get("SCRAPER_SCROLL_PASS_BUDGET", 12)) or None),
+                                     tiktok_url=os.environ.get("SCRAPER_TIKTOK_URL", TIKTOK_URL),
+                                     creative_center_url=os.environ.get("SCRAPER_CREATIVE_CENTER_URL",
+                                                                        CREATIVE_CENTER_URL),
+                                     embed_url=embed_url, proxy=identity.proxy if identity is not None else None)
+        cobalt_url = os.environ.get("SCRAPER_COBALT_URL", "http://cobalt-api:9000/")
+        if identity is not None and identity.cobalt_url:
+            cobalt_url = identity.cobalt_url
+        self.downloader = VideoDownloader(api_url=cobalt_url, rate_limit_delay=10, max_workers=4,
+                                          requests_per_second=identity.requests_per_second if identity is not None
+                                          else 2.0, cache=TikTokProcessor.video_cache)
+        if identity is not None:
+            # Rate-limit state belongs to the identity, not to a single job
+            if identity.rate_limiter is None:
+                identity.rate_limiter = self.downloader.rate_limiter
+            self.downloader.rate_limiter = identity.rate_limiter
+        self.task_id = task_id or str(uuid4())  # Generate unique task ID
+        self.metrics = Metrics()
+        self.scraper.metrics = self.downloader.metrics = self.metrics
+        # the job's metrics reach /metrics as it runs, a killed worker only loses the last few seconds
+        self.metrics_flush_interval = float(os.environ.get("SCRAPER_METRICS_FLUSH_SECONDS", 5))
+        self.metrics_flushed_at = time.monotonic()
+        self.scraper.event_callback = self.on_event
+        self.downloader.event_callback = self.on_event
+        self.indexing = []  # media index futures of the job's downloads
+        self.children = None  # per query progress of a batch job
+        self.current_child = None
+        self.set_status({"status": "processing"})  # Store initial status
+
+    def set_status(self, status):
+        TikTokProcessor.task_store.set(self.task_id, status)
+
+    def on_event(self, event, **data):
+        """
+        Records scraper and downloader events in the task's event log and updates its progress counters.
+
+        Args:
+            event (str): "video_found", "video_scraped" or "video_downloaded".
+            **data: Event payload.
+
+        Returns:
+            None
+        """
+        if self.current_child is not None and event == "video_found":
+            data["child"] = self.current_child
+        TikTokProcessor.task_store.append_event(self.task_id, {"type": event, **data})
+        if event == "video_downloaded" and data.get("path") in (None, "__invalide__"):
+            self.flush_metrics()
+            return
+        if event == "video_downloaded" and TikTokProcessor.exporter is not None:
+            TikTokProcessor.exporter.append(self.task_id, data["video_info"])
+        if event == "video_downloaded" and TikTokProcessor.media_index is not None:
+            video_id = get_video_id(data["video_info"]["videotiktok"]) if data["video_info"].get("videotiktok") \
+                else None
+            future = TikTokProcessor.media_index.add(data["path"][1:], video_id)  # the path has a leading "/"
+            if future is not None:
+                self.indexing.append(future)
+        if event in PROGRESS_EVENTS:
+            TikTokProcessor.task_store.increment(self.task_id, PROGRESS_EVENTS[event])
+            self.metrics.inc(f"{PROGRESS_EVENTS[event]}_total")
+        self.flush_metrics()
+
+    def flush_metrics(self, force=False):
+        """
+        Adds what the job's metrics gained since the last flush to the totals served on /metrics,
+        at most every `metrics_flush_interval` seconds unless forced.
+
+        Args:
+            force (bool): Flush even if the last flush is recent.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        if not force and now - self.metrics_flushed_at < self.metrics_flush_interval:
+            return
+        self.metrics_flushed_at = now
+        samples = self.metrics.delta()
+        if samples:
+            TikTokProcessor.task_store.add_metrics(samples)
+
+    def finish(self, status):
+        """
+        Sets the final status of the task with the job's metrics, and flushes what remains of them to /metrics.
+
+        Args:
+            status (dict): The final status, e.g. {"status": "completed", "videos": [...]}.
+
+        Returns:
+            None
+        """
+        if self.indexing:
+            wait(self.indexing)  # a completed job has its videos listed, with their posters
+        wait_stats = self.scraper.waiter.stats.as_dict()
+        print(f"Waiting: {wait_stats['sleep_seconds']}s asleep, {wait_stats['dom_wait_seconds']}s on the page")
+        self.metrics.inc("wait_sleep_seconds_total", wait_stats["sleep_seconds"])
+        self.metrics.inc("wait_dom_seconds_total", wait_stats["dom_wait_seconds"])
+        self.metrics.inc("jobs_total", status=status["status"])
+        self.flush_metrics(force=True)
+        self.set_status({**status, "wait_stats": wait_stats, "metrics": self.metrics.summary()})
+
+    def run_pipeline(self, url_param, checkpoint, video_folder, incremental=False):
+        """
+        Scrape and download the videos of a feed through a StreamingPipeline, so
+        downloads start while Chrome is still scrolling.
+
+        Args:
+            url_param (str): URL parameter of the TikTok page, "" for the Creative Center's popular videos.
+            checkpoint (FeedCheckpoint): The feed's checkpoint, or None.
+            video_folder (str): Directory to save the downloaded videos.
+            incremental (bool): Only process videos the checkpoint hasn't seen yet.
+
+        Returns:
+            list: Information of the scraped videos with the local paths of the downloads.
+        """
+        print(f"Scraping and downloading videos to: {video_folder}")
+        self.scraper.get_chrome_driver()
+        try:
+            if url_param != "":
+                video_urls = self.scraper.iter_tiktok_video_urls(url_param, batch_size=50, rest_seconds=5,
+                                                                 checkpoint=checkpoint, task_id=self.task_id,
+                                                                 incremental=incremental)
+            else:
+                video_urls = self.scraper.iter_business_video_urls()
+            pipeline = StreamingPipeline(self.scraper, self.downloader,
+                                         max_pending_downloads=self.downloader.max_workers * 4)
+            return pipeline.run(video_urls, video_folder,
+                                on_collected=lambda: self.set_status({"status": "downloading"}))
+        finally:
+            self.scraper.release_driver()
+
     def get_Process_id(self):
         return self.task_id
 
@@ -289,42 +839,221 @@ class TikTokProcessor:
         max_videos = request.max_videos
 
         if search_type not in ["hashtag", "userid", "trending", "topic"]:
-            TikTokProcessor.task_status[self.task_id] = {"status": "failed", "error": "Invalid search type."}
+            self.set_status({"status": "failed", "error": "Invalid search type."})
+            return
 
         self.scraper.set_max_videos(max_videos)
         video_infos = {}
 
         print(f"Scraping up to {max_videos} videos for {search_type} '{search_query}'...")
         try:
-            if search_type == "hashtag":
-                url_param = f'tag/{search_query.replace("#", "").strip()}'
-            elif search_type == "trending":
-                url_param = "channel/trending-now"
-            elif search_type == "userid":
-                url_param = "@"+search_query.replace("@", "")
-            elif search_type == "topic":
-                url_param = ""
+            url_param = feed_url_param(search_type, search_query)
+            if search_type == "topic":
                 self.scraper.set_max_scroll_count(max_videos//4)
-                if search_query == "0":
-                    video_infos = self.scraper.scrape_business_tiktok_videos()
-                else:
+                if search_query != "0":
                     hashtags = self.scraper.scrape_business_tiktok_hashtags(int(search_query)-1)
-                    TikTokProcessor.task_status[self.task_id] = {"status": "completed", "hashtags": hashtags}
-                    
-                
+                    self.finish({"status": "completed", "hashtags": hashtags})
+                    return
+
+            checkpoint = None
             if url_param != "":
-                video_infos = self.scraper.scrape_tiktok_videos(url_param, batch_size=50, rest_seconds=5)
-            
-            if  url_param != "" or search_query == "0":
-                TikTokProcessor.task_status[self.task_id] = {"status": "downloading"}
+                checkpoint = FeedCheckpoint(url_param, root=os.environ.get("SCRAPER_CHECKPOINT_DIR", "checkpoints"))
+            video_folder = os.path.join("videos", f"{search_query}_{search_type}_videos")
+
+            if os.environ.get("SCRAPER_STREAMING_PIPELINE", "1") == "1":
+                video_infos = self.run_pipeline(url_param, checkpoint, video_folder,
+                                                incremental=getattr(request, "incremental", False))
+            else:
+                if url_param != "":
+                    video_infos = self.scraper.scrape_tiktok_videos(url_param, batch_size=50, rest_seconds=5,
+                                                                    checkpoint=checkpoint, task_id=self.task_id,
+                                                                    incremental=getattr(request, "incremental", False))
+                else:
+                    video_infos = self.scraper.scrape_business_tiktok_videos()
 
-                video_folder = os.path.join("videos", f"{search_query}_{search_type}_videos")
+                self.set_status({"status": "downloading"})
                 os.makedirs(video_folder, exist_ok=True)
 
                 print(f"Downloading videos to: {video_folder}")
                 video_infos = self.downloader.process_videos(video_infos, video_folder)
 
-                TikTokProcessor.task_status[self.task_id] = {"status": "completed", "videos": video_infos}
+            if checkpoint is not None:
+                # failed downloads stay unseen, so the next incremental run retries them
+                checkpoint.mark_seen(get_video_id(video_info["videotiktok"]) for video_info in video_infos
+                                     if is_downloaded(video_info))
+                checkpoint.clear_job(self.task_id)
+
+            self.finish({"status": "completed", "videos": video_infos, "failed": self.scraper.failed_videos})
+
+        except Exception as e:
+            self.finish({"status": "failed", "error": str(e)})
+
+    def set_batch_status(self, status):
+        self.set_status({**status, "children": [dict(child) for child in self.children]})
+
+    def process_batch(self, request):
+        """
+        Process many searches as one task: every query shares the same browser
+        session, videos found by several queries are only processed once, and
+        all the videos go through a single download batch.
+
+        With a `topic`, the topic's popular hashtags are scraped first and each
+        of them becomes a hashtag query.
+
+        Args:
+            request (BatchRequest): Batch request with `queries` (dicts with search_type and search_query),
+                `topic`, `max_hashtags`, `max_videos` (per query) and `incremental`.
+
+        Returns:
+            None
+        """
+        queries = [dict(query) for query in (request.queries or [])]
+        incremental = getattr(request, "incremental", False)
+        self.children = [{**query, "status": "queued", "videos_found": 0, "duplicates": 0} for query in queries]
+        video_folder = os.path.join("videos", f"batch_{self.task_id}")
+        owners = {}  # video ID -> index of the query that found it first
+        checkpoints = {}
+
+        def iter_batch_urls():
+            for i, child in enumerate(self.children):
+                self.current_child = i
+                child["status"] = "scraping"
+                self.set_batch_status({"status": "processing"})
+                try:
+                    url_param = feed_url_param(child["search_type"], child["search_query"])
+                    if url_param != "":
+                        checkpoints[i] = FeedCheckpoint(url_param,
+                                                        root=os.environ.get("SCRAPER_CHECKPOINT_DIR", "checkpoints"))
+                        video_urls = self.scraper.iter_tiktok_video_urls(url_param, batch_size=50, rest_seconds=5,
+                                                                         checkpoint=checkpoints[i],
+                                                                         task_id=f"{self.task_id}-{i}",
+                                                                         incremental=incremental)
+                    else:
+                        video_urls = self.scraper.iter_business_video_urls()
+                    for url in video_urls:
+                        video_id = get_video_id(url)
+                        if video_id in owners:
+                            child["duplicates"] += 1
+                            continue
+                        owners[video_id] = i
+                        child["videos_found"] += 1
+                        yield url
+                    child["status"] = "scraped"
+                except Exception as e:
+                    print(f"Error scraping {child['search_type']} '{child['search_query']}': {e}")
+                    child["status"] = "failed"
+                    child["error"] = str(e)
+            self.current_child = None
+
+        self.scraper.set_max_videos(request.max_videos)
+        self.scraper.set_max_scroll_count(max(1, request.max_videos // 4))
+        self.scraper.get_chrome_driver()
+        try:
+            topic = getattr(request, "topic", None)
+            if topic:
+                self.scraper.set_max_videos(getattr(request, "max_hashtags", 10))
+                hashtags = self.scraper.collect_business_hashtags(int(topic) - 1)
+                self.scraper.set_max_videos(request.max_videos)
+                self.children += [{"search_type": "hashtag", "search_query": hashtag, "status": "queued",
+                                   "videos_found": 0, "duplicates": 0} for hashtag in hashtags]
+            print(f"Scraping up to {request.max_videos} videos for each of {len(self.children)} queries...")
+
+            if os.environ.get("SCRAPER_STREAMING_PIPELINE", "1") == "1":
+                pipeline = StreamingPipeline(self.scraper, self.downloader,
+                                             max_pending_downloads=self.downloader.max_workers * 4)
+                video_infos = pipeline.run(iter_batch_urls(), video_folder,
+                                           on_collected=lambda: self.set_batch_status({"status": "downloading"}))
+            else:
+                video_infos = self.scraper.scrape_tiktok_video_information(list(iter_batch_urls()))
+                self.set_batch_status({"status": "downloading"})
+                video_infos = self.downloader.process_videos(video_infos, video_folder)
+        except Exception as e:
+            self.finish({"status": "failed", "error": str(e), "children": self.children})
+            return
+        finally:
+            self.scraper.release_driver()
+
+        for i, checkpoint in checkpoints.items():
+            checkpoint.mark_seen(get_video_id(video_info["videotiktok"]) for video_info in video_infos
+                                 if owners.get(get_video_id(video_info["videotiktok"])) == i
+                                 and is_downloaded(video_info))
+            checkpoint.clear_job(f"{self.task_id}-{i}")
+        for child in self.children:
+            if child["status"] == "scraped":
+                child["status"] = "completed"
+
+        self.finish({"status": "completed", "videos": video_infos, "failed": self.scraper.failed_videos,
+                     "children": self.children})
+
+    def process_video_list(self, request):
+        """
+        Download a list of known videos, e.g. one shard of a larger list. Their
+        information is read over HTTP, Chrome is only started for the embed
+        pages HTTP couldn't read.
+
+        Args:
+            request (SimpleNamespace): Job payload with `video_urls`, and `group`, the ID shared by
+                every shard of the list, which names the download folder.
+
+        Returns:
+            None
+        """
+        video_urls = list(request.video_urls)
+        video_folder = os.path.join("videos", f"{getattr(request, 'group', None) or self.task_id}_videos")
+        print(f"Downloading {len(video_urls)} videos to: {video_folder}")
+        try:
+            for url in video_urls:
+                self.scraper.emit("video_found", url=url)
+            self.scraper.failed_videos = []
+            with self.metrics.span("video_information"):
+                results, pending = self.scraper.fetch_video_information(video_urls)
+                if pending:
+                    self.scraper.get_chrome_driver()
+                    try:
+                        self.scraper.scrape_embed_pages_in_tabs(video_urls, pending, results)
+                    finally:
+                        self.scraper.release_driver()
+
+            self.set_status({"status": "downloading"})
+            os.makedirs(video_folder, exist_ok=True)
+            video_infos = self.downloader.process_videos([info for info in results if info is not None], video_folder)
+            self.finish({"status": "completed", "videos": video_infos, "failed": self.scraper.failed_videos})
+        except Exception as e:
+            self.finish({"status": "failed", "error": str(e)})
+
+    async def process_video_list_async(self, request, downloader):
+        """
+        `process_video_list` on the event loop of the API server: downloads run
+        on an AsyncVideoDownloader, only the embed page requests and the task
+        store writes go to worker threads. There is no browser here, videos whose
+        embed page can't be read over HTTP are reported in `failed`.
 
+        Args:
+            request (SimpleNamespace): Payload with `video_urls` and `group`, as for `process_video_list`.
+            downloader (AsyncVideoDownloader): The server's downloader, the job gets its own view of it.
+
+        Returns:
+            None
+        """
+        video_urls = list(request.video_urls)
+        video_folder = os.path.join("videos", f"{getattr(request, 'group', None) or self.task_id}_videos")
+        downloader = downloader.for_job()
+        downloader.metrics = self.metrics
+        downloader.event_callback = self.on_event
+
+        def collect_information():
+            for url in video_urls:
+                self.scraper.emit("video_found", url=url)
+            with self.metrics.span("video_information"):
+                return self.scraper.fetch_video_information(video_urls)
+
+        try:
+            results, pending = await asyncio.to_thread(collect_information)
+            failed = [{"videotiktok": video_urls[i], "error": "embed page could not be read over HTTP"}
+                      for i in pending]
+            await asyncio.to_thread(self.set_status, {"status": "downloading"})
+            video_infos = await downloader.process_videos([info for info in results if info is not None],
+                                                          video_folder)
+            await asyncio.to_thread(self.finish, {"status": "completed", "videos": video_infos, "failed": failed})
         except Exception as e:
-            TikTokProcessor.task_status[self.task_id] = {"status": "failed", "error": str(e)}
\ No newline at end of file
+            await asyncio.to_thread(self.finish, {"status": "failed", "error": str(e)})
@@ -0,0 +1,170 @@
+import hashlib
+import json
+from collections import OrderedDict
+from .download import get_video_id
+from .embed_extractor import HttpEmbedExtractor
+
+
+class Identity:
+    """
+    One egress identity of the scraper: the proxy its browser and embed page
+    requests leave through, the Cobalt instance downloading its videos, and
+    its own rate-limit state, kept across the jobs of its worker.
+
+    Attributes:
+        name (str): Name of the identity, also its shard in the job queue.
+        proxy (str): Proxy URL of Chrome and of the embed page requests, None for direct connections.
+        cobalt_url (str): Cobalt API of the identity, None for the default one.
+        requests_per_second (float): Initial Cobalt request rate of the identity.
+        rate_limiter (RateLimiter): Token buckets of the identity, set by its first job.
+    """
+
+    def __init__(self, name, proxy=None, cobalt_url=None, requests_per_second=2.0):
+        """
+        Initialize the identity.
+
+        Args:
+            name (str): Name of the identity.
+            proxy (str): Proxy URL, e.g. "http://10.0.0.2:3128", None for direct connections.
+            cobalt_url (str): Cobalt API of the identity, None for the default one.
+            requests_per_second (float): Initial Cobalt request rate of the identity.
+        """
+        self.name = name
+        self.proxy = proxy
+        self.cobalt_url = cobalt_url
+        self.requests_per_second = requests_per_second
+        self.rate_limiter = None
+        self._embed_extractors = {}
+
+    def embed_extractor(self, embed_url):
+        """
+        Get the identity's embed page extractor, shared by its jobs so they reuse its pooled connections.
+
+        Args:
+            embed_url (str): Base URL of the embed pages.
+
+        Returns:
+            HttpEmbedExtractor: An extractor sending its requests through the identity's proxy.
+        """
+        if embed_url not in self._embed_extractors:
+            self._embed_extractors[embed_url] = HttpEmbedExtractor(embed_url=embed_url, proxy=self.proxy)
+        return self._embed_extractors[embed_url]
+
+    def __getstate__(self):
+        # Worker processes get the configuration only, their sessions and buckets are their own
+        return {"name": self.name, "proxy": self.proxy, "cobalt_url": self.cobalt_url,
+                "requests_per_second": self.requests_per_second}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f"Identity({self.name!r}, proxy={self.proxy!r}, cobalt_url={self.cobalt_url!r})"
+
+
+def load_identities(value):
+    """
+    Load the egress identities from SCRAPER_IDENTITIES.
+
+    Args:
+        value (str): A JSON list, or the path of a JSON file holding one, of objects with
+            `proxy`, `cobalt_url`, and optionally `name` and `requests_per_second`.
+
+    Returns:
+        list: The identities, empty if `value` is empty.
+    """
+    if not value:
+        return []
+    if not value.lstrip().startswith("["):
+        with open(value) as f:
+            value = f.read()
+    identities = []
+    for i, spec in enumerate(json.loads(value)):
+        identities.append(Identity(spec.get("name") or f"identity-{i}", proxy=spec.get("proxy"),
+                                   cobalt_url=spec.get("cobalt_url"),
+                                   requests_per_second=float(spec.get("requests_per_second", 2.0))))
+    if len({identity.name for identity in identities}) != len(identities):
+        raise ValueError("Identity names must be unique.")
+    return identities
+
+
+def shard_for(key, shards):
+    """
+    Pick the shard of a key with rendezvous hashing: a key always lands on the
+    same shard, and adding or removing a shard only moves that shard's keys.
+
+    Args:
+        key (str): A video ID or a feed.
+        shards (list): Names of the shards.
+
+    Returns:
+        str: Name of the shard, None if there are no shards.
+    """
+    if not shards:
+        return None
+    return max(shards, key=lambda shard: hashlib.sha1(f"{shard}\0{key}".encode()).digest())
+
+
+class ShardCoordinator:
+    """
+    Spreads jobs over the egress identities through the shared JobQueue: a job
+    is enqueued for one shard, and only the workers of that identity claim it.
+
+    Searches are sharded by feed, so a feed is always scrolled from the same IP.
+    Video lists are split evenly into one job per shard, so downloads use every
+    identity's rate limit at once and the slowest shard isn't left with more videos.
+
+    Attributes:
+        job_queue (JobQueue): The queue the workers of every node feed from.
+        shards (list): Names of the identities jobs are spread over, empty to leave jobs unsharded.
+    """
+
+    def __init__(self, job_queue, identities=()):
+        """
+        Initialize the coordinator.
+
+        Args:
+            job_queue (JobQueue): The queue the workers of every node feed from.
+            identities (list): Identities with at least one worker claiming their jobs.
+        """
+        self.job_queue = job_queue
+        self.shards = [identity.name for identity in identities]
+
+    def submit(self, task_id, payload, key=None, priority=0, timeout=None):
+        """
+        Enqueue a job on the shard of `key`.
+
+        Args:
+            task_id (str): ID of the task the job reports to.
+            payload (dict): JSON serializable job parameters.
+            key (str): Sharding key, None for a job any worker may claim.
+            priority (int): Jobs with a higher priority are started first.
+            timeout (float): Seconds the job may run before it is killed, None for no limit.
+
+        Returns:
+            str: The job's shard, None if it is unsharded.
+        """
+        shard = shard_for(key, self.shards) if key is not None else None
+        self.job_queue.enqueue(task_id, payload, priority=priority, timeout=timeout, shard=shard)
+        return shard
+
+    def split_videos(self, video_urls):
+        """
+        Deal video URLs out to the shards in turn, dropping duplicates.
+
+        Args:
+            video_urls (list): TikTok video URLs.
+
+        Returns:
+            OrderedDict: Video URLs of each shard (None without shards), in their original order.
+        """
+        shards = self.shards or [None]
+        groups = OrderedDict()
+        seen = set()
+        for url in video_urls:
+            video_id = get_video_id(url)
+            if video_id in seen:
+                continue
+            seen.add(video_id)
+            groups.setdefault(shards[(len(seen) - 1) % len(shards)], []).append(url)
+        return groups
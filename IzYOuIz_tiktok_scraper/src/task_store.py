@@ -0,0 +1,301 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+
+PROGRESS_FIELDS = ("videos_found", "videos_scraped", "videos_downloaded")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class TaskStore(ABC):
+    """
+    Interface of the task state backends used by TikTokProcessor.
+
+    A task is a status dictionary (at least {"status": ...}) plus the progress
+    counters listed in PROGRESS_FIELDS, returned together by `get` as
+    {**status, "progress": {...}}.
+    """
+
+    @abstractmethod
+    def set(self, task_id, status):
+        """
+        Create a task or replace its status dictionary, progress counters are kept.
+        A "status" event is appended to the task's event log.
+
+        Args:
+            task_id (str): The task ID.
+            status (dict): The new status, e.g. {"status": "downloading"}.
+
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def increment(self, task_id, field, amount=1):
+        """
+        Increment one of the task's progress counters.
+
+        Args:
+            task_id (str): The task ID.
+            field (str): One of PROGRESS_FIELDS.
+            amount (int): Value added to the counter.
+
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def get(self, task_id):
+        """
+        Get a task's status and progress.
+
+        Args:
+            task_id (str): The task ID.
+
+        Returns:
+            dict: The status with a "progress" entry, or None if the task is unknown.
+        """
+
+    @abstractmethod
+    def append_event(self, task_id, event):
+        """
+        Append a progress event to the task's event log.
+
+        Args:
+            task_id (str): The task ID.
+            event (dict): JSON serializable event, with a "type" entry.
+
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def events_since(self, task_id, after=0):
+        """
+        Read the task's events newer than `after`.
+
+        Args:
+            task_id (str): The task ID.
+            after (int): Sequence number of the last event already read.
+
+        Returns:
+            list: (sequence number, event) tuples in order.
+        """
+
+    @abstractmethod
+    def add_metrics(self, samples):
+        """
+        Add metric samples of a job to the totals shared by every process.
+
+        Args:
+            samples (dict): Prometheus sample name -> value, see `Metrics.snapshot`.
+
+        Returns:
+            None
+        """
+
+    @abstractmethod
+    def metrics(self):
+        """
+        Read the metric totals of every job run so far.
+
+        Returns:
+            dict: Prometheus sample name -> value.
+        """
+
+    def status_event(self, status):
+        # The event carries everything but the video list, which clients already got video by video
+        return {"type": "status", **{key: value for key, value in status.items() if key != "videos"}}
+
+    def __contains__(self, task_id):
+        return self.get(task_id) is not None
+
+
+class MemoryTaskStore(TaskStore):
+    """
+    Keeps tasks in a dictionary of the current process, finished tasks expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl=24 * 3600):
+        self.ttl = ttl
+        self.tasks = {}
+        self.events = {}
+        self.sequence = 0
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def set(self, task_id, status):
+        with self.lock:
+            self._evict_expired()
+            task = self.tasks.setdefault(task_id, {"progress": dict.fromkeys(PROGRESS_FIELDS, 0)})
+            task["status"] = dict(status)
+            task["updated_at"] = time.time()
+            self.sequence += 1
+            self.events.setdefault(task_id, []).append((self.sequence, self.status_event(status)))
+
+    def increment(self, task_id, field, amount=1):
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is not None:
+                task["progress"][field] += amount
+                task["updated_at"] = time.time()
+
+    def get(self, task_id):
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            return {**task["status"], "progress": dict(task["progress"])}
+
+    def append_event(self, task_id, event):
+        with self.lock:
+            self.sequence += 1
+            self.events.setdefault(task_id, []).append((self.sequence, dict(event)))
+
+    def events_since(self, task_id, after=0):
+        with self.lock:
+            return [(seq, event) for seq, event in self.events.get(task_id, []) if seq > after]
+
+    def add_metrics(self, samples):
+        with self.lock:
+            for name, value in samples.items():
+                self.totals[name] = self.totals.get(name, 0) + value
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.totals)
+
+    def _evict_expired(self):
+        expires = time.time() - self.ttl
+        for task_id in [task_id for task_id, task in self.tasks.items()
+                        if task["status"].get("status") in FINISHED_STATUSES and task["updated_at"] < expires]:
+            del self.tasks[task_id]
+            self.events.pop(task_id, None)
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    Keeps tasks in a SQLite database in WAL mode, so any number of processes
+    (e.g. several uvicorn workers) can read while one of them writes.
+
+    Finished tasks are evicted `ttl` seconds after their last update.
+
+    Attributes:
+        path (str): Path of the database file.
+        ttl (int): Seconds a finished (completed, failed or cancelled) task is kept.
+    """
+
+    def __init__(self, path="tasks.db", ttl=24 * 3600, evict_interval=60):
+        """
+        Initialize the store and create its schema.
+
+        Args:
+            path (str): Path of the database file.
+            ttl (int): Seconds a finished task is kept.
+            evict_interval (int): Minimum number of seconds between two eviction passes.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.evict_interval = evict_interval
+        self.last_eviction = 0
+        self.local = threading.local()
+
+        with self.connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"""CREATE TABLE IF NOT EXISTS tasks (
+                                task_id TEXT PRIMARY KEY,
+                                status TEXT NOT NULL,
+                                data TEXT NOT NULL,
+                                {", ".join(f"{field} INTEGER NOT NULL DEFAULT 0" for field in PROGRESS_FIELDS)},
+                                created_at REAL NOT NULL,
+                                updated_at REAL NOT NULL
+                            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS tasks_status_updated_at ON tasks (status, updated_at)")
+            conn.execute("""CREATE TABLE IF NOT EXISTS events (
+                                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                                task_id TEXT NOT NULL,
+                                data TEXT NOT NULL
+                            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS events_task_id_seq ON events (task_id, seq)")
+            conn.execute("CREATE TABLE IF NOT EXISTS metrics (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+
+    def connection(self):
+        """
+        Get this thread's connection, connections are never shared across threads or forked processes.
+
+        Returns:
+            sqlite3.Connection: The connection.
+        """
+        conn = getattr(self.local, "conn", None)
+        if conn is None or self.local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+            self.local.pid = os.getpid()
+        return conn
+
+    def set(self, task_id, status):
+        now = time.time()
+        with self.connection() as conn:
+            conn.execute("""INSERT INTO tasks (task_id, status, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT(task_id) DO UPDATE SET status = excluded.status, data = excluded.data,
+                                                               updated_at = excluded.updated_at""",
+                         (task_id, status.get("status", ""), json.dumps(status), now, now))
+            conn.execute("INSERT INTO events (task_id, data) VALUES (?, ?)",
+                         (task_id, json.dumps(self.status_event(status))))
+            if now - self.last_eviction > self.evict_interval:
+                self.last_eviction = now
+                conn.execute(f"DELETE FROM tasks WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) "
+                             "AND updated_at < ?", (*FINISHED_STATUSES, now - self.ttl))
+                conn.execute("DELETE FROM events WHERE task_id NOT IN (SELECT task_id FROM tasks)")
+
+    def increment(self, task_id, field, amount=1):
+        if field not in PROGRESS_FIELDS:
+            raise ValueError(f"Unknown progress field: {field}")
+        with self.connection() as conn:
+            conn.execute(f"UPDATE tasks SET {field} = {field} + ?, updated_at = ? WHERE task_id = ?",
+                         (amount, time.time(), task_id))
+
+    def get(self, task_id):
+        row = self.connection().execute(
+            f"SELECT data, {', '.join(PROGRESS_FIELDS)} FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[0]), "progress": dict(zip(PROGRESS_FIELDS, row[1:]))}
+
+    def append_event(self, task_id, event):
+        with self.connection() as conn:
+            conn.execute("INSERT INTO events (task_id, data) VALUES (?, ?)", (task_id, json.dumps(event)))
+
+    def events_since(self, task_id, after=0):
+        rows = self.connection().execute("SELECT seq, data FROM events WHERE task_id = ? AND seq > ? ORDER BY seq",
+                                         (task_id, after)).fetchall()
+        return [(seq, json.loads(data)) for seq, data in rows]
+
+    def add_metrics(self, samples):
+        with self.connection() as conn:
+            conn.executemany("""INSERT INTO metrics (name, value) VALUES (?, ?)
+                                ON CONFLICT(name) DO UPDATE SET value = value + excluded.value""",
+                             list(samples.items()))
+
+    def metrics(self):
+        return dict(self.connection().execute("SELECT name, value FROM metrics").fetchall())
+
+
+def create_task_store(location=None):
+    """
+    Create the task store configured by `location` or the SCRAPER_TASK_STORE environment variable.
+
+    Args:
+        location (str): "memory" for a MemoryTaskStore, otherwise the path of a SQLite database.
+
+    Returns:
+        TaskStore: The task store.
+    """
+    location = location or os.environ.get("SCRAPER_TASK_STORE", "tasks.db")
+    ttl = int(os.environ.get("SCRAPER_TASK_TTL", 24 * 3600))
+    if location == "memory":
+        return MemoryTaskStore(ttl=ttl)
+    return SQLiteTaskStore(location, ttl=ttl)
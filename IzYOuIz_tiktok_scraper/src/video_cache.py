@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows, the cache is then only safe within one process
+    fcntl = None
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_file(source, destination):
+    """
+    Make `destination` point to the same data as `source`: hard link, or symlink across filesystems.
+
+    Args:
+        source (str): Existing file.
+        destination (str): Path to create, replaced if it is another file.
+
+    Returns:
+        None
+    """
+    if os.path.exists(destination) and os.path.samefile(source, destination):
+        return
+    # Link beside the destination and rename over it: the file it replaces is never truncated,
+    # so its other links and the readers of that inode keep their data
+    tmp_path = f"{destination}.{os.getpid()}.{threading.get_ident()}.link"
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        os.symlink(os.path.abspath(source), tmp_path)
+    os.replace(tmp_path, destination)
+
+
+class VideoCache:
+    """
+    A size-bounded cache of downloaded videos keyed by TikTok video ID.
+
+    Cached files are hard links kept in `root`, so handing a cached video to
+    another job costs a link instead of a Cobalt download. The index lives in
+    `root/index.json` and is guarded by a file lock, so worker processes can
+    share the cache. The least recently used videos are evicted once the
+    videos only the cache still links to grow past `max_bytes`: a video a job
+    folder links to frees no disk space when evicted, so it is neither
+    counted nor evicted.
+
+    Attributes:
+        root (str): Cache directory.
+        max_bytes (int): Maximum disk space held by the videos only the cache links to.
+        hash_content (bool): Also key videos by SHA-256, so re-uploads of the same file share one copy on disk.
+    """
+
+    def __init__(self, root=os.path.join("videos", ".cache"), max_bytes=10 * 1024 ** 3, hash_content=False):
+        """
+        Initialize the cache.
+
+        Args:
+            root (str): Cache directory.
+            max_bytes (int): Maximum total size of the cached videos.
+            hash_content (bool): Also key videos by SHA-256 of their content.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hash_content = hash_content
+        self.index_path = os.path.join(root, "index.json")
+        self.lock = threading.Lock()
+        self.index = {"videos": {}, "hashes": {}}
+        self.index_mtime = None
+        os.makedirs(root, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, write=False):
+        with self.lock, open(os.path.join(self.root, "index.lock"), "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._load()
+                yield self.index
+                if write:
+                    self._save()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self.index_mtime:
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+            self.index_mtime = mtime
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+        self.index_mtime = os.stat(self.index_path).st_mtime_ns
+
+    def _path(self, video_id):
+        return os.path.join(self.root, f"{video_id}.mp4")
+
+    def link_into(self, video_id, output_dir):
+        """
+        Link a cached video into `output_dir` under its original filename.
+
+        Args:
+            video_id (str): The TikTok video ID.
+            output_dir (str): Directory of the job being processed.
+
+        Returns:
+            str: The filename the video was linked as, or None on a cache miss.
+        """
+        with self._locked(write=True) as index:
+            entry = index["videos"].get(video_id)
+            if entry is None:
+                return None
+            cached_path = self._path(video_id)
+            if not os.path.exists(cached_path):
+                self._forget(index, video_id)
+                return None
+            link_file(cached_path, os.path.join(output_dir, entry["filename"]))
+            entry["last_used"] = time.time()
+            return entry["filename"]
+
+    def add(self, video_id, path):
+        """
+        Add a freshly downloaded video to the cache and evict old videos if needed.
+
+        Args:
+            video_id (str): The TikTok video ID.
+            path (str): Path of the downloaded file.
+
+        Returns:
+            None
+        """
+        sha256 = file_sha256(path) if self.hash_content else None
+        with self._locked(write=True) as index:
+            cached_path = self._path(video_id)
+            duplicate_id = index["hashes"].get(sha256) if sha256 else None
+            if duplicate_id and duplicate_id != video_id and os.path.exists(self._path(duplicate_id)):
+                # Same bytes under another ID: share the existing inode instead of storing a second copy
+                link_file(self._path(duplicate_id), path)
+            link_file(path, cached_path)
+
+            index["videos"][video_id] = {
+                "filename": os.path.basename(path),
+                "size": os.path.getsize(cached_path),
+                "sha256": sha256,
+                "last_used": time.time(),
+            }
+            if sha256:
+                index["hashes"].setdefault(sha256, video_id)
+            self._evict(index)
+
+    def _evict(self, index):
+        links = {}  # inode -> cached video IDs, videos with identical content share one
+        inodes = {}  # inode -> (size, number of links)
+        for video_id in index["videos"]:
+            try:
+                stat_result = os.stat(self._path(video_id))
+            except FileNotFoundError:
+                continue
+            inode = (stat_result.st_dev, stat_result.st_ino)
+            links.setdefault(inode, []).append(video_id)
+            inodes[inode] = (stat_result.st_size, stat_result.st_nlink)
+        # Only the inodes without a link outside the cache are freed by an eviction
+        owned = {inode for inode, video_ids in links.items() if inodes[inode][1] == len(video_ids)}
+        inode_of = {video_id: inode for inode, video_ids in links.items() for video_id in video_ids}
+
+        total = sum(inodes[inode][0] for inode in owned)
+        for video_id, entry in sorted(index["videos"].items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            inode = inode_of.get(video_id)
+            if inode not in owned:
+                continue
+            links[inode].remove(video_id)
+            if not links[inode]:
+                total -= inodes[inode][0]
+            self._forget(index, video_id)
+            try:
+                os.remove(self._path(video_id))
+            except FileNotFoundError:
+                pass
+            print(f"Evicted {video_id} from the video cache.")
+
+    def _forget(self, index, video_id):
+        entry = index["videos"].pop(video_id, None)
+        if entry and entry.get("sha256") and index["hashes"].get(entry["sha256"]) == video_id:
+            del index["hashes"][entry["sha256"]]
@@ -0,0 +1,183 @@
+import random
+import threading
+import time
+
+# Counts the elements matching a CSS selector
+COUNT_SCRIPT = "return document.querySelectorAll(arguments[0]).length;"
+
+
+class WaitStats:
+    """
+    Where a scraper's waiting time goes.
+
+    Attributes:
+        sleep_seconds (float): Time spent in jitter sleeps, i.e. deliberately idle.
+        dom_wait_seconds (float): Time spent waiting for the page to load or change.
+        dom_changes (int): Number of waits that ended because the page was ready or showed new content.
+        timeouts (int): Number of waits that ended without new content.
+    """
+
+    def __init__(self):
+        self.sleep_seconds = 0.0
+        self.dom_wait_seconds = 0.0
+        self.dom_changes = 0
+        self.timeouts = 0
+        self.lock = threading.Lock()
+
+    def add(self, sleep_seconds=0.0, dom_wait_seconds=0.0, dom_changes=0, timeouts=0):
+        with self.lock:
+            self.sleep_seconds += sleep_seconds
+            self.dom_wait_seconds += dom_wait_seconds
+            self.dom_changes += dom_changes
+            self.timeouts += timeouts
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "sleep_seconds": round(self.sleep_seconds, 3),
+                "dom_wait_seconds": round(self.dom_wait_seconds, 3),
+                "dom_changes": self.dom_changes,
+                "timeouts": self.timeouts,
+            }
+
+
+class AdaptiveWaiter:
+    """
+    Waits for a page to show new content instead of sleeping a fixed time.
+
+    Each wait polls the number of elements matching a CSS selector (video
+    anchors, embed iframes...) and returns as soon as it grows, so a fast
+    page costs a few milliseconds instead of seconds. A short random sleep,
+    the jitter, is kept as an anti-bot floor before every wait.
+
+    The waits of one scroll pass share `pass_budget` seconds, so a stalled
+    feed costs at most the budget per pass, plus the jitter floor of each wait.
+
+    Attributes:
+        jitter (tuple): (min, max) seconds of the random sleep, (0, 0) to disable it.
+        timeout (float): Default number of seconds a wait gives the page to change.
+        poll_interval (float): Seconds between two element counts.
+        pass_budget (float): Seconds all the waits of a scroll pass may take, None for no limit.
+        stats (WaitStats): Time spent sleeping versus waiting on the DOM.
+    """
+
+    def __init__(self, jitter=(0.5, 1.5), timeout=10, poll_interval=0.25, pass_budget=None, sleep=time.sleep,
+                 clock=time.monotonic):
+        """
+        Initialize the waiter.
+
+        Args:
+            jitter (tuple): (min, max) seconds of the random sleep, (0, 0) to disable it.
+            timeout (float): Default number of seconds a wait gives the page to change.
+            poll_interval (float): Seconds between two element counts.
+            pass_budget (float): Seconds all the waits of a scroll pass may take, None for no limit.
+            sleep (callable): Sleep function, replaceable for tests.
+            clock (callable): Monotonic clock, replaceable for tests.
+        """
+        self.jitter = jitter
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.pass_budget = pass_budget
+        self.sleep = sleep
+        self.clock = clock
+        self.stats = WaitStats()
+        self.deadline = None  # end of the current scroll pass's budget
+
+    def start_pass(self):
+        """
+        Start the budget of a scroll pass, the following waits share it until the next pass.
+
+        Returns:
+            None
+        """
+        self.deadline = self.clock() + self.pass_budget if self.pass_budget is not None else None
+
+    def end_pass(self):
+        """
+        Lift the budget of the current scroll pass, e.g. when a new page is loaded.
+
+        Returns:
+            None
+        """
+        self.deadline = None
+
+    def _remaining(self, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        if self.deadline is None:
+            return timeout
+        return max(0.0, min(timeout, self.deadline - self.clock()))
+
+    def pause(self, min_delay=None, max_delay=None):
+        """
+        Sleep a random time between `min_delay` and `max_delay`, the jitter range by default.
+
+        Args:
+            min_delay (float): Minimum delay in seconds.
+            max_delay (float): Maximum delay in seconds.
+
+        Returns:
+            float: The number of seconds slept.
+        """
+        min_delay = self.jitter[0] if min_delay is None else min_delay
+        max_delay = self.jitter[1] if max_delay is None else max_delay
+        delay = random.uniform(min_delay, max_delay)
+        if delay > 0:
+            self.sleep(delay)
+        self.stats.add(sleep_seconds=delay)
+        return delay
+
+    def count(self, driver, selector):
+        return driver.execute_script(COUNT_SCRIPT, selector) or 0
+
+    def wait_for_ready(self, driver, timeout=None):
+        """
+        Wait for the current document to finish loading.
+
+        Args:
+            driver (WebDriver): The browser.
+            timeout (float): Maximum number of seconds to wait, `timeout` by default.
+
+        Returns:
+            bool: True if the document is loaded.
+        """
+        return self._poll(lambda: driver.execute_script("return document.readyState") == "complete", timeout)
+
+    def wait_for_more(self, driver, selector, previous, timeout=None):
+        """
+        Sleep the jitter floor, then wait until more than `previous` elements match `selector`.
+
+        Args:
+            driver (WebDriver): The browser.
+            selector (str): CSS selector of the content to watch.
+            previous (int): Number of matching elements already seen.
+            timeout (float): Maximum number of seconds to wait, `timeout` by default.
+
+        Returns:
+            int: The number of matching elements when the wait ended.
+        """
+        # Past the pass budget only the jitter floor is kept
+        self.pause(max_delay=max(self.jitter[0], min(self.jitter[1], self._remaining(self.jitter[1]))))
+        counts = [previous]
+
+        def grew():
+            counts[0] = self.count(driver, selector)
+            return counts[0] > previous
+
+        self._poll(grew, timeout)
+        return counts[0]
+
+    def _poll(self, condition, timeout=None):
+        timeout = self._remaining(timeout)
+        start = self.clock()
+        deadline = start + timeout
+        try:
+            while True:
+                if condition():
+                    self.stats.add(dom_changes=1)
+                    return True
+                if self.clock() >= deadline:
+                    self.stats.add(timeouts=1)
+                    return False
+                self.sleep(min(self.poll_interval, deadline - self.clock()))
+        finally:
+            self.stats.add(dom_wait_seconds=self.clock() - start)
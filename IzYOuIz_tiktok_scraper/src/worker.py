@@ -0,0 +1,260 @@
+"""
+Worker processes running scraping jobs from the persistent JobQueue.
+
+The API server starts a WorkerScheduler itself unless SCRAPER_WORKERS is 0,
+in which case run the workers separately from the package directory:
+    python -m src.worker --workers 4
+"""
+import argparse
+import functools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from types import SimpleNamespace
+from .browser_pool import BrowserPool, create_chrome_driver
+from .job_queue import CANCELLED, DONE, FAILED, TIMED_OUT, JobQueue
+from .metrics import Metrics
+from .scrape_processor import TikTokProcessor
+from .sharding import Identity, load_identities
+
+
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(0)
+
+
+def pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def count_killed_job(status):
+    # A killed job never reaches `finish`, its metrics up to the last flush are already in
+    metrics = Metrics()
+    metrics.inc("jobs_total", status=status)
+    TikTokProcessor.task_store.add_metrics(metrics.snapshot())
+
+
+def run_worker(queue_path, index, poll_interval=1.0, identity=None):
+    """
+    Worker process loop: claim a job, run it with a warm browser, repeat.
+
+    Args:
+        queue_path (str): Path of the job queue database.
+        index (int): Worker index, used for its Chrome profile directory.
+        poll_interval (float): Seconds to wait when the queue is empty.
+        identity (Identity): Egress identity of the worker, which also claims the jobs of its shard.
+
+    Returns:
+        None
+    """
+    # Quit Chrome cleanly when the scheduler terminates this worker
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
+    job_queue = JobQueue(queue_path)
+    profile_root = os.path.join("chrome_profiles", f"worker-{index}")
+    driver_factory = create_chrome_driver
+    if identity is not None:
+        profile_root = os.path.join("chrome_profiles", identity.name, f"worker-{index}")
+        driver_factory = functools.partial(create_chrome_driver, proxy=identity.proxy)
+    browser_pool = BrowserPool(
+        size=1,
+        max_pages=int(os.environ.get("SCRAPER_BROWSER_MAX_PAGES", 200)),
+        max_rss_growth_mb=int(os.environ.get("SCRAPER_BROWSER_MAX_RSS_GROWTH_MB", 1024)),
+        user_data_root=profile_root,
+        driver_factory=driver_factory,
+    )
+    try:
+        while True:
+            job = job_queue.claim(os.getpid(), shard=identity.name if identity is not None else None)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+
+            print(f"Worker {index} running task {job['task_id']} (attempt {job['attempts']})")
+            processor = TikTokProcessor(browser_pool=browser_pool, task_id=job["task_id"], identity=identity)
+            if job["payload"].get("kind") == "batch":
+                processor.process_batch(SimpleNamespace(**job["payload"]))
+            elif job["payload"].get("kind") == "videos":
+                processor.process_video_list(SimpleNamespace(**job["payload"]))
+            else:
+                processor.process_scraping(SimpleNamespace(**job["payload"]))
+
+            task = TikTokProcessor.task_store.get(job["task_id"])
+            job_queue.finish(job["task_id"], FAILED if task and task["status"] == "failed" else DONE)
+    finally:
+        browser_pool.close()
+
+
+class WorkerScheduler:
+    """
+    Supervises a fixed number of worker processes feeding from a JobQueue.
+
+    The supervisor restarts workers that die, puts the jobs of crashed workers
+    back in the queue and kills workers whose job was cancelled or timed out.
+
+    With egress identities, worker `i` runs as identity `i % len(identities)`.
+    Workers sharing an identity split its request rate between them.
+
+    Attributes:
+        job_queue (JobQueue): The queue the workers feed from.
+        max_workers (int): Maximum number of concurrent browser jobs.
+        poll_interval (float): Seconds between two supervision passes.
+        identities (list): Egress identities of the workers, empty for direct connections.
+    """
+
+    def __init__(self, job_queue, max_workers=2, poll_interval=1.0, identities=()):
+        """
+        Initialize the scheduler, no process is started until `start`.
+
+        Args:
+            job_queue (JobQueue): The queue the workers feed from.
+            max_workers (int): Maximum number of concurrent browser jobs.
+            poll_interval (float): Seconds between two supervision passes.
+            identities (list): Egress identities of the workers, empty for direct connections.
+        """
+        self.job_queue = job_queue
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.identities = list(identities)
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = []
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """
+        Start the worker processes and the supervision thread.
+
+        Returns:
+            None
+        """
+        self.workers = [self._spawn(index) for index in range(self.max_workers)]
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while not self.stopping.wait(self.poll_interval):
+            try:
+                self.supervise()
+            except Exception as e:
+                print(f"Error supervising workers: {e}")
+
+    def stop(self):
+        """
+        Stop supervising and terminate every worker process.
+
+        Returns:
+            None
+        """
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+        for index in range(len(self.workers)):
+            self._terminate(index)
+
+    def supervise(self):
+        """
+        One supervision pass over the workers and the running jobs.
+
+        Returns:
+            None
+        """
+        for index, process in enumerate(self.workers):
+            if not process.is_alive():
+                print(f"Worker {index} exited with code {process.exitcode}. Restarting it...")
+                self.workers[index] = self._spawn(index)
+
+        workers_by_pid = {process.pid: index for index, process in enumerate(self.workers)}
+        now = time.time()
+        for job in self.job_queue.running_jobs():
+            task_id = job["task_id"]
+            index = workers_by_pid.get(job["worker_pid"])
+
+            if index is None:
+                if not pid_alive(job["worker_pid"]):
+                    # The worker crashed, or the scheduler itself was restarted
+                    state = self.job_queue.requeue(task_id)
+                    print(f"Recovered task {task_id} from a dead worker: {state}")
+                    if state == FAILED:
+                        TikTokProcessor.task_store.set(task_id, {"status": "failed", "error": "Worker crashed."})
+                        count_killed_job("failed")
+                    else:
+                        TikTokProcessor.task_store.set(task_id, {"status": "queued"})
+                continue  # Jobs of live workers we don't own belong to another scheduler
+
+            if job["cancel_requested"]:
+                self._terminate(index)
+                self.job_queue.finish(task_id, CANCELLED)
+                TikTokProcessor.task_store.set(task_id, {"status": "cancelled"})
+                count_killed_job("cancelled")
+                self.workers[index] = self._spawn(index)
+            elif job["timeout"] and now - job["started_at"] > job["timeout"]:
+                self._terminate(index)
+                self.job_queue.finish(task_id, TIMED_OUT)
+                TikTokProcessor.task_store.set(task_id, {"status": "failed",
+                                                         "error": f"Task timed out after {job['timeout']} seconds."})
+                count_killed_job("failed")
+                self.workers[index] = self._spawn(index)
+
+    def served_identities(self):
+        """
+        Get the identities at least one worker runs as, the only shards jobs may be sent to.
+
+        Returns:
+            list: The identities.
+        """
+        return self.identities[:self.max_workers]
+
+    def identity_of(self, index):
+        if not self.identities:
+            return None
+        identity = self.identities[index % len(self.identities)]
+        sharing = len(range(index % len(self.identities), self.max_workers, len(self.identities)))
+        return Identity(identity.name, proxy=identity.proxy, cobalt_url=identity.cobalt_url,
+                        requests_per_second=identity.requests_per_second / max(1, sharing))
+
+    def _spawn(self, index):
+        process = self.context.Process(target=run_worker, args=(self.job_queue.path, index),
+                                       kwargs={"identity": self.identity_of(index)}, daemon=True)
+        process.start()
+        return process
+
+    def _terminate(self, index):
+        process = self.workers[index]
+        if process.is_alive():
+            process.terminate()
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SCRAPER_WORKERS", 2) or 2))
+    parser.add_argument("--queue", default=os.environ.get("SCRAPER_JOB_QUEUE", "jobs.db"))
+    parser.add_argument("--identity", action="append", default=[],
+                        help="only run as these identities of SCRAPER_IDENTITIES, e.g. one per node")
+    args = parser.parse_args()
+
+    identities = load_identities(os.environ.get("SCRAPER_IDENTITIES", ""))
+    if args.identity:
+        identities = [identity for identity in identities if identity.name in args.identity]
+    scheduler = WorkerScheduler(JobQueue(args.queue), max_workers=args.workers, identities=identities)
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scheduler.stop()
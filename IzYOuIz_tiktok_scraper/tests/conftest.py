@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app is run from this package's directory (`uvicorn server:app`), mirror that for the tests.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,129 @@
+import asyncio
+import contextlib
+import io
+import time
+
+from benchmarks.stub_cobalt import StubCobaltServer
+from src.async_download import AsyncVideoDownloader
+from src.rate_limiter import AsyncTokenBucket
+
+
+def test_downloads_run_concurrently_and_survive_rate_limits(tmp_path):
+    async def run(cobalt):
+        downloader = AsyncVideoDownloader(api_url=cobalt.url, rate_limit_delay=0, max_concurrency=4,
+                                          requests_per_second=100)
+        events = []
+        downloader.event_callback = lambda event, **data: events.append(data["index"])
+        video_infos = [{"video": f"https://www.tiktok.com/@a/video/{i}"} for i in range(8)]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                await downloader.process_videos(video_infos, str(tmp_path))
+        finally:
+            await downloader.aclose()
+        return downloader, video_infos, events
+
+    with StubCobaltServer(payload_size=4096, rate_limit_every=3, retry_after=0) as cobalt:
+        downloader, video_infos, events = asyncio.run(run(cobalt))
+
+    assert [info["video"] for info in video_infos] == [f"/{tmp_path}/tiktok_{i}.mp4" for i in range(8)]
+    assert sorted(events) == list(range(8))
+    assert (tmp_path / "tiktok_5.mp4").stat().st_size == 4096
+    counters = downloader.metrics.snapshot()
+    assert counters["rate_limit_hits_total"] == cobalt.rate_limited >= 1
+    assert counters["download_bytes_total"] == 8 * 4096
+
+
+def test_truncated_downloads_are_removed(tmp_path):
+    async def run(cobalt):
+        downloader = AsyncVideoDownloader(api_url=cobalt.url, max_concurrency=1, requests_per_second=1000)
+        video_infos = [{"video": f"https://www.tiktok.com/@a/video/{i}"} for i in range(2)]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                await downloader.process_videos(video_infos, str(tmp_path))
+        finally:
+            await downloader.aclose()
+        return downloader, video_infos
+
+    with StubCobaltServer(payload_size=4096, truncate_every=2) as cobalt:
+        downloader, video_infos = asyncio.run(run(cobalt))
+
+    assert [info["video"] for info in video_infos] == [f"/{tmp_path}/tiktok_0.mp4", "__invalide__"]
+    assert not (tmp_path / "tiktok_1.mp4").exists()
+    assert downloader.metrics.snapshot()["downloads_truncated_total"] == 1
+
+
+def test_cancelled_downloads_leave_no_partial_file(tmp_path):
+    async def run(cobalt):
+        downloader = AsyncVideoDownloader(api_url=cobalt.url, requests_per_second=1000)
+        downloader.chunk_size = 1024
+        task = asyncio.create_task(downloader.process_video("https://www.tiktok.com/@a/video/1", str(tmp_path)))
+        try:
+            while not list(tmp_path.glob("*.part")):
+                await asyncio.sleep(0.001)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        finally:
+            await downloader.aclose()
+
+    with StubCobaltServer(payload_size=4 * 1024 * 1024) as cobalt:
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(run(cobalt))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_disk_errors_only_fail_their_video(tmp_path):
+    async def run(cobalt):
+        downloader = AsyncVideoDownloader(api_url=cobalt.url, requests_per_second=1000)
+        events = []
+        downloader.event_callback = lambda event, **data: events.append(data["path"])
+        video_info = {"video": "https://www.tiktok.com/@a/video/1"}
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                await downloader.process_video_info(video_info, str(tmp_path / "missing"), index=0)
+        finally:
+            await downloader.aclose()
+        return downloader, events
+
+    with StubCobaltServer(payload_size=4096) as cobalt:
+        downloader, events = asyncio.run(run(cobalt))
+
+    assert events == [None]
+    assert downloader.metrics.snapshot()["downloads_failed_total"] == 1
+
+
+def test_job_downloaders_share_the_pool_but_not_the_metrics():
+    downloader = AsyncVideoDownloader()
+    job = downloader.for_job()
+    job.metrics.inc("downloads_failed_total")
+
+    assert (job.clients, job.rate_limiter, job.semaphore) == \
+        (downloader.clients, downloader.rate_limiter, downloader.semaphore)
+    assert len(downloader.clients) == 8  # 64 downloads in flight over pools of 8 connections
+    assert "downloads_failed_total" not in downloader.metrics.snapshot()
+    asyncio.run(downloader.aclose())
+
+
+def test_rate_limited_bucket_doesnt_block_the_loop():
+    async def run():
+        bucket = AsyncTokenBucket(rate=100, capacity=1)
+        bucket.penalize(retry_after=0.3)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        start = time.monotonic()
+        waited = await bucket.acquire()
+        elapsed = time.monotonic() - start
+        task.cancel()
+        return waited, elapsed, ticks
+
+    waited, elapsed, ticks = asyncio.run(run())
+    assert 0.25 < waited and 0.25 < elapsed < 1
+    assert ticks >= 10
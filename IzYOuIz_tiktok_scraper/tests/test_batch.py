@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+from src.checkpoint import FeedCheckpoint
+from src.export import ResultExporter, iter_ndjson
+
+
+def test_batch_dedupes_videos_across_queries(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SCRAPER_TASK_STORE", "memory")
+    monkeypatch.setenv("SCRAPER_METADATA_DB", "")
+    from src.scrape_processor import TikTokProcessor
+
+    feeds = {
+        "tag/cats": ["1", "2", "3"],
+        "tag/dogs": ["3", "4"],
+        "@pets": ["1", "5"],
+    }
+    processor = TikTokProcessor()
+    scraper = processor.scraper
+    sessions = []
+    monkeypatch.setattr(scraper, "get_chrome_driver", lambda: sessions.append("start"))
+    monkeypatch.setattr(scraper, "release_driver", lambda: sessions.append("release"))
+    monkeypatch.setattr(scraper, "collect_business_hashtags", lambda topic_index: ["dogs"])
+    monkeypatch.setattr(scraper, "iter_tiktok_video_urls", lambda url_param, **kwargs: iter(
+        [f"https://www.tiktok.com/@a/video/{video_id}" for video_id in feeds[url_param]]))
+    monkeypatch.setattr(scraper, "fetch_video_information", lambda video_urls: (
+        [{"videotiktok": url, "video": url} for url in video_urls], []))
+    downloads = []
+
+    def process_video_info(video_info, output_dir, index=None):
+        downloads.append(video_info["videotiktok"])
+        if not video_info["videotiktok"].endswith("3"):  # video 3 fails to download
+            video_info["video"] = f"/{output_dir}/{len(downloads)}.mp4"
+
+    monkeypatch.setattr(processor.downloader, "process_video_info", process_video_info)
+
+    processor.process_batch(SimpleNamespace(
+        queries=[{"search_type": "hashtag", "search_query": "cats"}, {"search_type": "userid", "search_query": "pets"}],
+        topic=2, max_hashtags=1, max_videos=10, incremental=False))
+
+    task = TikTokProcessor.task_store.get(processor.task_id)
+    assert task["status"] == "completed"
+    assert sessions == ["start", "release"]
+    assert [video["videotiktok"][-1] for video in task["videos"]] == ["1", "2", "3", "5", "4"]
+    assert sorted(downloads) == sorted(video["videotiktok"] for video in task["videos"])
+    assert [(child["search_query"], child["status"], child["videos_found"], child["duplicates"])
+            for child in task["children"]] == [("cats", "completed", 3, 0), ("pets", "completed", 1, 1),
+                                               ("dogs", "completed", 1, 1)]
+    # the failed download is retried by the next incremental run
+    assert FeedCheckpoint("tag/cats", root="checkpoints").seen == {"1", "2"}
+
+
+def test_only_downloaded_videos_are_exported(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SCRAPER_TASK_STORE", "memory")
+    monkeypatch.setenv("SCRAPER_METADATA_DB", "")
+    from src.scrape_processor import TikTokProcessor
+
+    exporter = ResultExporter(str(tmp_path / "exports"))
+    monkeypatch.setattr(TikTokProcessor, "exporter", exporter)
+    monkeypatch.setattr(TikTokProcessor, "media_index", None)
+    processor = TikTokProcessor()
+    for video_id, path in (("1", "/videos/1.mp4"), ("2", None), ("3", "__invalide__")):
+        processor.on_event("video_downloaded", index=0, path=path,
+                           video_info={"videotiktok": f"https://www.tiktok.com/@a/video/{video_id}", "video": path})
+
+    assert [row["video_id"] for row in iter_ndjson(exporter.paths(processor.task_id))] == ["1"]
+
+
+def test_importing_the_processor_creates_no_files(tmp_path):
+    package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", "import src.scrape_processor"], cwd=tmp_path, check=True,
+                   env={**os.environ, "PYTHONPATH": package})
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,36 @@
+import contextlib
+import io
+
+import pytest
+import requests
+
+from benchmarks.fake_tiktok import FakeTikTokServer, video_ids
+from benchmarks.stub_cobalt import StubCobaltServer
+from src.download import VideoDownloader
+from src.embed_extractor import HttpEmbedExtractor
+
+
+def test_fake_embed_pages_parse_like_the_real_ones():
+    with FakeTikTokServer(embed_error_every=1) as fake:
+        extractor = HttpEmbedExtractor(embed_url=f"{fake.url}embed/v2/")
+        video_id = video_ids("tag/bench", 1)[0]
+        with pytest.raises(requests.HTTPError):
+            extractor.extract(video_id)  # fails once, as configured
+        second = extractor.extract(video_id)
+
+        assert second["userid"].startswith("@creator")
+        assert second["like_count"] == 32900
+        assert video_id in requests.get(f"{fake.url}tag/bench").text
+
+
+def test_downloads_survive_stub_rate_limits(tmp_path):
+    with StubCobaltServer(payload_size=4096, rate_limit_every=2, retry_after=0) as cobalt:
+        downloader = VideoDownloader(api_url=cobalt.url, rate_limit_delay=0, requests_per_second=100)
+        with contextlib.redirect_stdout(io.StringIO()):
+            paths = [downloader.process_video(f"https://www.tiktok.com/@a/video/{i}", str(tmp_path)) for i in range(3)]
+
+        assert all(path and path.endswith(".mp4") for path in paths)
+        assert cobalt.rate_limited >= 1
+        assert downloader.metrics.snapshot()["rate_limit_hits_total"] == cobalt.rate_limited
+        with open(tmp_path / "tiktok_0.mp4", "rb") as f:
+            assert f.read(12)[4:] == b"ftypisom"
@@ -0,0 +1,89 @@
+from src.browser_pool import BrowserPool
+from src.scrape_processor import TikTokScraper
+
+
+class FakeDriver:
+    def __init__(self, user_data_dir):
+        self.user_data_dir = user_data_dir
+        self.window_handles = ["main"]
+        self.alive = True
+        self.quit_called = False
+        self.switch_to = self
+
+    def window(self, handle):
+        pass
+
+    def execute_script(self, script):
+        if not self.alive:
+            raise RuntimeError("browser crashed")
+        return 1
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+class TabsDriver(FakeDriver):
+    # The main tab can't be switched back to once the others are closed
+    def __init__(self, user_data_dir):
+        super().__init__(user_data_dir)
+        self.current_window_handle = "main"
+        self.main_lost = False
+
+    def new_window(self, kind):
+        self.current_window_handle = f"tab-{len(self.window_handles)}"
+        self.window_handles.append(self.current_window_handle)
+
+    def window(self, handle):
+        if handle == "main" and self.main_lost:
+            raise RuntimeError("no such window")
+        self.current_window_handle = handle
+
+    def execute_script(self, script, *args):
+        return 1
+
+    def close(self):
+        self.window_handles.remove(self.current_window_handle)
+        self.main_lost = True
+
+
+def test_checkout_reuses_warm_driver(tmp_path):
+    pool = BrowserPool(size=2, user_data_root=str(tmp_path), driver_factory=FakeDriver)
+    driver = pool.checkout()
+    pool.checkin(driver, pages=3)
+    assert pool.checkout() is driver
+
+
+def test_slots_get_their_own_profile(tmp_path):
+    pool = BrowserPool(size=2, user_data_root=str(tmp_path), driver_factory=FakeDriver)
+    first, second = pool.checkout(), pool.checkout()
+    assert first.user_data_dir != second.user_data_dir
+
+
+def test_recycles_after_max_pages_and_when_unhealthy(tmp_path):
+    pool = BrowserPool(size=1, max_pages=5, user_data_root=str(tmp_path), driver_factory=FakeDriver)
+    driver = pool.checkout()
+    pool.checkin(driver, pages=5)
+    assert driver.quit_called
+
+    driver = pool.checkout()
+    pool.checkin(driver)
+    driver.alive = False
+    replacement = pool.checkout()
+    assert replacement is not driver and driver.quit_called
+
+
+def test_tab_errors_keep_the_results_and_recycle_the_browser(tmp_path, monkeypatch):
+    pool = BrowserPool(size=1, user_data_root=str(tmp_path), driver_factory=TabsDriver)
+    scraper = TikTokScraper(browser_pool=pool, embed_tabs=2)
+    monkeypatch.setattr(scraper, "read_embed_page", lambda video_id: {"videotiktok": video_id})
+    driver = scraper.get_chrome_driver()
+    video_urls = [f"https://www.tiktok.com/@a/video/{i}" for i in range(2)]
+    results = [None, None]
+
+    scraper.scrape_embed_pages_in_tabs(video_urls, [0, 1], results)
+    assert results == [{"videotiktok": "0"}, {"videotiktok": "1"}]
+    scraper.release_driver()
+    assert driver.quit_called
@@ -0,0 +1,25 @@
+from src.checkpoint import FeedCheckpoint
+
+
+def test_seen_ids_persist_across_instances(tmp_path):
+    checkpoint = FeedCheckpoint("tag/cats", root=str(tmp_path))
+    checkpoint.mark_seen(["1", "2", "2"])
+    checkpoint.mark_seen(["2", "3"])
+
+    reloaded = FeedCheckpoint("tag/cats", root=str(tmp_path))
+    assert reloaded.seen == {"1", "2", "3"}
+    assert reloaded.is_known("3") and not reloaded.is_known("4")
+    with open(reloaded.seen_path) as f:
+        assert f.read().split() == ["1", "2", "3"]
+    assert not FeedCheckpoint("@cats", root=str(tmp_path)).seen
+
+
+def test_job_progress_can_be_resumed(tmp_path):
+    checkpoint = FeedCheckpoint("@nfl", root=str(tmp_path))
+    assert checkpoint.load_job("task") == []
+
+    checkpoint.save_job("task", ["https://www.tiktok.com/@nfl/video/1"])
+    assert FeedCheckpoint("@nfl", root=str(tmp_path)).load_job("task") == ["https://www.tiktok.com/@nfl/video/1"]
+
+    checkpoint.clear_job("task")
+    assert checkpoint.load_job("task") == []
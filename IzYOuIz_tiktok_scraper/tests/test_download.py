@@ -0,0 +1,77 @@
+import contextlib
+import io
+import os
+import random
+import time
+
+from benchmarks.stub_cobalt import StubCobaltServer
+from src.download import VideoDownloader
+from src.rate_limiter import TokenBucket, parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("") is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+def test_token_bucket_honours_retry_after():
+    bucket = TokenBucket(rate=100, capacity=1)
+    bucket.acquire()
+    bucket.penalize(retry_after=0.2)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.19
+    assert bucket.rate == 50
+
+
+def test_process_videos_keeps_order_with_workers(tmp_path):
+    downloader = VideoDownloader(rate_limit_delay=0, max_workers=4, requests_per_second=1000)
+    calls = {}
+
+    def fetch_tunnel_url(video_url):
+        calls[video_url] = calls.get(video_url, 0) + 1
+        if video_url.endswith("3") and calls[video_url] == 1:
+            return {"rate_exceeded": True, "retry_after": 0.01}
+        if video_url.endswith("5"):
+            return None
+        return {"url": video_url, "filename": video_url.split("/")[-1] + ".mp4"}
+
+    def download_video_from_tunnel(tunnel_url, filename, output_dir):
+        time.sleep(random.uniform(0, 0.02))
+        return 0
+
+    downloader.fetch_tunnel_url = fetch_tunnel_url
+    downloader.download_video_from_tunnel = download_video_from_tunnel
+
+    video_infos = [{"video": f"https://www.tiktok.com/@u/video/{i}"} for i in range(8)]
+    result = downloader.process_videos(video_infos, str(tmp_path))
+
+    assert calls["https://www.tiktok.com/@u/video/3"] == 2
+    assert result[5]["video"] == "https://www.tiktok.com/@u/video/5"
+    for i in (0, 1, 2, 3, 4, 6, 7):
+        assert result[i]["video"].endswith(f"/{i}.mp4")
+
+
+def test_truncated_downloads_are_removed(tmp_path):
+    with StubCobaltServer(payload_size=64 * 1024, truncate_every=2) as cobalt:
+        downloader = VideoDownloader(api_url=cobalt.url, max_workers=1, requests_per_second=1000)
+        video_infos = [{"video": f"https://www.tiktok.com/@u/video/{i}"} for i in range(4)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            downloader.process_videos(video_infos, str(tmp_path))
+
+    assert [info["video"] for info in video_infos] == \
+        [f"/{tmp_path}/tiktok_0.mp4", "__invalide__", f"/{tmp_path}/tiktok_2.mp4", "__invalide__"]
+    assert sorted(os.listdir(tmp_path)) == ["tiktok_0.mp4", "tiktok_2.mp4"]
+    assert downloader.metrics.snapshot()["downloads_truncated_total"] == 2
+
+
+def test_unreachable_cobalt_only_fails_its_videos(tmp_path):
+    downloader = VideoDownloader(api_url="http://127.0.0.1:9/", max_workers=2, timeout=(0.5, 0.5))
+    video_infos = [{"video": f"https://www.tiktok.com/@u/video/{i}"} for i in range(2)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        downloader.process_videos(video_infos, str(tmp_path))
+
+    assert [info["video"] for info in video_infos] == [f"https://www.tiktok.com/@u/video/{i}" for i in range(2)]
+    assert downloader.metrics.snapshot()["downloads_failed_total"] == 2
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+from src.embed_extractor import normalize_counts, parse_count, parse_embed_page
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_chunks(name, size=64):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        html = f.read()
+    return [html[i:i + size] for i in range(0, len(html), size)]
+
+
+def test_parses_rendered_video_card():
+    # the page has no hydration script, only the rendered card
+    info = parse_embed_page(read_chunks("embed_v2_dom.html"), "7469113403739573550")
+    assert info == {
+        "video": "https://www.tiktok.com/@tmobile/video/7469113403739573550",
+        "videotiktok": "https://www.tiktok.com/@tmobile/video/7469113403739573550",
+        "song": "original sound - T-Mobile",
+        "userid": "@tmobile",
+        "like_count": 32900,
+        "comment_count": 1432,
+        "share_count": 58,
+    }
+
+
+def test_parses_hydration_state():
+    info = parse_embed_page(read_chunks("embed_v2_state.html"), "7469607703065791790")
+    assert info["userid"] == "@nfl"
+    assert info["song"] == "original sound - NFL"
+    assert (info["like_count"], info["comment_count"], info["share_count"]) == (10312345, 67412, 441833)
+
+
+def test_unusable_hydration_state_falls_back_to_the_video_card():
+    card = "".join(read_chunks("embed_v2_dom.html"))
+    for state in ("{not json", '{"itemInfos": {}, "authorInfos": {}}'):
+        page = f'<script id="__FRONTITY_CONNECT_STATE__" type="application/json">{state}</script>{card}'
+        info = parse_embed_page([page[i:i + 64] for i in range(0, len(page), 64)], "7469113403739573550")
+        assert (info["userid"], info["like_count"]) == ("@tmobile", 32900)
+
+    with pytest.raises(ValueError):  # left for the browser
+        parse_embed_page(['<script id="SIGI_STATE">{not json</script><div id="main"></div>'], "1")
+
+
+def test_page_without_video_card_raises():
+    with pytest.raises(ValueError):
+        parse_embed_page(["<html><body><div id='main'></div></body></html>"], "1")
+
+
+def test_parse_count():
+    assert [parse_count(text) for text in ("58", "1,432", "32.9K", "10.3M", "1.2b", "", None, 7)] == \
+        [58, 1432, 32900, 10300000, 1200000000, 0, 0, 7]
+    assert normalize_counts({"like_count": "2K", "comment_count": 3, "share_count": "0"})["like_count"] == 2000
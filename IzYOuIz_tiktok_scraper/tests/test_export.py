@@ -0,0 +1,61 @@
+import multiprocessing
+
+import pytest
+
+from src.export import ResultExporter, iter_ndjson
+
+
+def video(video_id, likes="32.9K"):
+    return {"video": f"videos/a/tiktok_{video_id}.mp4", "videotiktok": f"https://www.tiktok.com/@a/video/{video_id}",
+            "song": "original sound", "userid": "@a", "like_count": likes, "comment_count": 1432, "share_count": "58"}
+
+
+def append_from_child(root, task_id, start):
+    exporter = ResultExporter(root)
+    for i in range(start, start + 200):
+        exporter.append(task_id, video(str(i)))
+
+
+def test_rows_are_appended_with_integer_counts(tmp_path):
+    exporter = ResultExporter(str(tmp_path))
+    exporter.append("t1", video("1"))
+    exporter.append("t1", video("2", likes=7))
+    exporter.append("t2", video("3"))
+    with open(exporter.path("t2"), "a") as f:
+        f.write('{"video_id": "4"')  # a row cut short by a crash
+
+    rows = list(iter_ndjson(exporter.paths("t1")))
+    assert [(row["video_id"], row["task_id"], row["like_count"], row["share_count"]) for row in rows] == \
+        [("1", "t1", 32900, 58), ("2", "t1", 7, 58)]
+    assert [row["video_id"] for row in iter_ndjson(exporter.paths())] == ["1", "2", "3"]
+    assert exporter.paths("missing") == []
+
+
+def test_processes_never_interleave_rows(tmp_path):
+    processes = [multiprocessing.Process(target=append_from_child, args=(str(tmp_path), "t", start))
+                 for start in (0, 1000)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    rows = list(iter_ndjson([str(tmp_path / "t.ndjson")]))
+    assert sorted(int(row["video_id"]) for row in rows) == list(range(200)) + list(range(1000, 1200))
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_columnar_export(tmp_path, format):
+    pa = pytest.importorskip("pyarrow")
+    exporter = ResultExporter(str(tmp_path), batch_rows=2)
+    for i in range(5):
+        exporter.append("t", video(str(i)))
+
+    path = exporter.export_columnar(format=format)
+    if format == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+    else:
+        table = pa.ipc.open_file(path).read_all()
+    assert table.num_rows == 5
+    assert table.schema.field("like_count").type == pa.int64()
+    assert exporter.export_columnar(format=format) == path
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.file_server import StatCache, parse_range, serve_file
+
+
+@pytest.fixture
+def client(tmp_path):
+    os.makedirs(tmp_path / "videos" / "feed")
+    (tmp_path / "videos" / "feed" / "a.mp4").write_bytes(bytes(range(256)) * 4)
+    (tmp_path / "secret.txt").write_text("secret")
+
+    app = FastAPI()
+    stat_cache = StatCache()
+
+    @app.api_route("/videos/{subfolder}/{filename}", methods=["GET", "HEAD"])
+    async def video(subfolder: str, filename: str, request: Request):
+        return serve_file(request, str(tmp_path / "videos"), os.path.join(subfolder, filename), stat_cache,
+                          chunk_size=100)
+
+    return TestClient(app)
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-99", 1000) == (0, 100)
+    assert parse_range("bytes=900-", 1000) == (900, 1000)
+    assert parse_range("bytes=-100", 1000) == (900, 1000)
+    assert parse_range("bytes=0-5000", 1000) == (0, 1000)
+    assert parse_range("bytes=1000-", 1000) == ()
+    assert parse_range("bytes=0-1,5-6", 1000) is None
+    assert parse_range("items=0-1", 1000) is None
+
+
+def test_whole_file_and_ranges(client):
+    response = client.get("/videos/feed/a.mp4")
+    assert response.status_code == 200
+    assert response.content == bytes(range(256)) * 4
+    assert response.headers["accept-ranges"] == "bytes"
+
+    response = client.get("/videos/feed/a.mp4", headers={"Range": "bytes=250-261"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 250-261/1024"
+    assert response.content == bytes([250, 251, 252, 253, 254, 255, 0, 1, 2, 3, 4, 5])
+
+    response = client.get("/videos/feed/a.mp4", headers={"Range": "bytes=4096-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+    response = client.head("/videos/feed/a.mp4", headers={"Range": "bytes=-24"})
+    assert response.status_code == 206 and response.headers["content-length"] == "24"
+
+
+def test_conditional_get(client):
+    etag = client.get("/videos/feed/a.mp4").headers["etag"]
+
+    response = client.get("/videos/feed/a.mp4", headers={"If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+
+    # A stale If-Range gets the whole, new file instead of a slice of it
+    response = client.get("/videos/feed/a.mp4", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert response.status_code == 200 and len(response.content) == 1024
+
+
+def test_missing_files_and_paths_outside_root(client):
+    assert client.get("/videos/feed/missing.mp4").status_code == 404
+    assert client.get("/videos/../secret.txt").status_code == 404
+    assert client.get("/videos/..%2F../secret.txt").status_code == 404
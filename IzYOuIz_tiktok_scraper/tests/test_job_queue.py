@@ -0,0 +1,44 @@
+from src.job_queue import CANCELLED, FAILED, QUEUED, RUNNING, JobQueue
+
+
+def test_claims_by_priority_then_fifo(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    queue.enqueue("low", {"n": 1})
+    queue.enqueue("first", {"n": 2}, priority=5)
+    queue.enqueue("second", {"n": 3}, priority=5)
+
+    assert [queue.claim(1)["task_id"] for _ in range(3)] == ["first", "second", "low"]
+    assert queue.claim(1) is None
+
+
+def test_cancel_queued_and_running_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    queue.enqueue("queued", {})
+    queue.enqueue("running", {}, priority=1)
+    queue.claim(1)
+
+    assert queue.cancel("queued") == CANCELLED
+    assert queue.cancel("running") == RUNNING
+    assert queue.running_jobs()[0]["cancel_requested"] == 1
+    assert queue.cancel("missing") is None
+
+
+def test_tracked_jobs_are_cancelled_through_the_queue(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    queue.track("inline", {"kind": "videos", "video_urls": []}, worker_pid=1)
+    assert queue.claim(2) is None  # already running, never handed to a worker
+
+    other_process = JobQueue(str(tmp_path / "jobs.db"))
+    assert queue.cancel_requested(["inline"]) == set()
+    assert other_process.cancel("inline") == RUNNING
+    assert queue.cancel_requested(["inline", "missing"]) == {"inline"}
+
+
+def test_requeue_until_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_attempts=2)
+    queue.enqueue("job", {"search_type": "trending"})
+
+    assert queue.claim(1)["payload"] == {"search_type": "trending"}
+    assert queue.requeue("job") == QUEUED
+    assert queue.claim(2)["attempts"] == 2
+    assert queue.requeue("job") == FAILED
@@ -0,0 +1,64 @@
+import os
+from concurrent.futures import wait
+
+import pytest
+
+from benchmarks.stub_cobalt import make_mp4
+from src import media_index
+from src.media_index import MediaIndex, probe_mp4
+
+
+def test_probe_reads_the_headers_and_spots_truncated_files(tmp_path):
+    data = make_mp4(256 * 1024, duration=12.5, width=576, height=1024)
+    (tmp_path / "whole.mp4").write_bytes(data)
+    (tmp_path / "cut.mp4").write_bytes(data[:len(data) // 2])
+    (tmp_path / "page.mp4").write_bytes(b"<html>rate limited</html>")
+
+    assert probe_mp4(str(tmp_path / "whole.mp4")) == {"duration": 12.5, "width": 576, "height": 1024, "complete": True}
+    assert probe_mp4(str(tmp_path / "cut.mp4"))["complete"] is False
+    with pytest.raises(ValueError):
+        probe_mp4(str(tmp_path / "page.mp4"))
+
+
+def test_index_lists_videos_and_reuses_the_entries_of_cached_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_index.shutil, "which", lambda name: None)  # no ffmpeg, no posters
+    videos = tmp_path / "videos"
+    (videos / "a_videos").mkdir(parents=True)
+    (videos / "b_videos").mkdir()
+    data = make_mp4(64 * 1024)
+    (videos / "a_videos" / "tiktok_nfl_1.mp4").write_bytes(data)
+    (videos / "a_videos" / "tiktok_nfl_2.mp4").write_bytes(data[:40 * 1024])
+    os.link(videos / "a_videos" / "tiktok_nfl_1.mp4", videos / "b_videos" / "tiktok_nfl_1.mp4")
+
+    index = MediaIndex(str(tmp_path / "media.db"), videos_root=str(videos), posters_root=str(tmp_path / "posters"),
+                       workers=0)
+    for path in ("a_videos/tiktok_nfl_1.mp4", "a_videos/tiktok_nfl_2.mp4", "b_videos/tiktok_nfl_1.mp4"):
+        index.add(str(videos / path))
+    assert index.add(str(videos / "a_videos" / "tiktok_nfl_1.mp4")) is None  # unchanged, not inspected again
+
+    entries, total = index.list_videos(folder="a_videos")
+    assert total == 2
+    by_path = {entry["video"]: entry for entry in entries}
+    whole = by_path["/videos/a_videos/tiktok_nfl_1.mp4"]
+    assert (whole["video_id"], whole["size"], whole["duration"], whole["width"], whole["status"], whole["poster"]) == \
+        ("1", len(data), 15.0, 720, "ok", None)
+    assert by_path["/videos/a_videos/tiktok_nfl_2.mp4"]["status"] == "truncated"
+
+    copy, = index.list_videos(folder="b_videos")[0]
+    assert (copy["sha256"], copy["height"]) == (whole["sha256"], 1280)
+    assert index.list_videos(status="truncated")[1] == 1
+
+
+def test_files_are_inspected_in_the_process_pool(tmp_path):
+    (tmp_path / "videos" / "x_videos").mkdir(parents=True)
+    (tmp_path / "videos" / "x_videos" / "tiktok_7.mp4").write_bytes(make_mp4(16 * 1024, duration=3))
+    index = MediaIndex(str(tmp_path / "media.db"), videos_root=str(tmp_path / "videos"),
+                       posters_root=str(tmp_path / "posters"), workers=1)
+    try:
+        wait(index.scan())
+        entries, total = index.list_videos()
+    finally:
+        index.close()
+
+    assert total == 1
+    assert (entries[0]["video"], entries[0]["duration"]) == ("/videos/x_videos/tiktok_7.mp4", 3.0)
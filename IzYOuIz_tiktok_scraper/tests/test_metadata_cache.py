@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+from src.metadata_cache import MetadataCache
+from src.scrape_processor import TikTokScraper
+
+INFO = {
+    "video": "https://www.tiktok.com/@nfl/video/1",
+    "videotiktok": "https://www.tiktok.com/@nfl/video/1",
+    "song": "original sound - NFL",
+    "userid": "@nfl",
+    "like_count": "10.3M",
+    "comment_count": "67.4K",
+    "share_count": "441.8K",
+}
+
+
+def test_counters_go_stale_but_static_fields_do_not():
+    cache = MetadataCache(ttls={"like_count": 0})
+    cache.put("1", INFO)
+    assert cache.get("1") is None
+
+    cache = MetadataCache()
+    cache.put("1", INFO)
+    assert cache.get("1") == INFO
+
+
+def test_stale_counters_are_only_returned_on_request():
+    cache = MetadataCache(ttls={"like_count": 0})
+    cache.put("1", INFO)
+    assert cache.stale_fields(*cache.entries["1"]) == ["like_count"]
+    assert cache.get("1", allow_stale=True) == INFO
+
+    cache.put("2", {field: value for field, value in INFO.items() if field != "song"})
+    assert cache.get("2", allow_stale=True) is None
+
+
+def test_scraper_falls_back_to_stale_counters_when_http_fails():
+    cache = MetadataCache(ttls={"like_count": 0})
+    cache.put("1", INFO)
+    extractor = SimpleNamespace(extract_many=lambda video_ids: [ConnectionError("blocked") for _ in video_ids])
+    scraper = TikTokScraper(embed_extractor=extractor, metadata_cache=cache)
+
+    results, pending = scraper.fetch_video_information(["https://www.tiktok.com/@nfl/video/1",
+                                                        "https://www.tiktok.com/@nfl/video/2"])
+    assert pending == [1]
+    assert (results[0]["song"], results[0]["like_count"]) == ("original sound - NFL", 10300000)
+    assert scraper.metrics.snapshot()["metadata_cache_stale_total"] == 1
+
+
+def test_returned_info_is_a_copy():
+    cache = MetadataCache()
+    cache.put("1", INFO)
+    cache.get("1")["video"] = "/videos/job/tiktok_nfl_1.mp4"
+    assert cache.get("1")["video"] == INFO["video"]
+
+
+def test_lru_is_bounded_and_disk_tier_is_shared(tmp_path):
+    path = str(tmp_path / "metadata.db")
+    cache = MetadataCache(max_entries=1, disk_path=path)
+    cache.put("1", INFO)
+    cache.put("2", INFO)
+    assert list(cache.entries) == ["2"]
+    assert cache.get("1") == INFO
+
+    assert MetadataCache(disk_path=path).get("2") == INFO
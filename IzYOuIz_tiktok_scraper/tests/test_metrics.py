@@ -0,0 +1,68 @@
+from src.metrics import Metrics, render_prometheus
+
+
+def test_spans_fill_the_stage_histogram():
+    metrics = Metrics(buckets=(0.1, 1, float("inf")))
+    metrics.observe("scroll", 0.05)
+    metrics.observe("scroll", 0.5)
+    with metrics.span("download"):
+        pass
+    metrics.inc("download_bytes_total", 2048)
+    metrics.inc("rate_limit_hits_total")
+
+    samples = metrics.snapshot()
+    assert samples['stage_seconds_bucket{stage="scroll",le="0.1"}'] == 1
+    assert samples['stage_seconds_bucket{stage="scroll",le="1"}'] == 2
+    assert samples['stage_seconds_bucket{stage="scroll",le="+Inf"}'] == 2
+    assert samples['stage_seconds_count{stage="download"}'] == 1
+
+    summary = metrics.summary()
+    assert summary["counters"] == {"download_bytes_total": 2048, "rate_limit_hits_total": 1}
+    assert summary["stages"]["scroll"] == {"count": 2, "seconds": 0.55}
+    assert summary["bytes_per_second"] > 0
+
+
+def test_prometheus_exposition():
+    metrics = Metrics(buckets=(1, float("inf")))
+    metrics.observe("scroll", 2)
+    metrics.inc("jobs_total", status="completed")
+
+    text = render_prometheus(metrics.snapshot())
+    assert text.splitlines() == [
+        "# TYPE tiktok_scraper_jobs_total counter",
+        'tiktok_scraper_jobs_total{status="completed"} 1',
+        "# TYPE tiktok_scraper_stage_seconds histogram",
+        'tiktok_scraper_stage_seconds_bucket{stage="scroll",le="1"} 0',
+        'tiktok_scraper_stage_seconds_bucket{stage="scroll",le="+Inf"} 1',
+        'tiktok_scraper_stage_seconds_count{stage="scroll"} 1',
+        'tiktok_scraper_stage_seconds_sum{stage="scroll"} 2',
+    ]
+
+
+def test_deltas_add_up_to_the_snapshot():
+    metrics = Metrics()
+    metrics.inc("videos_found_total", 3)
+    assert metrics.delta() == {"videos_found_total": 3}
+    assert metrics.delta() == {}
+    metrics.inc("videos_found_total")
+    metrics.inc("downloads_failed_total")
+    assert metrics.delta() == {"videos_found_total": 1, "downloads_failed_total": 1}
+
+
+def test_running_jobs_flush_their_metrics(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SCRAPER_TASK_STORE", "memory")
+    monkeypatch.setenv("SCRAPER_METADATA_DB", "")
+    monkeypatch.setenv("SCRAPER_METRICS_FLUSH_SECONDS", "0")
+    from src.scrape_processor import TikTokProcessor
+    from src.task_store import MemoryTaskStore
+
+    monkeypatch.setattr(TikTokProcessor, "task_store", MemoryTaskStore())
+    processor = TikTokProcessor()
+    processor.on_event("video_found", url="https://www.tiktok.com/@a/video/1")
+    processor.on_event("video_found", url="https://www.tiktok.com/@a/video/2")
+    assert TikTokProcessor.task_store.metrics()["videos_found_total"] == 2  # before the job finishes
+
+    processor.finish({"status": "failed", "error": "boom"})
+    totals = TikTokProcessor.task_store.metrics()
+    assert (totals["videos_found_total"], totals['jobs_total{status="failed"}']) == (2, 1)
@@ -0,0 +1,80 @@
+import threading
+
+from src.pipeline import StreamingPipeline
+
+
+class FakeScraper:
+    def __init__(self):
+        self.failed_videos = []
+        self.rendered = []
+
+    def fetch_video_information(self, video_urls):
+        # Odd videos can't be extracted over HTTP
+        results = [None if int(url[-1]) % 2 else {"videotiktok": url, "video": url} for url in video_urls]
+        return results, [i for i, result in enumerate(results) if result is None]
+
+    def scrape_embed_pages_in_tabs(self, video_urls, indexes, results, tabs=None):
+        self.rendered = list(indexes)
+        for i in indexes:
+            if video_urls[i].endswith("3"):
+                self.failed_videos.append({"videotiktok": video_urls[i], "error": "boom"})
+            else:
+                results[i] = {"videotiktok": video_urls[i], "video": video_urls[i]}
+
+
+class FakeDownloader:
+    max_workers = 2
+
+    def __init__(self):
+        self.downloaded = []
+        self.first_download = threading.Event()
+
+        self.events = []
+
+    def emit(self, event, **data):
+        self.events.append((event, data["index"], data["path"]))
+
+    def process_video_info(self, video_info, output_dir, index=None):
+        self.downloaded.append(index)
+        self.first_download.set()
+        video_info["video"] = f"/{output_dir}/{index}.mp4"
+
+
+def test_downloads_overlap_url_collection_and_keep_discovery_order(tmp_path):
+    scraper, downloader = FakeScraper(), FakeDownloader()
+    overlapped = []
+
+    def video_urls():
+        for i in range(6):
+            yield f"https://www.tiktok.com/@a/video/{i}"
+            if i == 4:
+                # The even videos found so far are downloaded while the scraper is still running
+                overlapped.append(downloader.first_download.wait(5))
+
+    collected = []
+    video_infos = StreamingPipeline(scraper, downloader, batch_size=2).run(
+        video_urls(), str(tmp_path), on_collected=lambda: collected.append(True))
+
+    assert overlapped == [True] and collected == [True]
+    assert scraper.rendered == [1, 3, 5]
+    assert [info["videotiktok"][-1] for info in video_infos] == ["0", "1", "2", "4", "5"]
+    assert sorted(downloader.downloaded) == [0, 1, 2, 4, 5]
+    assert video_infos[1]["video"] == f"/{tmp_path}/1.mp4"
+    assert scraper.failed_videos == [{"videotiktok": "https://www.tiktok.com/@a/video/3", "error": "boom"}]
+
+
+def test_download_errors_are_reported_as_failed_videos(tmp_path):
+    class UnreachableCobalt(FakeDownloader):
+        def process_video_info(self, video_info, output_dir, index=None):
+            if index == 1:
+                raise ConnectionError("Cobalt is unreachable")
+            super().process_video_info(video_info, output_dir, index)
+
+    scraper, downloader = FakeScraper(), UnreachableCobalt()
+    video_infos = StreamingPipeline(scraper, downloader).run((f"https://www.tiktok.com/@a/video/{i}" for i in (0, 2)),
+                                                             str(tmp_path))
+
+    assert [info["video"] for info in video_infos] == [f"/{tmp_path}/0.mp4", "https://www.tiktok.com/@a/video/2"]
+    assert scraper.failed_videos == [{"videotiktok": "https://www.tiktok.com/@a/video/2",
+                                      "error": "Cobalt is unreachable"}]
+    assert downloader.events == [("video_downloaded", 1, None)]
@@ -0,0 +1,95 @@
+import contextlib
+import io
+import json
+import pickle
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_tiktok import FakeTikTokServer, video_ids
+from benchmarks.stub_cobalt import StubCobaltServer
+from benchmarks.stub_proxy import StubProxyServer
+from src.job_queue import JobQueue
+from src.sharding import Identity, ShardCoordinator, load_identities, shard_for
+
+
+def test_rendezvous_hashing_only_moves_keys_to_a_new_shard():
+    keys = [f"tag/{i}" for i in range(300)]
+    before = {key: shard_for(key, ["a", "b", "c"]) for key in keys}
+    after = {key: shard_for(key, ["a", "b", "c", "d"]) for key in keys}
+
+    assert set(before.values()) == {"a", "b", "c"}
+    assert all(after[key] in (before[key], "d") for key in keys)
+    assert 40 < sum(shard == "d" for shard in after.values()) < 110
+    assert shard_for("tag/0", []) is None
+
+
+def test_video_lists_are_split_evenly(tmp_path):
+    coordinator = ShardCoordinator(JobQueue(str(tmp_path / "jobs.db")), [Identity("a"), Identity("b")])
+    urls = [f"https://www.tiktok.com/@u/video/{i}" for i in (1, 2, 3, 2, 4, 5)]
+
+    assert coordinator.split_videos(urls) == {"a": [urls[0], urls[2], urls[5]], "b": [urls[1], urls[4]]}
+    assert list(ShardCoordinator(coordinator.job_queue).split_videos(urls)) == [None]
+
+
+def test_workers_only_claim_their_shard(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    queue.enqueue("for-b", {}, shard="b", priority=1)
+    queue.enqueue("for-a", {}, shard="a")
+    queue.enqueue("anyone", {})
+
+    assert queue.claim(1, shard="a")["task_id"] == "for-a"
+    assert queue.claim(2)["task_id"] == "anyone"
+    assert queue.claim(3, shard="a") is None
+    assert queue.claim(4, shard="b")["task_id"] == "for-b"
+
+
+def test_load_identities(tmp_path):
+    spec = [{"proxy": "http://10.0.0.2:3128", "cobalt_url": "http://cobalt-a:9000/"},
+            {"name": "b", "requests_per_second": 5}]
+    path = tmp_path / "identities.json"
+    path.write_text(json.dumps(spec))
+
+    identities = load_identities(str(path))
+    assert [(i.name, i.proxy, i.requests_per_second) for i in identities] == \
+        [("identity-0", "http://10.0.0.2:3128", 2.0), ("b", None, 5.0)]
+    assert load_identities("") == []
+    with pytest.raises(ValueError):
+        load_identities(json.dumps([{"name": "a"}, {"name": "a"}]))
+
+    identities[0].rate_limiter = object()
+    copy = pickle.loads(pickle.dumps(identities[0]))
+    assert (copy.name, copy.cobalt_url, copy.rate_limiter) == ("identity-0", "http://cobalt-a:9000/", None)
+
+
+def test_each_identity_uses_its_own_proxy_and_cobalt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("SCRAPER_TASK_STORE", "memory")
+    monkeypatch.setenv("SCRAPER_METADATA_DB", "")
+    from src.scrape_processor import TikTokProcessor
+
+    with contextlib.ExitStack() as stack:
+        fake = stack.enter_context(FakeTikTokServer())
+        proxies = [stack.enter_context(StubProxyServer()) for _ in range(2)]
+        cobalts = [stack.enter_context(StubCobaltServer(payload_size=2048)) for _ in range(2)]
+        identities = [Identity(f"id{i}", proxy=proxies[i].url, cobalt_url=cobalts[i].url, requests_per_second=50)
+                      for i in range(2)]
+        monkeypatch.setenv("SCRAPER_EMBED_URL", f"{fake.url}embed/v2/")
+        coordinator = ShardCoordinator(JobQueue(str(tmp_path / "jobs.db")), identities)
+        urls = [f"https://www.tiktok.com/@a/video/{video_id}" for video_id in video_ids("sharding", 6)]
+
+        tasks = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for identity in identities:
+                processor = TikTokProcessor(identity=identity)
+                processor.downloader.cache = None
+                processor.process_video_list(SimpleNamespace(video_urls=coordinator.split_videos(urls)[identity.name],
+                                                             group="sharded"))
+                tasks.append(TikTokProcessor.task_store.get(processor.task_id))
+
+        assert [(task["status"], task.get("error")) for task in tasks] == [("completed", None)] * 2
+        assert [len(task["videos"]) for task in tasks] == [3, 3]
+        assert [proxy.requests for proxy in proxies] == [3, 3]
+        assert [cobalt.requests for cobalt in cobalts] == [3, 3]
+        assert [task["videos"][0]["video"][:23] for task in tasks] == ["/videos/sharded_videos/"] * 2
+        assert identities[0].rate_limiter is not None
@@ -0,0 +1,79 @@
+import multiprocessing
+
+import pytest
+
+from src.task_store import MemoryTaskStore, SQLiteTaskStore, TaskStore
+
+
+def write_from_child(path):
+    store = SQLiteTaskStore(path)
+    store.set("child", {"status": "completed", "videos": []})
+    store.increment("child", "videos_downloaded", 3)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryTaskStore()
+    return SQLiteTaskStore(str(tmp_path / "tasks.db"))
+
+
+def test_status_and_progress(store):
+    store.set("a", {"status": "processing"})
+    store.increment("a", "videos_found", 2)
+    store.set("a", {"status": "downloading"})
+    store.increment("a", "videos_downloaded")
+    assert store.get("a") == {
+        "status": "downloading",
+        "progress": {"videos_found": 2, "videos_scraped": 0, "videos_downloaded": 1},
+    }
+    assert "missing" not in store
+
+
+def test_finished_tasks_expire(store):
+    store.ttl = 0
+    store.evict_interval = 0
+    store.set("done", {"status": "completed"})
+    store.set("running", {"status": "processing"})
+    store.set("other", {"status": "processing"})
+    assert "done" not in store
+    assert "running" in store
+
+
+def test_sqlite_store_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "tasks.db")
+    store = SQLiteTaskStore(path)
+    process = multiprocessing.get_context("spawn").Process(target=write_from_child, args=(path,))
+    process.start()
+    process.join()
+    assert store.get("child")["progress"]["videos_downloaded"] == 3
+
+
+def test_event_log(store):
+    store.set("a", {"status": "processing"})
+    store.append_event("a", {"type": "video_found", "url": "u"})
+    store.set("a", {"status": "completed", "videos": [{"video": "v"}]})
+
+    events = store.events_since("a")
+    assert [event for _, event in events] == [
+        {"type": "status", "status": "processing"},
+        {"type": "video_found", "url": "u"},
+        {"type": "status", "status": "completed"},
+    ]
+    assert store.events_since("a", events[1][0]) == events[2:]
+
+
+def test_metric_totals(store):
+    store.add_metrics({"videos_downloaded_total": 2, 'jobs_total{status="completed"}': 1})
+    store.add_metrics({"videos_downloaded_total": 3, "download_bytes_total": 1024})
+    assert store.metrics() == {"videos_downloaded_total": 5, 'jobs_total{status="completed"}': 1,
+                               "download_bytes_total": 1024}
+
+
+def test_incomplete_backends_fail_when_created():
+    class PartialStore(TaskStore):
+        def get(self, task_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
@@ -0,0 +1,86 @@
+import os
+import time
+
+from src.download import VideoDownloader
+from src.video_cache import VideoCache, link_file
+
+
+def write_video(directory, name, size):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return path
+
+
+def test_cached_video_is_hard_linked_into_other_jobs(tmp_path):
+    cache = VideoCache(root=str(tmp_path / "cache"))
+    path = write_video(str(tmp_path / "hashtag"), "tiktok_nfl_1.mp4", 100)
+    cache.add("1", path)
+
+    other_job = str(tmp_path / "trending")
+    os.makedirs(other_job)
+    assert cache.link_into("1", other_job) == "tiktok_nfl_1.mp4"
+    assert os.path.samefile(path, os.path.join(other_job, "tiktok_nfl_1.mp4"))
+    assert cache.link_into("2", other_job) is None
+
+
+def test_least_recently_used_videos_are_evicted(tmp_path):
+    cache = VideoCache(root=str(tmp_path / "cache"), max_bytes=250)
+    job = str(tmp_path / "job")
+    for video_id in ("0", "1", "2"):
+        cache.add(video_id, write_video(job, f"{video_id}.mp4", 100))
+        time.sleep(0.01)
+    # The jobs of 1 and 2 were deleted, only the cache keeps them on disk; 0 is still linked from its job
+    os.remove(os.path.join(job, "1.mp4"))
+    os.remove(os.path.join(job, "2.mp4"))
+    os.makedirs(tmp_path / "other_job")
+    cache.link_into("1", str(tmp_path / "other_job"))  # used again, then deleted again
+    os.remove(str(tmp_path / "other_job" / "1.mp4"))
+    cache.add("3", write_video(job, "3.mp4", 100))
+    os.remove(os.path.join(job, "3.mp4"))
+    cache.add("4", write_video(job, "4.mp4", 100))
+
+    # A second instance reads the index written by the first one
+    other = VideoCache(root=str(tmp_path / "cache"), max_bytes=250)
+    assert other.link_into("2", job) is None
+    assert [other.link_into(video_id, job) for video_id in ("0", "1", "3", "4")] == \
+        ["0.mp4", "1.mp4", "3.mp4", "4.mp4"]
+
+
+def test_replacing_a_linked_video_keeps_the_other_copies(tmp_path):
+    cache = VideoCache(root=str(tmp_path / "cache"))
+    cache.add("1", write_video(str(tmp_path / "a"), "1.mp4", 100))
+    os.makedirs(tmp_path / "b")
+    cache.link_into("1", str(tmp_path / "b"))
+    original = (tmp_path / "a" / "1.mp4").read_bytes()
+
+    replacement = write_video(str(tmp_path / "b"), "new.mp4", 10)
+    link_file(replacement, str(tmp_path / "b" / "1.mp4"))
+
+    assert (tmp_path / "a" / "1.mp4").read_bytes() == original
+    assert (tmp_path / "b" / "1.mp4").stat().st_size == 10
+
+
+def test_identical_content_shares_one_inode(tmp_path):
+    cache = VideoCache(root=str(tmp_path / "cache"), hash_content=True)
+    first = write_video(str(tmp_path / "job"), "a.mp4", 100)
+    second = str(tmp_path / "job" / "b.mp4")
+    with open(first, "rb") as src, open(second, "wb") as dst:
+        dst.write(src.read())
+
+    cache.add("1", first)
+    cache.add("2", second)
+    assert os.path.samefile(first, second)
+
+
+def test_downloader_skips_cobalt_on_cache_hit(tmp_path):
+    cache = VideoCache(root=str(tmp_path / "cache"))
+    cache.add("7", write_video(str(tmp_path / "old_job"), "tiktok_u_7.mp4", 10))
+
+    downloader = VideoDownloader(cache=cache)
+    downloader.fetch_tunnel_url = lambda video_url: (_ for _ in ()).throw(AssertionError("fetched"))
+    output_dir = str(tmp_path / "new_job")
+    video_infos = downloader.process_videos([{"video": "https://www.tiktok.com/@u/video/7"}], output_dir)
+
+    assert video_infos[0]["video"] == "/" + os.path.join(output_dir, "tiktok_u_7.mp4")
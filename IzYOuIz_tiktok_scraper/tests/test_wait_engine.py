@@ -0,0 +1,104 @@
+from src.scrape_processor import TikTokScraper
+from src.wait_engine import COUNT_SCRIPT, AdaptiveWaiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeDriver:
+    def __init__(self, counts):
+        self.counts = counts  # element count returned by each poll, the last one repeats
+
+    def execute_script(self, script, *args):
+        if script == COUNT_SCRIPT:
+            return self.counts.pop(0) if len(self.counts) > 1 else self.counts[0]
+        return "complete"
+
+
+class StalledFeedDriver(FakeDriver):
+    # A Creative Center page that always shows the same two videos
+    def __init__(self):
+        super().__init__([2])
+        self.frames = [FakeElement(f"https://www.tiktok.com/embed/v2/{i}") for i in range(2)]
+
+    def execute_script(self, script, *args):
+        if "scrollHeight" in script:
+            return 10000
+        return super().execute_script(script, *args)
+
+    def find_elements(self, by, value):
+        return self.frames
+
+    def get(self, url):
+        pass
+
+    def refresh(self):
+        pass
+
+
+class FakeElement:
+    def __init__(self, src):
+        self.src = src
+
+    def get_attribute(self, name):
+        return self.src
+
+
+def make_waiter(clock, jitter=(0, 0), pass_budget=None):
+    return AdaptiveWaiter(jitter=jitter, timeout=5, poll_interval=0.25, pass_budget=pass_budget, sleep=clock.sleep,
+                          clock=clock)
+
+
+def test_wait_returns_as_soon_as_content_grows():
+    clock = FakeClock()
+    waiter = make_waiter(clock)
+
+    assert waiter.wait_for_more(FakeDriver([10, 10, 14]), "a", previous=10) == 14
+    assert clock.now == 0.5
+    assert waiter.stats.as_dict() == {"sleep_seconds": 0, "dom_wait_seconds": 0.5, "dom_changes": 1, "timeouts": 0}
+
+
+def test_wait_times_out_and_jitter_counts_as_sleep():
+    clock = FakeClock()
+    waiter = make_waiter(clock, jitter=(1, 1))
+
+    assert waiter.wait_for_more(FakeDriver([3]), "a", previous=3) == 3
+    assert waiter.wait_for_ready(FakeDriver([0]))
+    stats = waiter.stats.as_dict()
+    assert stats["sleep_seconds"] == 1
+    assert stats["dom_wait_seconds"] == 5
+    assert (stats["dom_changes"], stats["timeouts"]) == (1, 1)
+
+
+def test_waits_of_a_pass_share_its_budget():
+    clock = FakeClock()
+    waiter = make_waiter(clock, jitter=(0.5, 1.5), pass_budget=3)
+
+    waiter.start_pass()
+    waiter.wait_for_more(FakeDriver([3]), "a", previous=3)
+    waiter.wait_for_more(FakeDriver([3]), "a", previous=3)
+    assert clock.now <= 3 + 0.5  # the second wait only sleeps the jitter floor
+
+    waiter.end_pass()
+    start = clock.now
+    assert waiter.wait_for_more(FakeDriver([3]), "a", previous=3) == 3
+    assert clock.now - start >= 5  # a new page gets the full timeout
+
+
+def test_stalled_feed_ends_within_its_pass_budgets():
+    clock = FakeClock()
+    scraper = TikTokScraper(waiter=make_waiter(clock, pass_budget=4), max_retries=5)
+    scraper.driver = StalledFeedDriver()
+    scraper.max_videos = 100
+
+    assert len(list(scraper.iter_business_video_urls())) == 2
+    # One pass finding the videos, then one per retry, each within its budget
+    assert clock.now <= (1 + scraper.max_retries) * 4